@@ -0,0 +1,320 @@
+# -*- coding: utf-8 -*-
+"""Dry-run estimate of the output size, memory and runtime of a run.
+
+A scan reads the source once like a run does, through the geometry cache
+and store when they are enabled, and keeps the length of every line with
+its data-defined values. Changing the number of points, the offsets or the
+spacing then only recomputes the estimate from these columns.
+"""
+
+import copy
+import ctypes
+import os
+import sys
+
+import numpy as np
+
+from qgis.core import QgsTask
+
+from .generator import PointGenerator
+from .point_writer import AUTO_FILE_THRESHOLD
+
+# Rough memory of one point in a temporary memory layer, in bytes
+POINT_MEMORY_BYTES = 200
+# Memory of one prepared vertex: x, y and the cumulative length
+VERTEX_BYTES = 24
+
+
+def scan_settings(settings):
+    """Return the settings of a scan of the features of a run.
+
+    The fixed parameters are neutral, so no feature is dropped for them;
+    the estimate applies the real values.
+    """
+    scan = copy.copy(settings)
+    scan.num_points = 1
+    scan.start_percent = 0
+    scan.end_percent = 0
+    scan.min_distance = 0.0
+    scan.along_line = False
+    scan.global_min_distance = False
+    scan.workers = 1
+    scan.pipelined = False
+    scan.track_points = False
+    scan.report_path = ""
+    scan.profile_path = ""
+    return scan
+
+
+def scan_key(layer, settings):
+    """Return what a scan of ``layer`` with ``settings`` depends on."""
+    extent = settings.extent
+    return (
+        layer.id(), settings.selected_only, settings.filter_expression,
+        None if extent is None else extent.toString(), settings.expression,
+        settings.start_expression, settings.end_expression,
+        settings.min_distance_expression,
+    )
+
+
+class LayerScan:
+    """Line lengths and data-defined values of the features of a run."""
+
+    def __init__(self, key):
+        """Constructor.
+
+        :param key: Scan key, see :func:`scan_key`.
+        :type key: tuple
+        """
+        self.key = key
+        self.features_read = 0
+        self.vertices = 0
+        self.lengths = []
+        # Data-defined columns by FeatureGroup attribute, fixed values are absent
+        self.columns = {}
+
+    def add(self, group, values):
+        """Add the lines of a FeatureGroup.
+
+        :param values: Names of the data-defined parameters of the run.
+        :type values: iterable
+        """
+        self.lengths.append(np.fromiter(
+            (table.length for table in group.tables), dtype=np.float32, count=len(group)
+        ))
+        self.vertices += sum(table.x.size for table in group.tables)
+        for name in values:
+            self.columns.setdefault(name, []).append(getattr(group, name))
+
+    def finish(self):
+        """Concatenate the collected columns."""
+        self.lengths = (np.concatenate(self.lengths) if self.lengths
+                        else np.zeros(0, dtype=np.float32))
+        self.columns = {name: np.concatenate(column) for name, column in self.columns.items()}
+
+    def column(self, name, value):
+        """Return a data-defined column, or the fixed ``value``."""
+        return self.columns.get(name, value)
+
+
+class RunEstimate:
+    """Expected size, memory and runtime of a run."""
+
+    def __init__(self):
+        """Constructor."""
+        self.feature_count = 0
+        self.usable_length = 0.0
+        self.point_count = 0
+        # True when the minimum distance may leave fewer points
+        self.upper_bound = False
+        self.memory_bytes = 0
+        self.seconds = 0.0
+
+    def summary(self):
+        """Return the estimate as text for the dialog."""
+        points = f"{'up to ' if self.upper_bound else ''}{self.point_count:,} points"
+        return (
+            f"{self.feature_count:,} features, usable length {self.usable_length:,.0f}\n"
+            f"{points}, about {format_bytes(self.memory_bytes)} of memory "
+            f"and {format_seconds(self.seconds)}"
+        )
+
+
+class Throughput:
+    """Runtime model of a run, calibrated with the runs of the session."""
+
+    FEATURES_PER_SECOND = 50000
+    POINTS_PER_SECOND = 400000
+    # Points drawn with a Euclidean minimum distance are checked one by one
+    CONSTRAINED_POINTS_PER_SECOND = 100000
+
+    def __init__(self):
+        """Constructor."""
+        # Measured over modelled runtime of the last runs
+        self.factor = 1.0
+        self.calibrated = False
+
+    def model_seconds(self, features_read, point_count, constrained):
+        """Return the uncalibrated runtime of a run in seconds."""
+        rate = self.CONSTRAINED_POINTS_PER_SECOND if constrained else self.POINTS_PER_SECOND
+        return features_read / self.FEATURES_PER_SECOND + point_count / rate
+
+    def seconds(self, features_read, point_count, constrained):
+        """Return the expected runtime of a run in seconds."""
+        return self.factor * self.model_seconds(features_read, point_count, constrained)
+
+    def calibrate(self, features_read, point_count, constrained, seconds):
+        """Adjust the model to the measured runtime of a finished run."""
+        modelled = self.model_seconds(features_read, point_count, constrained)
+        if modelled <= 0 or seconds <= 0:
+            return
+        factor = seconds / modelled
+        self.factor = (self.factor + factor) / 2 if self.calibrated else factor
+        self.calibrated = True
+
+
+def estimate_run(scan, settings, throughput, in_memory, cache_limit=0):
+    """Estimate a run from the scan of its features.
+
+    :param scan: Finished scan with the same :func:`scan_key`.
+    :type scan: LayerScan
+
+    :param settings: Run parameters.
+    :type settings: GenerationSettings
+
+    :param throughput: Runtime model.
+    :type throughput: Throughput
+
+    :param in_memory: The points are written to a temporary layer, which is
+        kept in memory up to AUTO_FILE_THRESHOLD points.
+    :type in_memory: bool
+
+    :param cache_limit: Memory limit of the geometry cache in bytes, 0 when
+        the cache is disabled.
+    :type cache_limit: int
+
+    :rtype: RunEstimate
+    """
+    counts = scan.column("counts", float(settings.num_points))
+    start = scan.column("start_percent", float(settings.start_percent))
+    end = scan.column("end_percent", float(settings.end_percent))
+    min_distance = scan.column("min_distance", float(settings.min_distance))
+    lengths = scan.lengths.astype(np.float64)
+
+    valid = np.broadcast_to(start + end <= 100, lengths.shape)
+    usable = lengths * np.clip(1 - (start + end) / 100, 0, 1)
+    counts = np.broadcast_to(counts, lengths.shape)
+    if settings.along_line:
+        # Points beyond what fits with the minimum gap are not generated
+        spacing = np.broadcast_to(min_distance, lengths.shape)
+        spaced = spacing > 0
+        feasible = np.full(lengths.shape, np.inf)
+        feasible[spaced] = np.floor(usable[spaced] / spacing[spaced]) + 1
+        counts = np.minimum(counts, feasible)
+
+    estimate = RunEstimate()
+    estimate.feature_count = int(valid.sum())
+    estimate.usable_length = float(usable[valid].sum())
+    estimate.point_count = int(counts[valid].sum())
+    constrained = not settings.along_line and (
+        settings.min_distance > 0 or "min_distance" in scan.columns
+    )
+    estimate.upper_bound = constrained
+
+    line_bytes = scan.vertices * VERTEX_BYTES
+    if settings.pipelined:
+        # The pipeline holds groups of lines and their points up to its budget
+        in_flight = min(line_bytes, settings.memory_limit)
+    else:
+        batched = (settings.min_distance <= 0 and not settings.along_line
+                   and "min_distance" not in scan.columns)
+        # The layer-wide index of a global minimum distance stays serial
+        global_index = (settings.global_min_distance and not settings.along_line
+                        and settings.min_distance > 0 and "min_distance" not in scan.columns)
+        workers = 1 if global_index else settings.workers
+        group = PointGenerator.group_features(workers, batched)
+        in_flight = line_bytes * min(1.0, group / max(scan.features_read, 1))
+    # The cache also holds the lines of the groups in flight
+    estimate.memory_bytes = int(max(min(line_bytes, cache_limit), in_flight))
+    if in_memory and estimate.point_count <= AUTO_FILE_THRESHOLD:
+        estimate.memory_bytes += estimate.point_count * POINT_MEMORY_BYTES
+    estimate.seconds = throughput.seconds(scan.features_read, estimate.point_count, constrained)
+    return estimate
+
+
+class ScanTask(QgsTask):
+    """Scan the features of a run in the QGIS task manager."""
+
+    def __init__(self, generator, key, on_finished):
+        """Constructor.
+
+        :param generator: Generator created with :func:`scan_settings`.
+        :type generator: PointGenerator
+
+        :param key: Scan key, see :func:`scan_key`.
+        :type key: tuple
+
+        :param on_finished: Called on the main thread with the task, and the
+            LayerScan or None when the scan failed or was canceled.
+        :type on_finished: function
+        """
+        super().__init__("Estimating random points", QgsTask.Flag.CanCancel)
+        self.generator = generator
+        self.scan = LayerScan(key)
+        self.on_finished = on_finished
+        self.exception = None
+
+    def run(self):
+        """Read the features, called from a worker thread."""
+        values = list(self.generator.values)
+        feature_count = self.generator.feature_count
+        try:
+            for group, done in self.generator.read_lines(self):
+                self.scan.add(group, values)
+                self.scan.features_read = done
+                if feature_count:
+                    self.setProgress(min(100.0, 100.0 * done / feature_count))
+                if self.isCanceled():
+                    return False
+        except Exception as e:  # pylint: disable=broad-except
+            self.exception = e
+            return False
+        self.scan.finish()
+        return True
+
+    def finished(self, result):
+        """Hand the scan over, called on the main thread."""
+        self.on_finished(self, self.scan if result else None)
+
+
+def new_scan_task(layer, settings, on_finished, cache=None, store=None):
+    """Create the task scanning the features of a run, on the main thread."""
+    generator = PointGenerator(layer, scan_settings(settings), None, cache, store)
+    return ScanTask(generator, scan_key(layer, settings), on_finished)
+
+
+def available_memory():
+    """Return the free physical memory in bytes, None if unknown."""
+    if sys.platform == "win32":
+        class MemoryStatus(ctypes.Structure):  # pylint: disable=too-few-public-methods
+            _fields_ = [
+                ("dwLength", ctypes.c_ulong),
+                ("dwMemoryLoad", ctypes.c_ulong),
+                ("ullTotalPhys", ctypes.c_ulonglong),
+                ("ullAvailPhys", ctypes.c_ulonglong),
+                ("ullTotalPageFile", ctypes.c_ulonglong),
+                ("ullAvailPageFile", ctypes.c_ulonglong),
+                ("ullTotalVirtual", ctypes.c_ulonglong),
+                ("ullAvailVirtual", ctypes.c_ulonglong),
+                ("ullAvailExtendedVirtual", ctypes.c_ulonglong),
+            ]
+
+        status = MemoryStatus()
+        status.dwLength = ctypes.sizeof(MemoryStatus)
+        if ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status)):
+            return status.ullAvailPhys
+        return None
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def format_bytes(size):
+    """Return a byte count as text."""
+    for unit in ("bytes", "KB", "MB", "GB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+
+def format_seconds(seconds):
+    """Return a duration as text."""
+    if seconds < 1:
+        return "less than a second"
+    if seconds < 60:
+        return f"{seconds:.0f} s"
+    if seconds < 3600:
+        return f"{seconds / 60:.0f} min"
+    return f"{seconds / 3600:.1f} h"
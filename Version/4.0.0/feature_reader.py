@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+"""Source feature requests and conversion of line geometries for sampling."""
+
+import numpy as np
+
+from qgis.core import QgsExpression, QgsFeatureRequest, QgsLineString
+
+from .sampling_engine import LineTable
+
+
+def line_parts(geometry):
+    """Return the vertices of a line geometry as coordinate arrays.
+
+    Curved parts are segmentized with the default tolerance.
+
+    :param geometry: Line or multi line geometry.
+    :type geometry: QgsGeometry
+
+    :returns: List of ``(x, y)`` array pairs, one per part.
+    :rtype: list
+    """
+    parts = []
+    if geometry is None or geometry.isEmpty():
+        return parts
+    for part in geometry.constParts():
+        if not isinstance(part, QgsLineString):
+            part = part.curveToLine()
+        parts.append((
+            np.asarray(part.xVector(), dtype=np.float64),
+            np.asarray(part.yVector(), dtype=np.float64),
+        ))
+    return parts
+
+
+def line_table(geometry):
+    """Prepare a line geometry for sampling.
+
+    :param geometry: Line or multi line geometry.
+    :type geometry: QgsGeometry
+
+    :rtype: LineTable
+    """
+    return LineTable(line_parts(geometry))
+
+
+def source_request(layer, selected_only=False, extent=None, filter_expression="",
+                   context=None, feature_ids=None):
+    """Build the feature request that pushes the source filters to the provider.
+
+    The selection becomes a feature id filter, the extent a bounding box
+    filter answered from the provider's spatial index and the filter
+    expression is compiled by the provider where it supports it. A request
+    holds only one of an id and an expression filter, so when both are set
+    the expression is returned for local evaluation instead.
+
+    :param layer: Source line layer.
+    :type layer: QgsVectorLayer
+
+    :param selected_only: Restrict to the selected features.
+    :type selected_only: bool
+
+    :param extent: Optional bounding box in the layer CRS.
+    :type extent: QgsRectangle
+
+    :param filter_expression: Optional boolean filter expression.
+    :type filter_expression: str
+
+    :param context: Expression context of the layer.
+    :type context: QgsExpressionContext
+
+    :param feature_ids: Optional IDs of the only features to read.
+    :type feature_ids: iterable
+
+    :returns: The request, and the filter expression left to evaluate
+        locally or None.
+    :rtype: (QgsFeatureRequest, QgsExpression)
+    """
+    request = QgsFeatureRequest()
+    local_filter = None
+    ids = None
+    if selected_only:
+        ids = set(layer.selectedFeatureIds())
+    if feature_ids is not None:
+        ids = set(feature_ids) if ids is None else ids & set(feature_ids)
+    if ids is not None:
+        request.setFilterFids(ids)
+    if extent is not None and not extent.isEmpty():
+        request.setFilterRect(extent)
+    if filter_expression:
+        if ids is not None:
+            local_filter = QgsExpression(filter_expression)
+            if context is not None:
+                local_filter.prepare(context)
+        else:
+            request.setFilterExpression(filter_expression)
+            if context is not None:
+                request.setExpressionContext(context)
+    return request, local_filter
+
+
+class DataDefinedValue:
+    """Per-feature value of a data-defined parameter.
+
+    A plain field reference is read directly from the attribute index,
+    anything else is evaluated with a prepared expression.
+    """
+
+    def __init__(self, text, layer, context):
+        """Constructor.
+
+        :param text: Expression or field name.
+        :type text: str
+
+        :param layer: Source layer the expression refers to.
+        :type layer: QgsVectorLayer
+
+        :param context: Expression context of the layer.
+        :type context: QgsExpressionContext
+        """
+        self.context = context
+        self.expression = None
+        self.field_index = QgsExpression.expressionToLayerFieldIndex(text, layer)
+        if self.field_index >= 0:
+            self.columns = {layer.fields().at(self.field_index).name()}
+        else:
+            self.expression = QgsExpression(text)
+            self.expression.prepare(context)
+            self.columns = set(self.expression.referencedColumns())
+
+    def value(self, feature):
+        """Return the raw value for ``feature``.
+
+        The expression context must already hold the feature.
+        """
+        if self.expression is None:
+            return feature.attribute(self.field_index)
+        return self.expression.evaluate(self.context)
+
+
+def numeric_column(values):
+    """Convert raw attribute or expression values to a float column.
+
+    NULL and non-numeric values become NaN.
+
+    :param values: Raw values, one per feature.
+    :type values: list
+
+    :rtype: numpy.ndarray
+    """
+    try:
+        return np.asarray(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        pass
+    column = np.empty(len(values), dtype=np.float64)
+    for i, value in enumerate(values):
+        try:
+            column[i] = float(value)
+        except (TypeError, ValueError):
+            column[i] = np.nan
+    return column
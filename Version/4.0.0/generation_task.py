@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""Background task running a random points generation."""
+
+from qgis.core import Qgis, QgsMessageLog, QgsTask
+
+from .point_writer import ReplaceDestination, WriteError
+
+
+class GenerationTask(QgsTask):
+    """Run a PointGenerator in the QGIS task manager.
+
+    The points are written in the background; the output layer is only
+    created and handed to ``on_finished`` on the main thread once the run has
+    ended.
+    """
+
+    def __init__(self, generator, on_finished):
+        """Constructor.
+
+        :param generator: Prepared generation run.
+        :type generator: PointGenerator
+
+        :param on_finished: Called on the main thread with the task, and the
+            output layer or None when nothing is kept.
+        :type on_finished: function
+        """
+        super().__init__("Generating random points", QgsTask.Flag.CanCancel)
+        self.generator = generator
+        self.on_finished = on_finished
+        self.exception = None
+
+    def run(self):
+        """Generate the points, called from a worker thread."""
+        try:
+            return self.generator.run(self)
+        except Exception as e:  # pylint: disable=broad-except
+            self.exception = e
+            return False
+
+    def finished(self, result):
+        """Create the output layer, called on the main thread."""
+        generator = self.generator
+        layer = None
+        # Partial points never replace the output of an earlier run
+        keep_partial = (generator.settings.keep_partial
+                        and not isinstance(generator.destination, ReplaceDestination))
+        if result or (generator.canceled and keep_partial and self.exception is None):
+            try:
+                layer = generator.destination.finish()
+            except WriteError as e:
+                self.exception = e
+        else:
+            generator.destination.discard()
+        if self.exception is not None:
+            QgsMessageLog.logMessage(
+                f"Random points generation failed: {self.exception}",
+                "Random Points on Lines", Qgis.MessageLevel.Critical
+            )
+        if generator.report.enabled:
+            generator.report.publish()
+            try:
+                generator.write_report()
+            except OSError as e:
+                generator.warnings.append(f"Could not write the run report: {e}")
+        if generator.profile.enabled:
+            try:
+                generator.write_profile()
+            except OSError as e:
+                generator.warnings.append(f"Could not write the run profile: {e}")
+        self.on_finished(self, layer)
@@ -0,0 +1,812 @@
+# -*- coding: utf-8 -*-
+"""Read, sample and write stages of a random points run.
+
+Everything here only uses QGIS core classes, so a run can execute outside
+the GUI thread.
+"""
+
+import os
+import time
+
+import numpy as np
+
+from qgis.core import (
+    QgsExpressionContext, QgsExpressionContextUtils, QgsFeatureRequest,
+    QgsVectorLayerFeatureSource,
+)
+
+from .feature_reader import (
+    DataDefinedValue, line_table, numeric_column, source_request,
+)
+from .geometry_store import source_key
+from .parallel import PartitionSampler
+from .pipeline import run_pipeline
+from .point_writer import PointWriter
+from .run_profile import RunProfile
+from .run_report import EXPRESSIONS, PREPARE, PROVIDER_READ, SAMPLE, VALIDATE, RunReport
+from .sampling_engine import (
+    FeatureGroup, FeatureStream, GridIndex, LineBatch, max_spaced_count, offset_range,
+    random_run_seed, sample_batch, sample_line_constrained,
+)
+
+
+class GenerationSettings:
+    """Parameters of one generation run."""
+
+    def __init__(self):
+        """Constructor with the dialog defaults."""
+        self.num_points = 10
+        # Expression giving the number of points per feature, empty for a
+        # fixed number of points
+        self.expression = ""
+        self.start_percent = 0
+        self.end_percent = 0
+        # Data-defined start and end offsets, empty for the fixed offsets
+        self.start_expression = ""
+        self.end_expression = ""
+        self.seed = -1
+        self.min_distance = 0.0
+        # Data-defined minimum distance, empty for the fixed distance
+        self.min_distance_expression = ""
+        self.global_min_distance = False
+        self.along_line = False
+        self.max_gap = 0.0
+        self.selected_only = False
+        # Bounding box in the layer CRS, None for no spatial filter
+        self.extent = None
+        # Boolean expression selecting the source features
+        self.filter_expression = ""
+        # IDs of the only source features to read, None for all features
+        self.feature_ids = None
+        # Record the number of points of every feature, see PointGenerator.produced
+        self.track_points = False
+        self.keep_partial = False
+        # Number of worker processes, 1 samples in the current thread
+        self.workers = 1
+        # Overlap reading, sampling and writing in separate threads
+        self.pipelined = False
+        # Peak memory of the data queued between the pipeline stages
+        self.memory_limit = 256 * 1024 * 1024
+        # JSON run report to write, empty to run without timing the stages
+        self.report_path = ""
+        # Path without extension of the cProfile and allocation captures,
+        # empty to run without profiling
+        self.profile_path = ""
+
+    # Settings that move the points without changing which features get
+    # how many points, or that do not affect the points at all
+    PLACEMENT_SETTINGS = (
+        "seed", "start_percent", "end_percent", "start_expression", "end_expression",
+        "track_points", "keep_partial", "workers", "pipelined", "memory_limit",
+        "report_path", "profile_path",
+    )
+
+    def only_placement_differs(self, other):
+        """Return True if ``other`` differs from these settings only in the
+        placement of the points, see PLACEMENT_SETTINGS.
+
+        :param other: Settings of another run.
+        :type other: GenerationSettings
+
+        :rtype: bool
+        """
+        return all(
+            value == getattr(other, name)
+            for name, value in vars(self).items()
+            if name not in self.PLACEMENT_SETTINGS
+        )
+
+
+class Shortfalls:
+    """Features that got fewer points than requested in a run."""
+
+    def __init__(self):
+        """Constructor."""
+        self.feature_ids = []
+        self.requested = []
+        self.achieved = []
+        self.rejected = []
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def add(self, feature_ids, requested, achieved, rejected):
+        """Record features that got fewer points than requested.
+
+        :param feature_ids: Feature IDs.
+        :type feature_ids: numpy.ndarray
+
+        :param requested: Requested number of points per feature.
+        :type requested: numpy.ndarray
+
+        :param achieved: Generated number of points per feature.
+        :type achieved: numpy.ndarray
+
+        :param rejected: Rejected candidates per feature.
+        :type rejected: numpy.ndarray
+        """
+        if not len(feature_ids):
+            return
+        self.feature_ids.append(np.asarray(feature_ids, dtype=np.int64))
+        self.requested.append(np.asarray(requested, dtype=np.int64))
+        self.achieved.append(np.asarray(achieved, dtype=np.int64))
+        self.rejected.append(np.asarray(rejected, dtype=np.int64))
+        self.count += len(feature_ids)
+
+    def columns(self):
+        """Return the feature ID, requested, achieved and rejected columns."""
+        return tuple(
+            np.concatenate(column) if column else np.zeros(0, dtype=np.int64)
+            for column in (self.feature_ids, self.requested, self.achieved, self.rejected)
+        )
+
+
+class PointGenerator:
+    """Generate random points for all features of a line layer.
+
+    The generator is created on the main thread, where it snapshots the layer
+    into a thread-safe feature source; :meth:`run` may then be called from a
+    worker thread.
+    """
+
+    BATCH_FEATURES = 10000
+    CONSTRAINED_GROUP_FEATURES = 500
+    # Number of feature IDs listed per kind of invalid value
+    REPORTED_INVALID_IDS = 5
+    # Minimum number of seconds between two progress reports
+    PROGRESS_INTERVAL = 0.1
+
+    def __init__(self, layer, settings, destination, cache=None, store=None):
+        """Constructor.
+
+        :param layer: Source line layer.
+        :type layer: QgsVectorLayer
+
+        :param settings: Run parameters.
+        :type settings: GenerationSettings
+
+        :param destination: Output memory layer or file.
+        :type destination: MemoryDestination
+
+        :param cache: Optional session cache of prepared lines.
+        :type cache: LineTableCache
+
+        :param store: Optional persistent store of prepared lines.
+        :type store: GeometryStore
+        """
+        self.settings = settings
+        self.destination = destination
+        # Only used on the main thread, the run reads from the source
+        self.layer = layer
+        self.source = QgsVectorLayerFeatureSource(layer)
+        self.layer_id = layer.id()
+
+        self.context = QgsExpressionContext()
+        self.context.appendScope(QgsExpressionContextUtils.layerScope(layer))
+        self.context.setFields(layer.fields())
+
+        self.request, self.local_filter = source_request(
+            layer, settings.selected_only, settings.extent,
+            settings.filter_expression, self.context, settings.feature_ids
+        )
+        # Number of features the run reads, None when the provider filters
+        # them by extent or expression and only reading them would tell
+        filtered = ((settings.extent is not None and not settings.extent.isEmpty())
+                    or (settings.filter_expression and self.local_filter is None))
+        if filtered:
+            self.feature_count = None
+        elif settings.feature_ids is not None:
+            self.feature_count = len(settings.feature_ids)
+        elif settings.selected_only:
+            self.feature_count = layer.selectedFeatureCount()
+        else:
+            self.feature_count = max(layer.featureCount(), 0)
+
+        # Data-defined parameters by name of the FeatureGroup column
+        self.values = {}
+        for name, text in (("counts", settings.expression),
+                           ("start_percent", settings.start_expression),
+                           ("end_percent", settings.end_expression),
+                           ("min_distance", settings.min_distance_expression)):
+            if text:
+                self.values[name] = DataDefinedValue(text, layer, self.context)
+
+        # Only fetch the attributes the expressions need
+        columns = set()
+        for value in self.values.values():
+            columns |= value.columns
+        if self.local_filter is not None:
+            columns |= set(self.local_filter.referencedColumns())
+        if not columns:
+            self.request.setNoAttributes()
+        elif QgsFeatureRequest.ALL_ATTRIBUTES not in columns:
+            self.request.setSubsetOfAttributes(columns, layer.fields())
+        # Plain field references do not need the feature in the context
+        self.needs_context = self.local_filter is not None or any(
+            value.expression is not None for value in self.values.values()
+        )
+
+        unfiltered = (not settings.selected_only and settings.extent is None
+                      and not settings.filter_expression and settings.feature_ids is None)
+        self.cache = cache
+        self.cached_ids = None
+        # Record the feature IDs of a complete read for later runs
+        self.record_ids = False
+        self.store = store
+        self.store_key = None
+        self.stored = None
+        if store is not None:
+            self.store_key = source_key(layer)
+            if self.store_key is not None:
+                self.stored = store.open(self.store_key)
+        if self.stored is not None:
+            feature_ids = self.stored.feature_ids.tolist()
+        elif cache is not None:
+            self.revision = cache.watch(layer)
+            feature_ids = cache.feature_ids(self.layer_id, self.revision)
+            self.record_ids = feature_ids is None and unfiltered
+        else:
+            feature_ids = None
+        # A complete read is written to the store for later sessions
+        self.write_store = self.store_key is not None and self.stored is None and unfiltered
+
+        self.fetch_geometry = True
+        if feature_ids is not None:
+            if unfiltered and not columns:
+                # Everything is cached, the provider is not read at all
+                self.cached_ids = feature_ids
+            else:
+                self.fetch_geometry = False
+                self.request.setFlags(
+                    self.request.flags() | QgsFeatureRequest.Flag.NoGeometry
+                )
+
+        self.run_seed = settings.seed
+        if self.run_seed < 0:
+            self.run_seed = random_run_seed()
+
+        # The layer-wide index needs one distance for all features
+        self.index = None
+        if (settings.global_min_distance and not settings.along_line
+                and settings.min_distance > 0 and "min_distance" not in self.values):
+            self.index = GridIndex(settings.min_distance)
+
+        self.warnings = []
+        # Message -> (number of skipped features, first feature IDs)
+        self.invalid_features = {}
+        # Features requesting more points along the line than fit with the
+        # minimum distance: (number of features, points missing, first IDs)
+        self.over_capacity = (0, 0, [])
+        # Feature IDs and point counts in output order, when tracked
+        self.produced = ([], [])
+        self.shortfalls = Shortfalls()
+        self.report = RunReport(bool(settings.report_path))
+        self.profile = RunProfile(bool(settings.profile_path))
+        self.layer_stats = {
+            "name": layer.name(),
+            "provider": layer.providerType(),
+            "feature_count": layer.featureCount(),
+            "crs": layer.crs().authid(),
+        }
+        self.point_count = 0
+        self.canceled = False
+        self._feedback = None
+        self._last_progress = 0.0
+
+    def run(self, feedback=None):
+        """Read the features, sample them and write the points.
+
+        :param feedback: Optional object providing ``isCanceled()`` and
+            ``setProgress(percent)``, e.g. a QgsTask or a QgsFeedback.
+
+        :returns: False if the run was canceled.
+        :rtype: bool
+
+        :raises WriteError: The destination rejected points; the output is
+            incomplete and must be discarded.
+        """
+        with self.profile:
+            return self._run(feedback)
+
+    def _run(self, feedback):
+        self._feedback = feedback
+        settings = self.settings
+        started = time.perf_counter()
+        writer = PointWriter(
+            self.destination.sink, self.destination.fields, self.destination.first_id,
+            report=self.report,
+        )
+
+        # Without spacing constraints the features are sampled in batches
+        batched = (settings.min_distance <= 0 and not settings.along_line
+                   and "min_distance" not in self.values)
+        # The layer-wide index is sequential by nature, it stays serial
+        sampler = None
+        if settings.workers > 1 and self.index is None:
+            sampler = PartitionSampler(settings.workers, self.sampling_params(batched))
+        group_size = self.group_features(settings.workers if sampler is not None else 1, batched)
+
+        def sample(item):
+            group, done = item
+            points = self.sample_group(group, batched, sampler)
+            self.report_progress(done)
+            self.profile.checkpoint()
+            return points, sum(array.nbytes for array in points)
+
+        try:
+            if settings.pipelined:
+                completed = run_pipeline(
+                    self.read_groups(group_size, settings.memory_limit // 8),
+                    sample,
+                    lambda points: writer.add_points(*points),
+                    settings.memory_limit,
+                    self.is_canceled,
+                )
+            else:
+                completed = True
+                for item, _ in self.read_groups(group_size):
+                    if self.is_canceled():
+                        completed = False
+                        break
+                    writer.add_points(*sample(item)[0])
+        finally:
+            if sampler is not None:
+                sampler.close()
+        writer.close()
+        self.report_invalid_features()
+        self.report_over_capacity()
+        self.report_shortfalls()
+
+        self.canceled = not completed or self.is_canceled()
+        self.point_count = writer.written
+        self.report.points = writer.written
+        self.report.wall_seconds = time.perf_counter() - started
+        if feedback is not None and not self.canceled:
+            feedback.setProgress(100)
+        return not self.canceled
+
+    def write_report(self):
+        """Write the JSON run report to ``settings.report_path``.
+
+        Called once the output is finished, so the size of an output file is
+        known.
+        """
+        details = {
+            "layer": self.layer_stats,
+            "parameters": self.parameters(),
+            "run_seed": self.run_seed,
+            "canceled": self.canceled,
+            "features_short": len(self.shortfalls),
+            "features_skipped": sum(count for count, _ in self.invalid_features.values()),
+        }
+        path = getattr(self.destination, "path", None)
+        if path and os.path.exists(path):
+            details["output_file_bytes"] = os.path.getsize(path)
+        self.report.write(self.settings.report_path, **details)
+
+    def write_profile(self):
+        """Write the profile and the allocations report of the run to
+        ``settings.profile_path``, headed by the input layer and the
+        parameters.
+
+        :returns: The paths of the ``.pstats`` file and of the report.
+        :rtype: (str, str)
+        """
+        stats = self.layer_stats
+        header = [
+            f"Random points run of {stats['name']} ({stats['provider']}, "
+            f"{stats['feature_count']:,} features, {stats['crs']})",
+            f"Points: {self.point_count:,}, run seed {self.run_seed}"
+            f"{', canceled' if self.canceled else ''}",
+            "",
+            "Parameters:",
+        ]
+        header.extend(f"  {name}: {value}" for name, value in self.parameters().items())
+        return self.profile.write(self.settings.profile_path, header)
+
+    def parameters(self):
+        """Return the settings of the run as plain data."""
+        parameters = dict(vars(self.settings))
+        if parameters["extent"] is not None:
+            parameters["extent"] = parameters["extent"].toString()
+        return parameters
+
+    def is_canceled(self):
+        """Return True if the feedback of the run requests a cancelation."""
+        return self._feedback is not None and self._feedback.isCanceled()
+
+    def read_lines(self, feedback=None):
+        """Read and validate the source features like :meth:`run`, without
+        sampling or writing anything.
+
+        :param feedback: Optional object providing ``isCanceled()``.
+
+        :returns: Iterator of ``(FeatureGroup, features read)``.
+        """
+        self._feedback = feedback
+        for item, _ in self.read_groups(self.BATCH_FEATURES):
+            yield item
+
+    @classmethod
+    def group_features(cls, workers, batched):
+        """Return the number of features read and sampled together.
+
+        :param workers: Number of worker processes, 1 when the features are
+            sampled in the thread of the run.
+        :type workers: int
+
+        :param batched: The features are sampled in batches, without
+            spacing constraints.
+        :type batched: bool
+
+        :rtype: int
+        """
+        if workers > 1:
+            return cls.BATCH_FEATURES * workers
+        if batched:
+            return cls.BATCH_FEATURES
+        # Smaller groups keep cancelation responsive on slow features
+        return cls.CONSTRAINED_GROUP_FEATURES
+
+    def read_groups(self, group_size, max_bytes=None):
+        """Read the source features in groups of prepared lines.
+
+        The data-defined parameters are evaluated in the same pass and
+        validated per group, see :meth:`feature_group`.
+
+        :param group_size: Maximum number of features of a group.
+        :type group_size: int
+
+        :param max_bytes: Optional maximum vertex memory of a group.
+        :type max_bytes: int
+
+        :returns: Iterator of ``((FeatureGroup, features read), group bytes)``.
+        """
+        read_ids = [] if self.record_ids else None
+        writer = self.store.writer(self.store_key) if self.write_store else None
+        try:
+            yield from self._read_groups(group_size, max_bytes, read_ids, writer)
+        except BaseException:
+            if writer is not None:
+                writer.abort()
+            raise
+        if writer is not None:
+            if self.is_canceled():
+                writer.abort()
+            else:
+                writer.commit()
+        if read_ids is not None and not self.is_canceled():
+            self.cache.set_feature_ids(self.layer_id, self.revision, read_ids)
+
+    def _read_groups(self, group_size, max_bytes, read_ids, writer):
+        report = self.report
+        # Stage times are summed per feature only when the run is timed
+        timed = report.enabled
+        seconds = report.seconds
+        clock = time.perf_counter
+        feature_ids = []
+        tables = []
+        raw = {name: [] for name in self.values}
+        size = 0
+        done = 0
+        for fid, feature in report.timed_iterator(PROVIDER_READ, self.source_features()):
+            done += 1
+            if read_ids is not None:
+                read_ids.append(fid)
+            if timed:
+                start = clock()
+            if self.needs_context:
+                self.context.setFeature(feature)
+            selected = (self.local_filter is None
+                        or self.local_filter.evaluate(self.context))
+            if selected:
+                for name, value in self.values.items():
+                    raw[name].append(value.value(feature))
+            if timed:
+                now = clock()
+                seconds[EXPRESSIONS] += now - start
+                start = now
+            if not selected:
+                continue
+            table = self.line_table_for(fid, feature)
+            if writer is not None:
+                writer.add(fid, table)
+            if timed:
+                seconds[PREPARE] += clock() - start
+            feature_ids.append(fid)
+            tables.append(table)
+            size += table.x.nbytes * 3
+            if len(tables) >= group_size or (max_bytes and size >= max_bytes):
+                report.features_read = done
+                with report.stage(VALIDATE):
+                    group = self.feature_group(feature_ids, tables, raw)
+                if len(group):
+                    yield (group, done), group.vertex_bytes()
+                feature_ids = []
+                tables = []
+                raw = {name: [] for name in self.values}
+                size = 0
+                if self.is_canceled():
+                    return
+        report.features_read = done
+        if tables:
+            with report.stage(VALIDATE):
+                group = self.feature_group(feature_ids, tables, raw)
+            if len(group):
+                yield (group, done), group.vertex_bytes()
+
+    def source_features(self):
+        """Iterate the source features as ``(feature id, QgsFeature)``.
+
+        When all lines are cached the features come from the cached feature
+        list and are None, because nothing else is needed from them.
+        """
+        if self.cached_ids is not None:
+            for fid in self.cached_ids:
+                yield fid, None
+            return
+        for feature in self.source.getFeatures(self.request):
+            yield feature.id(), feature
+
+    def line_table_for(self, fid, feature):
+        """Return the prepared line of a feature, from the caches if possible."""
+        table = None
+        if self.stored is not None:
+            table = self.stored.table(fid)
+        elif self.cache is None:
+            return line_table(feature.geometry())
+        else:
+            table = self.cache.get(self.layer_id, fid, self.revision)
+        if table is None:
+            geometry = None
+            if self.fetch_geometry and feature is not None:
+                geometry = feature.geometry()
+            else:
+                request = QgsFeatureRequest().setFilterFid(fid).setNoAttributes()
+                for source_feature in self.source.getFeatures(request):
+                    geometry = source_feature.geometry()
+            table = line_table(geometry)
+            if self.stored is None:
+                self.cache.put(self.layer_id, fid, self.revision, table)
+        return table
+
+    def feature_group(self, feature_ids, tables, raw):
+        """Build the parameter columns of a group of features.
+
+        Features with an invalid data-defined value are dropped and counted
+        in :attr:`invalid_features`, features without points are dropped
+        silently.
+
+        :param feature_ids: Feature IDs.
+        :type feature_ids: list
+
+        :param tables: Prepared lines.
+        :type tables: list
+
+        :param raw: Raw values of the data-defined parameters by column name.
+        :type raw: dict
+
+        :rtype: FeatureGroup
+        """
+        settings = self.settings
+        feature_ids = np.asarray(feature_ids, dtype=np.int64)
+        size = feature_ids.size
+        columns = {
+            "counts": np.full(size, float(settings.num_points)),
+            "start_percent": np.full(size, float(settings.start_percent)),
+            "end_percent": np.full(size, float(settings.end_percent)),
+            "min_distance": np.full(size, float(settings.min_distance)),
+        }
+        for name, values in raw.items():
+            columns[name] = numeric_column(values)
+
+        valid = np.ones(size, dtype=bool)
+
+        def check(message, invalid):
+            invalid &= valid
+            if invalid.any():
+                self.add_invalid_features(message, feature_ids[invalid])
+                valid[invalid] = False
+
+        with np.errstate(invalid="ignore"):
+            counts = columns["counts"]
+            check("the number of points is not a non-negative number",
+                  ~np.isfinite(counts) | (counts < 0))
+            start = columns["start_percent"]
+            end = columns["end_percent"]
+            check("the start or end offset is not a percentage between 0 and 100",
+                  ~(np.isfinite(start) & np.isfinite(end))
+                  | (start < 0) | (end < 0) | (start > 100) | (end > 100))
+            check("the start and end offsets add up to more than 100%",
+                  start + end > 100)
+            min_distance = columns["min_distance"]
+            check("the minimum distance is not a non-negative number",
+                  ~np.isfinite(min_distance) | (min_distance < 0))
+            if settings.along_line and settings.max_gap > 0:
+                check("the minimum distance is larger than the maximum gap",
+                      min_distance > settings.max_gap)
+        counts = np.where(valid, counts, 0).astype(np.int64)
+        # A zero count is a valid way to skip a feature, like a NULL or
+        # empty geometry without a vertex to place points on
+        valid &= counts > 0
+        valid &= np.fromiter((table.x.size > 0 for table in tables), dtype=bool, count=size)
+        if settings.along_line:
+            self.check_capacity(feature_ids, tables, counts, start, end, min_distance, valid)
+
+        group = FeatureGroup(feature_ids, tables, counts, start, end, min_distance)
+        return group if valid.all() else group.subset(valid)
+
+    def check_capacity(self, feature_ids, tables, counts, start, end, min_distance, valid):
+        """Count the features requesting more points along the line than
+        fit between the offsets with the minimum distance.
+
+        They are known from the parameters alone, before sampling, and get
+        the feasible maximum of points.
+        """
+        missing = np.zeros(len(feature_ids), dtype=np.int64)
+        for i in np.flatnonzero(valid & (min_distance > 0)).tolist():
+            low, high = offset_range(tables[i].length, start[i], end[i])
+            feasible = max_spaced_count(high - low, min_distance[i])
+            if counts[i] > feasible:
+                missing[i] = counts[i] - feasible
+        over = np.flatnonzero(missing)
+        if not over.size:
+            return
+        count, points, first_ids = self.over_capacity
+        wanted = self.REPORTED_INVALID_IDS - len(first_ids)
+        if wanted > 0:
+            first_ids = first_ids + feature_ids[over[:wanted]].tolist()
+        self.over_capacity = (count + over.size, points + int(missing.sum()), first_ids)
+
+    def report_over_capacity(self):
+        """Summarize the features too short for their points in one warning."""
+        count, points, first_ids = self.over_capacity
+        if not count:
+            return
+        ids = ", ".join(str(fid) for fid in first_ids)
+        if count > len(first_ids):
+            ids += ", ..."
+        self.warnings.append(
+            f"{count} feature(s) are too short for the requested number of points with "
+            f"the minimum distance along the line, {points} point(s) were left out "
+            f"(feature IDs {ids})"
+        )
+
+    def add_invalid_features(self, message, feature_ids):
+        """Count features skipped because of an invalid data-defined value."""
+        count, first_ids = self.invalid_features.get(message, (0, []))
+        missing = self.REPORTED_INVALID_IDS - len(first_ids)
+        if missing > 0:
+            first_ids = first_ids + [int(fid) for fid in feature_ids[:missing]]
+        self.invalid_features[message] = (count + len(feature_ids), first_ids)
+
+    def report_invalid_features(self):
+        """Turn the invalid feature counts into one warning per kind."""
+        for message, (count, first_ids) in self.invalid_features.items():
+            ids = ", ".join(str(fid) for fid in first_ids)
+            if count > len(first_ids):
+                ids += ", ..."
+            self.warnings.append(
+                f"{count} feature(s) skipped because {message} (feature IDs {ids})"
+            )
+
+    def report_shortfalls(self):
+        """Summarize the features that got fewer points in one warning."""
+        # Along the line, every shortfall was reported before sampling
+        if not self.shortfalls or self.settings.along_line:
+            return
+        feature_ids, requested, achieved, _ = self.shortfalls.columns()
+        missing = int((requested - achieved).sum())
+        ids = ", ".join(str(fid) for fid in feature_ids[:self.REPORTED_INVALID_IDS].tolist())
+        if len(feature_ids) > self.REPORTED_INVALID_IDS:
+            ids += ", ..."
+        self.warnings.append(
+            f"{len(feature_ids)} feature(s) got {missing} point(s) fewer than requested "
+            f"because the minimum distance could not be kept (feature IDs {ids})"
+        )
+
+    def report_progress(self, done):
+        """Report progress at most every PROGRESS_INTERVAL seconds.
+
+        Without a known feature count only the features read are reported,
+        to a Processing feedback.
+        """
+        if self._feedback is None:
+            return
+        now = time.monotonic()
+        if now - self._last_progress < self.PROGRESS_INTERVAL:
+            return
+        self._last_progress = now
+        if self.feature_count:
+            self._feedback.setProgress(min(100.0, 100.0 * done / self.feature_count))
+        elif hasattr(self._feedback, "setProgressText"):
+            self._feedback.setProgressText(f"{done:,} features read")
+
+    def sampling_params(self, batched):
+        """Return the sampling parameters handed to worker processes."""
+        settings = self.settings
+        return {
+            "batched": batched,
+            "seed": self.run_seed,
+            "along_line": settings.along_line,
+            "max_gap": settings.max_gap,
+        }
+
+    def sample_group(self, group, batched, sampler=None):
+        """Sample a group of prepared features.
+
+        :param group: Lines and parameters of the features.
+        :type group: FeatureGroup
+
+        :param batched: Sample all features with one vectorized call.
+        :type batched: bool
+
+        :param sampler: Worker pool, None to sample in this thread.
+        :type sampler: PartitionSampler
+
+        :returns: Tuple of distance, x and y arrays.
+        :rtype: (numpy.ndarray, numpy.ndarray, numpy.ndarray)
+        """
+        with self.report.stage(SAMPLE):
+            return self._sample_group(group, batched, sampler)
+
+    def _sample_group(self, group, batched, sampler):
+        if sampler is not None:
+            line_index, distances, xs, ys, shortfall, total_rejected = sampler.sample(group)
+            self.report.rejected += total_rejected
+            lines, achieved, rejected = shortfall
+            self.shortfalls.add(group.feature_ids[lines], group.counts[lines],
+                                achieved, rejected)
+        elif batched:
+            line_index, distances, xs, ys = sample_batch(
+                LineBatch(group.tables), self.run_seed, group.feature_ids,
+                group.counts, group.start_percent, group.end_percent
+            )
+        else:
+            line_index = None
+            columns = ([], [], [])
+            rejected = np.zeros(len(group), dtype=np.int64)
+            for i, table in enumerate(group.tables):
+                *points, rejected[i] = self.sample_feature(
+                    table, int(group.counts[i]),
+                    FeatureStream(self.run_seed, int(group.feature_ids[i])),
+                    float(group.start_percent[i]), float(group.end_percent[i]),
+                    float(group.min_distance[i]),
+                )
+                for column, values in zip(columns, points):
+                    column.append(values)
+            distances, xs, ys = (np.concatenate(column) for column in columns)
+            self.report.rejected += int(rejected.sum())
+            achieved = np.fromiter((values.size for values in columns[0]),
+                                   dtype=np.int64, count=len(group))
+            short = achieved < group.counts
+            self.shortfalls.add(group.feature_ids[short], group.counts[short],
+                                achieved[short], rejected[short])
+            if self.settings.track_points:
+                line_index = np.repeat(np.arange(len(group)), achieved)
+
+        if self.settings.track_points:
+            self.produced[0].append(group.feature_ids)
+            self.produced[1].append(np.bincount(line_index, minlength=len(group)))
+        return distances, xs, ys
+
+    def sample_feature(self, table, num_points, rng, start_percent, end_percent,
+                       min_distance):
+        """Generate random points along a prepared line.
+
+        :param table: Prepared line.
+        :type table: LineTable
+
+        :param rng: Random stream of the feature.
+        :type rng: FeatureStream
+
+        :returns: Tuple of distance, x and y arrays, and the number of
+            rejected candidates.
+        :rtype: (numpy.ndarray, numpy.ndarray, numpy.ndarray, int)
+        """
+        settings = self.settings
+        return sample_line_constrained(
+            table, rng, num_points, min_distance, settings.along_line,
+            settings.max_gap, start_percent, end_percent, self.index
+        )
@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+"""Session cache of prepared line geometries.
+
+Prepared lines are kept between runs, so tuning the seed, counts or offsets
+on the same layer does not read and measure every geometry again. Entries
+are keyed by layer, feature and the geometry revision of the layer, and the
+least recently used entries are evicted beyond the memory limit.
+"""
+
+import threading
+from collections import OrderedDict
+
+
+class LayerState:
+    """Revision and complete feature list of one cached layer."""
+
+    def __init__(self):
+        """Constructor."""
+        # Bumped whenever the data of the layer changed as a whole
+        self.revision = 0
+        # IDs of all features in provider order, known after a complete
+        # unfiltered read while every line is cached, otherwise None
+        self.feature_ids = None
+
+
+class LineTableCache:
+    """LRU cache of LineTable objects shared by the runs of a session.
+
+    The cache is filled from the generation thread and invalidated from the
+    layer signals on the main thread, all access is serialized by a lock.
+    """
+
+    DEFAULT_MEMORY_LIMIT = 512 * 1024 * 1024
+
+    def __init__(self, memory_limit=DEFAULT_MEMORY_LIMIT):
+        """Constructor.
+
+        :param memory_limit: Maximum memory of the cached arrays in bytes.
+        :type memory_limit: int
+        """
+        self.memory_limit = memory_limit
+        self.used = 0
+        self.entries = OrderedDict()
+        self.layers = {}
+        # Layer signal connections made by watch(), by layer ID
+        self.connections = {}
+        self.lock = threading.Lock()
+
+    def watch(self, layer):
+        """Invalidate the entries of ``layer`` when its data changes.
+
+        Must be called on the main thread.
+
+        :returns: Current geometry revision of the layer.
+        :rtype: int
+        """
+        layer_id = layer.id()
+        with self.lock:
+            if layer_id in self.layers:
+                return self.layers[layer_id].revision
+            self.layers[layer_id] = LayerState()
+
+        # Edits invalidate the edited features only; the whole layer only
+        # when it is filtered differently or reloaded from its source
+        connections = [
+            (layer.geometryChanged,
+             lambda fid, _geometry: self.invalidate_feature(layer_id, fid)),
+            (layer.featureDeleted, lambda fid: self.invalidate_feature(layer_id, fid)),
+            (layer.featureAdded, lambda _fid: self.invalidate_feature_ids(layer_id)),
+            (layer.subsetStringChanged, lambda: self.invalidate_layer(layer_id)),
+            (layer.dataSourceChanged, lambda: self.remove_layer(layer_id)),
+            (layer.dataProvider().dataChanged, lambda: self.invalidate_layer(layer_id)),
+            (layer.willBeDeleted, lambda: self.remove_layer(layer_id)),
+        ]
+        for signal, slot in connections:
+            signal.connect(slot)
+        self.connections[layer_id] = connections
+        return 0
+
+    def get(self, layer_id, fid, revision):
+        """Return the cached line of a feature, None when not cached."""
+        key = (layer_id, fid, revision)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            self.entries.move_to_end(key)
+            return entry
+
+    def put(self, layer_id, fid, revision, table):
+        """Cache the line of a feature, evicting the oldest lines if needed."""
+        size = table.nbytes
+        if size > self.memory_limit:
+            return
+        key = (layer_id, fid, revision)
+        with self.lock:
+            state = self.layers.get(layer_id)
+            if state is None or state.revision != revision:
+                return
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.used -= old.nbytes
+            self.entries[key] = table
+            self.used += size
+            self._evict(self.memory_limit)
+
+    def feature_ids(self, layer_id, revision):
+        """Return all feature IDs of a completely cached layer, or None."""
+        with self.lock:
+            state = self.layers.get(layer_id)
+            if state is None or state.revision != revision:
+                return None
+            return state.feature_ids
+
+    def set_feature_ids(self, layer_id, revision, feature_ids):
+        """Record the IDs read by a complete unfiltered run.
+
+        Ignored unless the line of every feature is still cached.
+        """
+        with self.lock:
+            state = self.layers.get(layer_id)
+            if state is None or state.revision != revision:
+                return
+            if all((layer_id, fid, revision) in self.entries for fid in feature_ids):
+                state.feature_ids = feature_ids
+
+    def invalidate_feature(self, layer_id, fid):
+        """Drop the line of an edited or deleted feature."""
+        with self.lock:
+            state = self.layers.get(layer_id)
+            if state is None:
+                return
+            state.feature_ids = None
+            table = self.entries.pop((layer_id, fid, state.revision), None)
+            if table is not None:
+                self.used -= table.nbytes
+
+    def invalidate_feature_ids(self, layer_id):
+        """Forget the complete feature list of a layer, e.g. after an insert."""
+        with self.lock:
+            state = self.layers.get(layer_id)
+            if state is not None:
+                state.feature_ids = None
+
+    def invalidate_layer(self, layer_id):
+        """Invalidate all lines of a layer.
+
+        The lines of older revisions are never returned again and are
+        evicted like any other unused entry.
+        """
+        with self.lock:
+            state = self.layers.get(layer_id)
+            if state is not None:
+                state.revision += 1
+                state.feature_ids = None
+
+    def remove_layer(self, layer_id):
+        """Release the lines of a layer removed from the project and stop
+        watching it. Must be called on the main thread."""
+        for signal, slot in self.connections.pop(layer_id, []):
+            try:
+                signal.disconnect(slot)
+            except (TypeError, RuntimeError):
+                # The layer or its provider was already deleted
+                pass
+        with self.lock:
+            self.layers.pop(layer_id, None)
+            for key in [key for key in self.entries if key[0] == layer_id]:
+                self.used -= self.entries.pop(key).nbytes
+
+    def set_memory_limit(self, memory_limit):
+        """Change the memory limit and evict the lines beyond it."""
+        with self.lock:
+            self.memory_limit = memory_limit
+            self._evict(memory_limit)
+
+    def clear(self):
+        """Release all cached lines."""
+        with self.lock:
+            self.entries.clear()
+            self.used = 0
+            for state in self.layers.values():
+                state.feature_ids = None
+
+    def _evict(self, memory_limit):
+        while self.used > memory_limit and self.entries:
+            (layer_id, _, revision), table = self.entries.popitem(last=False)
+            self.used -= table.nbytes
+            state = self.layers.get(layer_id)
+            if state is not None and state.revision == revision:
+                state.feature_ids = None
@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+"""Persistent on-disk store of prepared line geometries.
+
+The prepared lines of a whole source are written once to flat binary files
+under the QGIS profile directory and memory-mapped by later sessions, so a
+slow source (network share, large shapefile, WFS) is not read again until it
+changes. An entry is keyed by the provider, source URI, subset string and
+the modification time the provider or the file system reports.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from qgis.core import QgsApplication, QgsProviderRegistry
+
+from .sampling_engine import LineTable
+
+STORE_FOLDER = "random_points_cache"
+META_FILE = "meta.json"
+ARRAY_FILES = ("x.bin", "y.bin", "cumulative.bin")
+# Age after which an unfinished entry is considered abandoned
+STALE_SECONDS = 24 * 60 * 60
+
+
+def source_stamp(layer):
+    """Return a string that changes whenever the source data changes."""
+    provider = layer.dataProvider()
+    timestamp = provider.dataTimestamp() if provider is not None else None
+    if timestamp is not None and timestamp.isValid():
+        return f"time:{timestamp.toMSecsSinceEpoch()}"
+    parts = QgsProviderRegistry.instance().decodeUri(layer.providerType(), layer.source())
+    path = parts.get("path")
+    if path and os.path.isfile(path):
+        stat = os.stat(path)
+        return f"file:{stat.st_mtime_ns}:{stat.st_size}"
+    # No modification time available, fall back to the provider statistics
+    return f"stats:{layer.featureCount()}:{layer.extent().toString()}"
+
+
+def source_key(layer):
+    """Return the store key of a layer, None if it must not be stored.
+
+    Layers with unsaved edits are not stored, the edit buffer is not part
+    of the source.
+    """
+    if layer.dataProvider() is None or layer.isModified():
+        return None
+    text = "\n".join((
+        layer.providerType(), layer.source(), layer.subsetString(),
+        source_stamp(layer),
+    ))
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class StoredLines:
+    """Memory-mapped prepared lines of one source."""
+
+    def __init__(self, folder):
+        """Open the entry in ``folder``.
+
+        :raises OSError, ValueError: If the entry is missing or damaged.
+        """
+        with open(os.path.join(folder, META_FILE), encoding="utf-8") as meta_file:
+            meta = json.load(meta_file)
+        self.feature_ids = np.load(os.path.join(folder, "feature_ids.npy"))
+        self.offsets = np.load(os.path.join(folder, "offsets.npy"))
+        vertices = int(meta["vertices"])
+        if self.offsets.size != self.feature_ids.size + 1 or self.offsets[-1] != vertices:
+            raise ValueError("Inconsistent geometry store entry")
+        self.x, self.y, self.cumulative = (
+            np.memmap(os.path.join(folder, name), dtype=np.float64, mode="r",
+                      shape=(vertices,))
+            if vertices else np.zeros(0)
+            for name in ARRAY_FILES
+        )
+        self.order = np.argsort(self.feature_ids, kind="stable")
+        self.sorted_ids = self.feature_ids[self.order]
+
+    def table(self, fid):
+        """Return the line of a feature, None if it is not stored."""
+        position = np.searchsorted(self.sorted_ids, fid)
+        if position >= self.sorted_ids.size or self.sorted_ids[position] != fid:
+            return None
+        index = self.order[position]
+        start, end = self.offsets[index], self.offsets[index + 1]
+        return LineTable.from_arrays(
+            self.x[start:end], self.y[start:end], self.cumulative[start:end]
+        )
+
+
+class StoreWriter:
+    """Stream the lines of a complete read into a new store entry."""
+
+    def __init__(self, root, key):
+        """Constructor.
+
+        :param root: Folder of the store.
+        :type root: str
+
+        :param key: Key of the new entry, see :func:`source_key`.
+        :type key: str
+        """
+        self.target = os.path.join(root, key)
+        self.folder = tempfile.mkdtemp(prefix=key + ".", suffix=".tmp", dir=root)
+        self.files = [open(os.path.join(self.folder, name), "wb") for name in ARRAY_FILES]
+        self.feature_ids = []
+        self.offsets = [0]
+        self.failed = False
+
+    def add(self, fid, table):
+        """Append the line of a feature.
+
+        A write error, e.g. a full disk, only drops the entry.
+        """
+        if self.failed:
+            return
+        count = table.x.size
+        try:
+            table.x.tofile(self.files[0])
+            table.y.tofile(self.files[1])
+            table.cumulative[:count].tofile(self.files[2])
+        except OSError:
+            self.failed = True
+            return
+        self.feature_ids.append(fid)
+        self.offsets.append(self.offsets[-1] + count)
+
+    def commit(self):
+        """Publish the entry. An entry written meanwhile by another run wins."""
+        if self.failed:
+            self.abort()
+            return
+        for file in self.files:
+            file.close()
+        try:
+            np.save(os.path.join(self.folder, "feature_ids.npy"),
+                    np.asarray(self.feature_ids, dtype=np.int64))
+            np.save(os.path.join(self.folder, "offsets.npy"),
+                    np.asarray(self.offsets, dtype=np.int64))
+            with open(os.path.join(self.folder, META_FILE), "w",
+                      encoding="utf-8") as meta_file:
+                json.dump({"features": len(self.feature_ids),
+                           "vertices": self.offsets[-1]}, meta_file)
+            os.rename(self.folder, self.target)
+        except OSError:
+            shutil.rmtree(self.folder, ignore_errors=True)
+
+    def abort(self):
+        """Drop the partly written entry."""
+        for file in self.files:
+            file.close()
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+
+class GeometryStore:
+    """Folder of stored sources with a disk space limit."""
+
+    DEFAULT_DISK_LIMIT = 4 * 1024 * 1024 * 1024
+
+    def __init__(self, root=None, disk_limit=DEFAULT_DISK_LIMIT):
+        """Constructor.
+
+        :param root: Folder of the store, by default in the QGIS profile.
+        :type root: str
+
+        :param disk_limit: Size in bytes above which the least recently
+            used entries are deleted.
+        :type disk_limit: int
+        """
+        if root is None:
+            root = os.path.join(QgsApplication.qgisSettingsDirPath(), STORE_FOLDER)
+        self.root = root
+        self.disk_limit = disk_limit
+
+    def open(self, key):
+        """Return the stored lines of ``key``, None if not stored."""
+        folder = os.path.join(self.root, key)
+        if not os.path.isdir(folder):
+            return None
+        try:
+            stored = StoredLines(folder)
+        except (OSError, ValueError, KeyError):
+            shutil.rmtree(folder, ignore_errors=True)
+            return None
+        # The modification time of the folder orders the entries by last use
+        try:
+            os.utime(folder)
+        except OSError:
+            pass
+        return stored
+
+    def writer(self, key):
+        """Return a writer for a new entry, None if the folder is not writable."""
+        try:
+            os.makedirs(self.root, exist_ok=True)
+            self.prune()
+            return StoreWriter(self.root, key)
+        except OSError:
+            return None
+
+    def prune(self):
+        """Delete the least recently used entries beyond the disk limit."""
+        entries = []
+        for name in os.listdir(self.root):
+            folder = os.path.join(self.root, name)
+            if not os.path.isdir(folder):
+                continue
+            if name.endswith(".tmp"):
+                # Left behind by an interrupted session
+                if time.time() - os.path.getmtime(folder) > STALE_SECONDS:
+                    shutil.rmtree(folder, ignore_errors=True)
+                continue
+            size = sum(entry.stat().st_size for entry in os.scandir(folder))
+            entries.append((os.path.getmtime(folder), size, folder))
+        total = sum(size for _, size, _ in entries)
+        for _, size, folder in sorted(entries):
+            if total <= self.disk_limit:
+                break
+            # Entries mapped by a running session cannot be deleted on Windows
+            shutil.rmtree(folder, ignore_errors=True)
+            if not os.path.isdir(folder):
+                total -= size
+
+    def clear(self):
+        """Delete all stored entries."""
+        shutil.rmtree(self.root, ignore_errors=True)
@@ -0,0 +1,306 @@
+# -*- coding: utf-8 -*-
+"""Incremental regeneration of the points of edited source features.
+
+A tracked run records how many points every source feature produced. As
+points are written in feature order with consecutive ID attributes, this
+gives the ID range of the points of each feature. The tracker then follows
+the edit signals of the source layer and, on request, deletes and
+regenerates the points of the added, changed and deleted features only.
+Every feature samples its own random stream, so the points of untouched
+features stay exactly the same.
+
+An update runs as a :class:`UpdateTask`: the new points are generated in
+the background, and the output layer is only changed once they are ready,
+on the main thread. The feature IDs of the output points are read once, on
+the first update, and kept up to date from then on, so the points to delete
+are found without scanning the output layer again.
+"""
+
+import copy
+
+import numpy as np
+from qgis.core import (
+    Qgis, QgsFeatureRequest, QgsMessageLog, QgsTask, QgsVectorLayerFeatureSource,
+)
+
+from .generator import PointGenerator
+from .point_writer import LayerDestination, WriteError
+
+
+class EditTracker:
+    """Source feature to output point mapping of a finished run."""
+
+    def __init__(self, layer, output_layer, generator):
+        """Constructor, called on the main thread once the run has finished.
+
+        :param layer: Source line layer.
+        :type layer: QgsVectorLayer
+
+        :param output_layer: Random points layer written by the run.
+        :type output_layer: QgsVectorLayer
+
+        :param generator: Finished run with ``settings.track_points`` set.
+        :type generator: PointGenerator
+        """
+        self.layer = layer
+        self.output_layer = output_layer
+        self.id_index = output_layer.fields().indexOf("ID")
+        # ID attribute values of the output points, sorted, and their
+        # feature IDs; read by the first update
+        self.point_ids = None
+        self.point_fids = None
+        self.closed = False
+
+        # Later updates must reproduce the run, so the random seed is fixed
+        # and the selection is frozen
+        self.settings = copy.copy(generator.settings)
+        self.settings.seed = generator.run_seed
+        self.settings.selected_only = False
+        self.settings.feature_ids = None
+        self.settings.workers = 1
+        self.settings.pipelined = False
+        self.settings.report_path = ""
+        self.settings.profile_path = ""
+        self.selection = None
+        if generator.settings.selected_only:
+            self.selection = set(layer.selectedFeatureIds())
+
+        self.feature_ids = np.zeros(0, dtype=np.int64)
+        self.starts = np.zeros(0, dtype=np.int64)
+        self.counts = np.zeros(0, dtype=np.int64)
+        self.next_id = 1
+        self.add_produced(generator.produced, 1)
+
+        self.changed = set()
+        self.deleted = set()
+        self.connections = []
+        self.connect(layer.featureAdded, self.feature_changed)
+        self.connect(layer.geometryChanged, lambda fid, _geometry: self.feature_changed(fid))
+        self.connect(layer.attributeValueChanged,
+                     lambda fid, _index, _value: self.feature_changed(fid))
+        self.connect(layer.featureDeleted, self.feature_deleted)
+        self.connect(layer.committedFeaturesAdded, self.features_committed)
+        self.connect(layer.afterCommitChanges, self.changes_committed)
+        # Edits saved to the output layer may renumber its features
+        self.connect(output_layer.afterCommitChanges, self.drop_point_index)
+
+    def connect(self, signal, slot):
+        """Connect a source layer signal until :meth:`close`."""
+        signal.connect(slot)
+        self.connections.append((signal, slot))
+
+    def close(self):
+        """Stop following the source layer."""
+        for signal, slot in self.connections:
+            try:
+                signal.disconnect(slot)
+            except (TypeError, RuntimeError):
+                # The layer was already deleted
+                pass
+        self.connections = []
+        self.closed = True
+
+    def drop_point_index(self):
+        """Read the feature IDs of the output points again on the next update."""
+        self.point_ids = None
+        self.point_fids = None
+
+    def add_produced(self, produced, first_id):
+        """Record the points of a run written from point ID ``first_id`` on.
+
+        :param produced: Feature IDs and point counts in output order, see
+            ``PointGenerator.produced``.
+        :type produced: tuple
+        """
+        feature_ids, counts = produced
+        if not feature_ids:
+            return
+        feature_ids = np.concatenate(feature_ids)
+        counts = np.concatenate(counts)
+        starts = first_id + np.cumsum(counts) - counts
+        self.next_id = first_id + int(counts.sum())
+        keep = counts > 0
+        feature_ids = np.concatenate((self.feature_ids, feature_ids[keep]))
+        starts = np.concatenate((self.starts, starts[keep]))
+        counts = np.concatenate((self.counts, counts[keep]))
+        order = np.argsort(feature_ids, kind="stable")
+        self.feature_ids = feature_ids[order]
+        self.starts = starts[order]
+        self.counts = counts[order]
+
+    def feature_changed(self, fid):
+        """Mark an added or edited source feature."""
+        self.changed.add(fid)
+
+    def feature_deleted(self, fid):
+        """Mark a deleted source feature."""
+        self.changed.discard(fid)
+        self.deleted.add(fid)
+
+    def features_committed(self, _layer_id, features):
+        """Mark features saved from the edit buffer with their final IDs."""
+        for feature in features:
+            self.changed.add(feature.id())
+
+    def changes_committed(self):
+        """Drop the temporary IDs the edit buffer gave to new features."""
+        for fid in [fid for fid in self.changed if fid < 0]:
+            self.feature_deleted(fid)
+        for fid in self.feature_ids[self.feature_ids < 0].tolist():
+            self.deleted.add(fid)
+
+    def pending(self):
+        """Return True if source features changed since the last update."""
+        return bool(self.changed or self.deleted)
+
+    def requeue(self, changed, deleted):
+        """Mark the features of a failed or canceled update again."""
+        self.changed |= changed - self.deleted
+        self.deleted |= deleted
+
+    def apply(self, task):
+        """Write the points of a finished update to the output layer.
+
+        Called on the main thread by :meth:`UpdateTask.finished`; the work
+        is proportional to the number of edited features and their points.
+
+        :param task: Update task that ran successfully.
+        :type task: UpdateTask
+
+        :raises WriteError: The output layer rejected the new points, it is
+            left unchanged.
+        """
+        if task.point_index is not None:
+            self.point_ids, self.point_fids = task.point_index
+
+        affected = np.fromiter(task.changed | task.deleted, dtype=np.int64)
+        tracked = np.isin(self.feature_ids, affected)
+        first = np.searchsorted(self.point_ids, self.starts[tracked])
+        last = np.searchsorted(self.point_ids, self.starts[tracked] + self.counts[tracked])
+        positions = np.concatenate(
+            [np.zeros(0, dtype=np.int64)]
+            + [np.arange(a, b) for a, b in zip(first.tolist(), last.tolist())]
+        )
+        destination = task.destination
+        destination.replaced_ids = self.point_fids[positions].tolist()
+        destination.finish()
+
+        self.point_ids = np.concatenate((
+            np.delete(self.point_ids, positions),
+            np.arange(destination.first_id, destination.first_id + len(destination.added_ids)),
+        ))
+        self.point_fids = np.concatenate((
+            np.delete(self.point_fids, positions),
+            np.array(destination.added_ids, dtype=np.int64),
+        ))
+        self.feature_ids = self.feature_ids[~tracked]
+        self.starts = self.starts[~tracked]
+        self.counts = self.counts[~tracked]
+        if task.generator is not None:
+            self.add_produced(task.generator.produced, destination.first_id)
+
+
+def point_index(source, id_index):
+    """Return the ID attribute and the feature ID of every output point.
+
+    :param source: Random points layer, or a feature source of it when read
+        off the main thread.
+    :type source: QgsFeatureSource
+
+    :param id_index: Index of the ID field.
+    :type id_index: int
+
+    :returns: The ID values sorted and the feature IDs in the same order.
+    :rtype: (numpy.ndarray, numpy.ndarray)
+    """
+    request = QgsFeatureRequest().setFlags(QgsFeatureRequest.Flag.NoGeometry)
+    request.setSubsetOfAttributes([id_index])
+    points = np.array(
+        [(feature.attribute(id_index), feature.id()) for feature in source.getFeatures(request)],
+        dtype=np.int64,
+    ).reshape(-1, 2)
+    order = np.argsort(points[:, 0], kind="stable")
+    return points[order, 0], points[order, 1]
+
+
+class UpdateTask(QgsTask):
+    """Replace the points of the edited features in the QGIS task manager.
+
+    The new points are generated in the background into a temporary layer;
+    the output layer is only changed in :meth:`finished`, on the main thread.
+    Edits made while the task runs are kept for the next update.
+    """
+
+    def __init__(self, tracker, on_finished):
+        """Constructor, called on the main thread.
+
+        :param tracker: Tracker of the run to update.
+        :type tracker: EditTracker
+
+        :param on_finished: Called on the main thread with the task once the
+            output layer was updated, or not.
+        :type on_finished: function
+
+        :raises RuntimeError: If the output layer cannot be edited.
+        """
+        super().__init__("Updating random points", QgsTask.Flag.CanCancel)
+        self.tracker = tracker
+        self.on_finished = on_finished
+        self.exception = None
+        self.destination = LayerDestination(tracker.output_layer, tracker.next_id)
+        if self.destination.error:
+            raise RuntimeError(self.destination.error)
+
+        self.changed, tracker.changed = tracker.changed, set()
+        self.deleted, tracker.deleted = tracker.deleted, set()
+        self.source = None
+        self.point_index = None
+        if tracker.point_ids is None:
+            self.source = QgsVectorLayerFeatureSource(tracker.output_layer)
+
+        regenerate = self.changed
+        if tracker.selection is not None:
+            regenerate = regenerate & tracker.selection
+        self.generator = None
+        if regenerate:
+            settings = copy.copy(tracker.settings)
+            settings.feature_ids = sorted(regenerate)
+            settings.track_points = True
+            self.generator = PointGenerator(tracker.layer, settings, self.destination)
+
+    def edited(self):
+        """Return the number of edited features the task updates."""
+        return len(self.changed | self.deleted)
+
+    def run(self):
+        """Read the output points if needed and generate the new points,
+        called from a worker thread."""
+        try:
+            if self.source is not None:
+                self.point_index = point_index(self.source, self.tracker.id_index)
+                self.source = None
+            if self.generator is not None:
+                return self.generator.run(self)
+            return not self.isCanceled()
+        except Exception as e:  # pylint: disable=broad-except
+            self.exception = e
+            return False
+
+    def finished(self, result):
+        """Update the output layer, called on the main thread."""
+        if result and not self.tracker.closed:
+            try:
+                self.tracker.apply(self)
+            except WriteError as e:
+                self.exception = e
+                result = False
+        else:
+            self.destination.discard()
+        if not result:
+            self.tracker.requeue(self.changed, self.deleted)
+        if self.exception is not None:
+            QgsMessageLog.logMessage(
+                f"Random points update failed: {self.exception}",
+                "Random Points on Lines", Qgis.MessageLevel.Critical
+            )
+        self.on_finished(self)
@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+"""Multi-process sampling of feature partitions.
+
+Like the sampling engine this module is free of Qt/QGIS imports, because
+it is imported again by every worker process. Coordinate buffers are passed
+through ``multiprocessing.shared_memory`` instead of being pickled, and the
+partial results are merged back in partition order.
+"""
+
+import multiprocessing
+import os
+import shutil
+import sys
+from concurrent.futures import ProcessPoolExecutor, wait
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from .sampling_engine import (
+    FeatureStream, LineBatch, sample_batch, sample_line_constrained,
+)
+
+
+class SharedArrays:
+    """Several NumPy arrays packed into one shared memory block."""
+
+    def __init__(self, arrays=None, layout=None, name=None):
+        """Create a block holding ``arrays``, or attach to an existing one.
+
+        :param arrays: Arrays by key, to create a new block.
+        :type arrays: dict
+
+        :param layout: Layout of an existing block, see :meth:`descriptor`.
+        :type layout: list
+
+        :param name: Name of an existing block.
+        :type name: str
+        """
+        if arrays is not None:
+            layout = []
+            offset = 0
+            for key, array in arrays.items():
+                array = np.ascontiguousarray(array)
+                layout.append((key, array.dtype.str, array.shape, offset))
+                offset += array.nbytes
+            self.memory = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+            self.layout = layout
+            self.arrays = self._views()
+            for key, array in arrays.items():
+                self.arrays[key][...] = array
+        else:
+            self.memory = shared_memory.SharedMemory(name=name)
+            self.layout = layout
+            self.arrays = self._views()
+
+    def _views(self):
+        return {
+            key: np.ndarray(shape, dtype=np.dtype(dtype), buffer=self.memory.buf,
+                            offset=offset)
+            for key, dtype, shape, offset in self.layout
+        }
+
+    def descriptor(self):
+        """Return the picklable ``(name, layout)`` of the block."""
+        return self.memory.name, self.layout
+
+    @classmethod
+    def attach(cls, descriptor):
+        """Attach to a block created by another process."""
+        name, layout = descriptor
+        return cls(layout=layout, name=name)
+
+    def close(self, unlink=False):
+        """Release the views and the block, unlink it from its creator."""
+        self.arrays = None
+        self.memory.close()
+        if unlink:
+            self.memory.unlink()
+
+
+def pack_partition(group):
+    """Pack the lines and parameter columns of a FeatureGroup into flat arrays."""
+    tables = group.tables
+    return {
+        "feature_ids": group.feature_ids,
+        "counts": np.maximum(group.counts, 0),
+        "start_percent": group.start_percent,
+        "end_percent": group.end_percent,
+        "min_distance": group.min_distance,
+        "lengths": np.fromiter((table.length for table in tables),
+                               dtype=np.float64, count=len(tables)),
+        "offsets": np.concatenate(
+            ([0], np.cumsum([table.x.size for table in tables]))
+        ).astype(np.int64),
+        "x": np.concatenate([table.x for table in tables] + [np.zeros(0)]),
+        "y": np.concatenate([table.y for table in tables] + [np.zeros(0)]),
+        "cumulative": np.concatenate(
+            [table.cumulative[:table.x.size] for table in tables] + [np.zeros(0)]
+        ),
+    }
+
+
+def sample_partition(input_descriptor, output_descriptor, params):
+    """Worker entry point: sample one partition into shared memory.
+
+    :param params: Sampling parameters of the run, as a plain dict.
+    :type params: dict
+
+    :returns: Number of points written; the partition line indices,
+        generated point counts and rejected candidates of the lines that got
+        fewer points than requested; and the rejected candidates of all lines.
+    :rtype: (int, tuple, int)
+    """
+    source = SharedArrays.attach(input_descriptor)
+    target = SharedArrays.attach(output_descriptor)
+    try:
+        arrays = source.arrays
+        batch = LineBatch.from_arrays(
+            arrays["x"], arrays["y"], arrays["cumulative"],
+            arrays["offsets"], arrays["lengths"],
+        )
+        feature_ids = arrays["feature_ids"]
+        counts = arrays["counts"]
+        start_percent = arrays["start_percent"]
+        end_percent = arrays["end_percent"]
+        out = target.arrays
+        shortfall = ([], [], [])
+
+        if params["batched"]:
+            line_index, distances, xs, ys = sample_batch(
+                batch, params["seed"], feature_ids, counts,
+                start_percent, end_percent,
+            )
+            written = line_index.size
+            out["line_index"][:written] = line_index
+            out["distances"][:written] = distances
+            out["x"][:written] = xs
+            out["y"][:written] = ys
+            return written, shortfall, 0
+
+        written = 0
+        total_rejected = 0
+        for line in range(len(batch)):
+            if not counts[line] or not batch.vertex_counts[line]:
+                continue
+            distances, xs, ys, rejected = sample_line_constrained(
+                batch.table(line),
+                FeatureStream(params["seed"], int(feature_ids[line])),
+                int(counts[line]), float(arrays["min_distance"][line]),
+                params["along_line"], params["max_gap"],
+                float(start_percent[line]), float(end_percent[line]),
+            )
+            total_rejected += rejected
+            if distances.size < counts[line]:
+                for column, value in zip(shortfall, (line, distances.size, rejected)):
+                    column.append(value)
+            end = written + distances.size
+            out["line_index"][written:end] = line
+            out["distances"][written:end] = distances
+            out["x"][written:end] = xs
+            out["y"][written:end] = ys
+            written = end
+        return written, shortfall, total_rejected
+    finally:
+        source.close()
+        target.close()
+
+
+def python_executable():
+    """Return a Python interpreter to start the worker processes with.
+
+    Inside QGIS ``sys.executable`` may be the QGIS binary itself.
+    """
+    executable = sys.executable or ""
+    if os.path.basename(executable).lower().startswith("python"):
+        return executable
+    names = ("python.exe", "pythonw.exe") if os.name == "nt" else ("python3", "python")
+    for folder in (sys.exec_prefix, os.path.join(sys.exec_prefix, "bin")):
+        for name in names:
+            candidate = os.path.join(folder, name)
+            if os.path.isfile(candidate):
+                return candidate
+    return shutil.which("python3") or shutil.which("python") or executable
+
+
+class PartitionSampler:
+    """Sample groups of features in a pool of worker processes.
+
+    Each group is split into contiguous partitions, one task per partition.
+    The results come back in partition order, so the merged output, and the
+    point IDs assigned while writing it, are the same as in a serial run.
+    """
+
+    def __init__(self, workers, params):
+        """Constructor.
+
+        :param workers: Number of worker processes.
+        :type workers: int
+
+        :param params: Sampling parameters, see :func:`sample_partition`.
+        :type params: dict
+        """
+        self.workers = workers
+        self.params = params
+        context = multiprocessing.get_context("spawn")
+        context.set_executable(python_executable())
+        self.executor = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+
+    def sample(self, group):
+        """Sample the features of a FeatureGroup.
+
+        :returns: Flat arrays of feature index, distance, x and y; the
+            feature indices, generated point counts and rejected candidates
+            of the features that got fewer points than requested; and the
+            rejected candidates of all features.
+        :rtype: tuple
+        """
+        size = -(-len(group) // self.workers)
+        jobs = []
+        shared = []
+        try:
+            for first in range(0, len(group), size):
+                part = group.subset(slice(first, first + size))
+                source = SharedArrays(pack_partition(part))
+                shared.append(source)
+                capacity = int(source.arrays["counts"].sum())
+                target = SharedArrays({
+                    "line_index": np.zeros(capacity, dtype=np.int64),
+                    "distances": np.zeros(capacity),
+                    "x": np.zeros(capacity),
+                    "y": np.zeros(capacity),
+                })
+                shared.append(target)
+                future = self.executor.submit(
+                    sample_partition, source.descriptor(), target.descriptor(),
+                    self.params,
+                )
+                jobs.append((first, target, future))
+
+            results = []
+            shortfall = ([], [], [])
+            rejected = 0
+            for first, target, future in jobs:
+                written, job_shortfall, job_rejected = future.result()
+                rejected += job_rejected
+                arrays = target.arrays
+                results.append((
+                    arrays["line_index"][:written] + first,
+                    arrays["distances"][:written].copy(),
+                    arrays["x"][:written].copy(),
+                    arrays["y"][:written].copy(),
+                ))
+                shortfall[0].extend(line + first for line in job_shortfall[0])
+                shortfall[1].extend(job_shortfall[1])
+                shortfall[2].extend(job_shortfall[2])
+        finally:
+            futures = [future for _, _, future in jobs]
+            for future in futures:
+                future.cancel()
+            # After an error the partitions already started still run; their
+            # blocks are only unlinked once no worker is attached any more
+            wait(futures)
+            for arrays in shared:
+                arrays.close(unlink=True)
+
+        shortfall = tuple(np.asarray(column, dtype=np.int64) for column in shortfall)
+        if not results:
+            empty = np.zeros(0)
+            return np.zeros(0, dtype=np.int64), empty, empty, empty, shortfall, rejected
+        return tuple(np.concatenate(column) for column in zip(*results)) + (shortfall, rejected)
+
+    def close(self):
+        """Shut the worker processes down."""
+        self.executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""Three-stage reader / sampler / writer pipeline.
+
+The reader and the writer each run in their own thread while the calling
+thread samples, so slow I/O and sampling overlap. The stages are connected
+through bounded queues and every queued item is charged against a memory
+budget, which keeps the peak memory flat however large the input is.
+"""
+
+import queue
+import threading
+
+_END = object()
+
+
+class MemoryBudget:
+    """Byte budget of the items waiting between two pipeline stages.
+
+    An item is always admitted when nothing else is charged, so an item
+    larger than the whole budget cannot block the pipeline.
+    """
+
+    def __init__(self, limit, stop):
+        """Constructor.
+
+        :param limit: Budget in bytes.
+        :type limit: int
+
+        :param stop: Event set when the pipeline is aborted.
+        :type stop: threading.Event
+        """
+        self.limit = limit
+        self.used = 0
+        self.stop = stop
+        self.condition = threading.Condition()
+
+    def acquire(self, size):
+        """Wait until ``size`` bytes fit in the budget.
+
+        :returns: False if the pipeline was aborted while waiting.
+        :rtype: bool
+        """
+        with self.condition:
+            while self.used and self.used + size > self.limit:
+                if self.stop.is_set():
+                    return False
+                self.condition.wait(0.1)
+            self.used += size
+            return True
+
+    def release(self, size):
+        """Give ``size`` bytes back to the budget."""
+        with self.condition:
+            self.used -= size
+            self.condition.notify_all()
+
+
+def run_pipeline(read, sample, write, memory_limit, is_canceled=None,
+                 queue_size=8):
+    """Run the three stages until the input is exhausted.
+
+    :param read: Iterable of ``(item, size in bytes)``, consumed in the
+        reader thread.
+    :type read: iterable
+
+    :param sample: Called with each item in the calling thread, returns
+        ``(result, size in bytes)``.
+    :type sample: function
+
+    :param write: Called with each result in the writer thread.
+    :type write: function
+
+    :param memory_limit: Peak memory of the queued items in bytes, shared
+        equally between the two queues.
+    :type memory_limit: int
+
+    :param is_canceled: Polled by the reader before every item.
+    :type is_canceled: function
+
+    :returns: False if the reader stopped because of a cancelation.
+    :rtype: bool
+    """
+    stop = threading.Event()
+    read_budget = MemoryBudget(memory_limit // 2, stop)
+    write_budget = MemoryBudget(memory_limit - memory_limit // 2, stop)
+    read_queue = queue.Queue(queue_size)
+    write_queue = queue.Queue(queue_size)
+    errors = []
+    state = {"canceled": False}
+
+    def reader():
+        try:
+            for item, size in read:
+                if stop.is_set():
+                    break
+                if is_canceled is not None and is_canceled():
+                    state["canceled"] = True
+                    break
+                if not read_budget.acquire(size):
+                    break
+                read_queue.put((item, size))
+        except Exception as e:  # pylint: disable=broad-except
+            errors.append(e)
+            stop.set()
+        finally:
+            read_queue.put(_END)
+
+    def writer():
+        while True:
+            entry = write_queue.get()
+            if entry is _END:
+                break
+            result, size = entry
+            try:
+                if not stop.is_set():
+                    write(result)
+            except Exception as e:  # pylint: disable=broad-except
+                errors.append(e)
+                stop.set()
+            finally:
+                write_budget.release(size)
+
+    read_thread = threading.Thread(target=reader, name="RandomPointsReader", daemon=True)
+    write_thread = threading.Thread(target=writer, name="RandomPointsWriter", daemon=True)
+    read_thread.start()
+    write_thread.start()
+
+    aborted = True
+    try:
+        while True:
+            entry = read_queue.get()
+            if entry is _END:
+                aborted = False
+                break
+            item, size = entry
+            try:
+                if stop.is_set():
+                    continue
+                result, result_size = sample(item)
+            except Exception as e:  # pylint: disable=broad-except
+                errors.append(e)
+                stop.set()
+                continue
+            finally:
+                read_budget.release(size)
+            if write_budget.acquire(result_size):
+                write_queue.put((result, result_size))
+    finally:
+        if aborted:
+            # KeyboardInterrupt or SystemExit: drop the pending writes too
+            stop.set()
+        write_queue.put(_END)
+        write_thread.join()
+        stop.set()
+        # A reader blocked on the full queue only sees the stop once it
+        # could put its item, so the queue is drained until it ends
+        while read_thread.is_alive():
+            try:
+                entry = read_queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if entry is not _END:
+                read_budget.release(entry[1])
+        read_thread.join()
+
+    if errors:
+        raise errors[0]
+    return not state["canceled"]
@@ -0,0 +1,613 @@
+# -*- coding: utf-8 -*-
+"""Chunked output of sampled random points."""
+
+import os
+
+from qgis.core import (
+    Qgis, QgsFeature, QgsFeatureRequest, QgsFeatureSink, QgsField, QgsFields,
+    QgsGeometry, QgsPoint, QgsProcessingUtils, QgsVectorFileWriter,
+    QgsVectorLayer,
+)
+from qgis.PyQt.QtCore import QMetaType
+
+from .run_report import BUILD, PROVIDER_WRITE, RunReport
+
+OUTPUT_LAYER_NAME = "Random Points"
+SHORTFALL_LAYER_NAME = "Random Points Shortfall"
+
+# Supported file extensions and their OGR drivers
+FILE_FORMATS = {
+    ".gpkg": "GPKG",
+    ".fgb": "FlatGeobuf",
+}
+FILE_FILTER = "GeoPackage (*.gpkg);;FlatGeobuf (*.fgb)"
+
+# Estimated point count above which a temporary layer is written to a file
+AUTO_FILE_THRESHOLD = 5000000
+
+
+def output_fields():
+    """Return the attribute fields of the random points output."""
+    fields = QgsFields()
+    fields.append(QgsField("ID", QMetaType.Type.Int))
+    fields.append(QgsField("Distance", QMetaType.Type.Double))
+    fields.append(QgsField("XCoord", QMetaType.Type.Double))
+    fields.append(QgsField("YCoord", QMetaType.Type.Double))
+    fields.append(QgsField("CRSXCoord", QMetaType.Type.Double))
+    fields.append(QgsField("CRSYCoord", QMetaType.Type.Double))
+    return fields
+
+
+def shortfall_fields():
+    """Return the attribute fields of the shortfall table."""
+    fields = QgsFields()
+    fields.append(QgsField("feature_id", QMetaType.Type.LongLong))
+    fields.append(QgsField("requested", QMetaType.Type.Int))
+    fields.append(QgsField("achieved", QMetaType.Type.Int))
+    fields.append(QgsField("rejected", QMetaType.Type.Int))
+    return fields
+
+
+def shortfall_features(shortfalls, fields):
+    """Return one feature without geometry per feature that got fewer points.
+
+    :param shortfalls: Shortfalls of a run.
+    :type shortfalls: Shortfalls
+
+    :param fields: Fields of the table, see :func:`shortfall_fields`.
+    :type fields: QgsFields
+
+    :rtype: list
+    """
+    features = []
+    for row in zip(*(column.tolist() for column in shortfalls.columns())):
+        feature = QgsFeature(fields)
+        feature.setAttributes(list(row))
+        features.append(feature)
+    return features
+
+
+def shortfall_layer(shortfalls):
+    """Return a table layer listing the features that got fewer points.
+
+    :param shortfalls: Shortfalls of a run.
+    :type shortfalls: Shortfalls
+
+    :rtype: QgsVectorLayer
+    """
+    layer = QgsVectorLayer("None", SHORTFALL_LAYER_NAME, "memory")
+    provider = layer.dataProvider()
+    provider.addAttributes(shortfall_fields().toList())
+    layer.updateFields()
+    provider.addFeatures(shortfall_features(shortfalls, layer.fields()))
+    return layer
+
+
+class WriteError(Exception):
+    """The destination rejected a chunk of points."""
+
+
+class PointWriter:
+    """Write sampled points to a feature sink in chunks.
+
+    Features are copied from a field-initialised template and handed to the
+    sink with one ``addFeatures`` call per chunk, using the FastInsert flag.
+    """
+
+    CHUNK_SIZE = 5000
+    # Point WKB and the integer and five double attributes of one point
+    RECORD_BYTES = 21 + 4 + 5 * 8
+
+    def __init__(self, sink, fields, first_id=1, chunk_size=CHUNK_SIZE, report=None):
+        """Constructor.
+
+        :param sink: Destination, e.g. a data provider or a file writer.
+        :type sink: QgsFeatureSink
+
+        :param fields: Fields of the destination.
+        :type fields: QgsFields
+
+        :param first_id: Value of the ID attribute of the first point.
+        :type first_id: int
+
+        :param report: Optional report timing the writes and counting the
+            bytes written.
+        :type report: RunReport
+        """
+        self.sink = sink
+        self.template = QgsFeature(fields)
+        self.chunk_size = chunk_size
+        self.next_id = first_id
+        self.written = 0
+        self.chunk = []
+        self.report = report if report is not None else RunReport()
+
+    def add_points(self, distances, xs, ys):
+        """Queue sampled points, flushing every full chunk.
+
+        :param distances: Distance of each point along its line.
+        :type distances: numpy.ndarray
+
+        :param xs: X coordinates.
+        :type xs: numpy.ndarray
+
+        :param ys: Y coordinates.
+        :type ys: numpy.ndarray
+        """
+        with self.report.stage(BUILD):
+            template = self.template
+            chunk = self.chunk
+            unique_id = self.next_id
+            for distance, x_coord, y_coord in zip(
+                distances.tolist(), xs.tolist(), ys.tolist()
+            ):
+                feature = QgsFeature(template)
+                feature.setGeometry(QgsGeometry(QgsPoint(x_coord, y_coord)))
+                feature.setAttributes([
+                    unique_id, distance, x_coord, y_coord, x_coord, y_coord
+                ])
+                unique_id += 1
+                chunk.append(feature)
+                if len(chunk) >= self.chunk_size:
+                    self.flush()
+                    chunk = self.chunk
+            self.next_id = unique_id
+
+    def flush(self):
+        """Write the queued features with a single call.
+
+        :raises WriteError: The sink did not accept the chunk, e.g. the disk
+            is full. ``written`` only counts the accepted points.
+        """
+        if not self.chunk:
+            return
+        with self.report.stage(PROVIDER_WRITE):
+            ok = self.sink.addFeatures(self.chunk, QgsFeatureSink.Flag.FastInsert)
+        if isinstance(ok, tuple):
+            ok = ok[0]
+        if not ok:
+            last_error = getattr(self.sink, "lastError", None)
+            message = last_error() if last_error is not None else ""
+            raise WriteError(
+                f"Could not write {len(self.chunk)} points after {self.written}"
+                f"{': ' + message if message else ''}"
+            )
+        self.written += len(self.chunk)
+        self.report.bytes_written += len(self.chunk) * self.RECORD_BYTES
+        self.chunk = []
+
+    def close(self):
+        """Write the remaining features and release the sink.
+
+        :raises WriteError: The sink did not accept the last chunk.
+        """
+        try:
+            self.flush()
+        finally:
+            self.sink = None
+
+
+class MemoryDestination:
+    """Temporary memory layer output."""
+
+    def __init__(self, crs):
+        """Constructor.
+
+        :param crs: CRS of the output points.
+        :type crs: QgsCoordinateReferenceSystem
+        """
+        self.error = None
+        self.first_id = 1
+        self.layer = QgsVectorLayer("Point", OUTPUT_LAYER_NAME, "memory")
+        self.layer.setCrs(crs)
+        self.sink = self.layer.dataProvider()
+        self.sink.addAttributes(output_fields().toList())
+        self.layer.updateFields()
+        self.fields = self.layer.fields()
+
+    def finish(self):
+        """Finish writing and return the output layer."""
+        self.layer.updateExtents()
+        return self.layer
+
+    def discard(self):
+        """Drop the output."""
+        self.sink = None
+        self.layer = None
+
+
+class FileDestination:
+    """GeoPackage or FlatGeobuf file output streamed by QgsVectorFileWriter.
+
+    Features never pile up in memory: every chunk goes straight to the
+    writer. The spatial index is requested through the layer options and
+    built by GDAL once all features are written, and GeoPackage inserts run
+    inside the writer's transaction instead of one commit per feature.
+    """
+
+    def __init__(self, path, crs, transform_context):
+        """Constructor.
+
+        :param path: Output file path, ``.gpkg`` or ``.fgb``.
+        :type path: str
+
+        :param crs: CRS of the output points.
+        :type crs: QgsCoordinateReferenceSystem
+
+        :param transform_context: Coordinate transform context of the project.
+        :type transform_context: QgsCoordinateTransformContext
+        """
+        self.path = path
+        self.fields = output_fields()
+        self.error = None
+        self.first_id = 1
+
+        options = QgsVectorFileWriter.SaveVectorOptions()
+        options.driverName = file_driver(path)
+        options.fileEncoding = "UTF-8"
+        options.layerName = "random_points"
+        options.layerOptions = ["SPATIAL_INDEX=YES"]
+        self.layer_name = options.layerName
+
+        self.sink = QgsVectorFileWriter.create(
+            path, self.fields, Qgis.WkbType.Point, crs, transform_context, options
+        )
+        if self.sink.hasError() != QgsVectorFileWriter.WriterError.NoError:
+            self.error = self.sink.errorMessage()
+
+    def finish(self):
+        """Close the file and return it as a layer."""
+        # Deleting the writer closes the file and builds the spatial index
+        self.sink = None
+        uri = self.path
+        if file_driver(self.path) == "GPKG":
+            uri = f"{self.path}|layername={self.layer_name}"
+        return QgsVectorLayer(uri, OUTPUT_LAYER_NAME, "ogr")
+
+    def discard(self):
+        """Close and delete the output file."""
+        self.sink = None
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class SinkDestination:
+    """Feature sink created by the caller, e.g. a Processing output."""
+
+    def __init__(self, sink):
+        """Constructor.
+
+        :param sink: Sink accepting features with the :func:`output_fields`.
+        :type sink: QgsFeatureSink
+        """
+        self.sink = sink
+        self.fields = output_fields()
+        self.error = None
+        self.first_id = 1
+
+    def finish(self):
+        """Finish writing. The sink owner creates the layer, None is returned."""
+        self.sink = None
+        return None
+
+    def discard(self):
+        """Release the sink, deleting its features is left to its owner."""
+        self.sink = None
+
+
+class LayerDestination:
+    """Existing output layer the new points are appended to.
+
+    The points are written into a temporary memory layer and only moved into
+    the layer by :meth:`finish`, on the main thread, which also deletes the
+    points they replace.
+    """
+
+    def __init__(self, layer, first_id, replaced_ids=()):
+        """Constructor, must be called on the main thread.
+
+        :param layer: Random points layer of an earlier run.
+        :type layer: QgsVectorLayer
+
+        :param first_id: Value of the ID attribute of the first new point.
+        :type first_id: int
+
+        :param replaced_ids: Feature IDs of the points deleted once the new
+            points were added.
+        :type replaced_ids: list
+        """
+        self.layer = layer
+        self.first_id = first_id
+        self.replaced_ids = list(replaced_ids)
+        # Feature IDs of the new points in the layer, in ID order
+        self.added_ids = []
+        self.fields = layer.fields()
+        self.error = None
+        self.staging = None
+        self.sink = None
+        capabilities = layer.dataProvider().capabilities()
+        if not (capabilities & Qgis.VectorProviderCapability.AddFeatures
+                and capabilities & Qgis.VectorProviderCapability.DeleteFeatures):
+            self.error = "the output layer cannot be edited"
+            return
+        self.staging = staging_layer(layer)
+        self.fields = self.staging.fields()
+        self.sink = self.staging.dataProvider()
+
+    def finish(self):
+        """Add the new points and delete the replaced ones, on the main thread.
+
+        The layer is already in the project, None is returned.
+
+        :raises WriteError: The layer rejected the new points, it is left
+            unchanged.
+        """
+        self.sink = None
+        provider = self.layer.dataProvider()
+        try:
+            copy_features(self.staging, provider, self.added_ids)
+            provider.deleteFeatures(self.replaced_ids)
+        except WriteError:
+            provider.deleteFeatures(self.added_ids)
+            self.added_ids = []
+            raise
+        finally:
+            self.staging = None
+            self.layer.updateExtents()
+            self.layer.triggerRepaint()
+        return None
+
+    def discard(self):
+        """Drop the new points, the layer is left unchanged."""
+        self.sink = None
+        self.staging = None
+
+
+class UpdateSink:
+    """Feature sink overwriting the points of an earlier run in ID order.
+
+    The n-th point written replaces the geometry and attributes of the n-th
+    existing point; points beyond the existing ones are added.
+    """
+
+    def __init__(self, provider, feature_ids):
+        """Constructor.
+
+        :param provider: Data provider of the random points layer.
+        :type provider: QgsVectorDataProvider
+
+        :param feature_ids: Feature IDs of the existing points in ID order.
+        :type feature_ids: list
+        """
+        self.provider = provider
+        self.feature_ids = feature_ids
+        self.position = 0
+
+    def addFeatures(self, features, flags=QgsFeatureSink.Flag(0)):  # pylint: disable=invalid-name
+        """Overwrite the next existing points, add the remaining features."""
+        count = min(len(features), len(self.feature_ids) - self.position)
+        targets = self.feature_ids[self.position:self.position + count]
+        self.position += count
+        ok = True
+        if count:
+            ok = self.provider.changeGeometryValues({
+                fid: feature.geometry() for fid, feature in zip(targets, features)
+            })
+            ok = self.provider.changeAttributeValues({
+                fid: dict(enumerate(feature.attributes()))
+                for fid, feature in zip(targets, features)
+            }) and ok
+        if count < len(features):
+            added = self.provider.addFeatures(features[count:], flags)
+            if isinstance(added, tuple):
+                added = added[0]
+            ok = added and ok
+        return ok
+
+    def remaining(self):
+        """Return the feature IDs of the existing points not overwritten."""
+        return self.feature_ids[self.position:]
+
+
+class ReplaceDestination:
+    """Random points layer of an earlier run, replaced once the run ended.
+
+    Reusing the layer keeps its style and position in the project, and the
+    old points are released instead of piling up in new layers. The run
+    writes into a temporary memory layer, so the layer in the project is
+    never touched from the task thread. :meth:`finish` then moves the points
+    into it on the main thread: they overwrite the existing points with
+    ``changeGeometryValues`` when the new run has the same points per
+    feature, otherwise they are added and the old points deleted. A
+    canceled or failed run leaves the layer as it was.
+
+    The staging layer shrinks by every chunk moved, so the points of the
+    run are held about once in memory. The old points of a memory layer are
+    deleted before the new ones are added, keeping the peak at about one
+    output; a file layer keeps them until all new points were added, as
+    they are not held in memory.
+    """
+
+    def __init__(self, layer, update=False):
+        """Constructor, must be called on the main thread.
+
+        :param layer: Random points layer to replace.
+        :type layer: QgsVectorLayer
+
+        :param update: Overwrite the existing points instead of replacing
+            them.
+        :type update: bool
+        """
+        self.layer = layer
+        self.fields = layer.fields()
+        self.first_id = 1
+        self.error = None
+        self.update = update
+        self.staging = None
+        self.sink = None
+        capabilities = layer.dataProvider().capabilities()
+        required = [Qgis.VectorProviderCapability.AddFeatures,
+                    Qgis.VectorProviderCapability.DeleteFeatures]
+        if update:
+            required += [Qgis.VectorProviderCapability.ChangeGeometries,
+                         Qgis.VectorProviderCapability.ChangeAttributeValues]
+        if not all(capabilities & capability for capability in required):
+            self.error = "the previous output layer cannot be edited"
+            return
+
+        self.staging = staging_layer(layer)
+        self.fields = self.staging.fields()
+        self.sink = self.staging.dataProvider()
+
+    def finish(self):
+        """Move the new points into the layer, on the main thread.
+
+        :raises WriteError: The layer rejected the new points. The old
+            points of a file layer are kept when the points were to be
+            replaced, a memory layer is left without points.
+        """
+        self.sink = None
+        provider = self.layer.dataProvider()
+        old_ids = ordered_feature_ids(self.layer)
+        target = UpdateSink(provider, old_ids) if self.update else provider
+        truncate = not self.update and provider.name() == "memory"
+        added = []
+        try:
+            if truncate:
+                provider.deleteFeatures(old_ids)
+                old_ids = []
+            copy_features(self.staging, target, added)
+            provider.deleteFeatures(target.remaining() if self.update else old_ids)
+        except WriteError:
+            if not self.update:
+                provider.deleteFeatures(added)
+            raise
+        finally:
+            self.staging = None
+            self.layer.updateExtents()
+            self.layer.triggerRepaint()
+        return self.layer
+
+    def discard(self):
+        """Drop the new points, the layer keeps the old ones."""
+        self.sink = None
+        self.staging = None
+
+
+def ordered_feature_ids(layer):
+    """Return the feature IDs of a random points layer in ID order."""
+    id_index = layer.fields().indexOf("ID")
+    request = QgsFeatureRequest().setFlags(QgsFeatureRequest.Flag.NoGeometry)
+    request.setSubsetOfAttributes([id_index])
+    points = sorted(
+        (feature.attribute(id_index), feature.id()) for feature in layer.getFeatures(request)
+    )
+    return [fid for _, fid in points]
+
+
+def staging_layer(layer):
+    """Return an empty memory layer with the CRS and fields of ``layer``.
+
+    The points of a run replacing or extending a layer of the project are
+    written there from the task thread and copied with
+    :func:`copy_features` on the main thread.
+
+    :param layer: Random points layer.
+    :type layer: QgsVectorLayer
+
+    :rtype: QgsVectorLayer
+    """
+    staging = QgsVectorLayer("Point", OUTPUT_LAYER_NAME, "memory")
+    staging.setCrs(layer.crs())
+    staging.dataProvider().addAttributes(layer.fields().toList())
+    staging.updateFields()
+    return staging
+
+
+def copy_features(staging, target, added):
+    """Move the points of a staging layer to a sink in chunks.
+
+    Every chunk is deleted from the staging layer once it was added, so the
+    points are not held twice in memory.
+
+    :param staging: Layer from :func:`staging_layer`.
+    :type staging: QgsVectorLayer
+
+    :param target: Provider or sink of the output layer.
+    :type target: QgsFeatureSink
+
+    :param added: Receives the feature IDs of the added points in order,
+        also those added before a failure, to allow deleting them.
+    :type added: list
+
+    :raises WriteError: The target rejected a chunk.
+    """
+    provider = staging.dataProvider()
+    request = QgsFeatureRequest().setFlags(QgsFeatureRequest.Flag.NoGeometry)
+    request.setNoAttributes()
+    # The memory provider numbers the features in the order they were written
+    feature_ids = sorted(feature.id() for feature in staging.getFeatures(request))
+    for start in range(0, len(feature_ids), PointWriter.CHUNK_SIZE):
+        chunk_ids = feature_ids[start:start + PointWriter.CHUNK_SIZE]
+        chunk = sorted(
+            staging.getFeatures(QgsFeatureRequest().setFilterFids(chunk_ids)),
+            key=lambda feature: feature.id(),
+        )
+        _add_chunk(target, chunk, added)
+        # The iterator is closed, so deleting does not copy the remaining points
+        provider.deleteFeatures(chunk_ids)
+
+
+def _add_chunk(target, features, added):
+    """Add one chunk of :func:`copy_features`."""
+    result = target.addFeatures(features, QgsFeatureSink.Flag.FastInsert)
+    ok, written = result if isinstance(result, tuple) else (result, [])
+    if not ok:
+        last_error = getattr(target, "lastError", None)
+        message = last_error() if last_error is not None else ""
+        raise WriteError(
+            f"Could not copy the points to the output layer{': ' + message if message else ''}"
+        )
+    added.extend(feature.id() for feature in written)
+
+
+def file_driver(path):
+    """Return the OGR driver for an output path, GeoPackage by default."""
+    return FILE_FORMATS.get(os.path.splitext(path)[1].lower(), "GPKG")
+
+
+def is_flatgeobuf(layer):
+    """Return whether a layer is a FlatGeobuf file.
+
+    FlatGeobuf files are written once: their points cannot be deleted or
+    changed afterwards.
+    """
+    return (layer.providerType() == "ogr"
+            and file_driver(layer.source().split("|")[0]) == "FlatGeobuf")
+
+
+def output_path(path):
+    """Return the path with a supported extension."""
+    if os.path.splitext(path)[1].lower() not in FILE_FORMATS:
+        path += ".gpkg"
+    return path
+
+
+def temporary_file_path():
+    """Return a new temporary GeoPackage path for large outputs."""
+    return QgsProcessingUtils.generateTempFilename("random_points.gpkg")
+
+
+def run_report_path(path=""):
+    """Return the run report path next to an output file, or a temporary one."""
+    if path:
+        return os.path.splitext(path)[0] + "_report.json"
+    return QgsProcessingUtils.generateTempFilename("random_points_report.json")
+
+
+def run_profile_path(path=""):
+    """Return the path without extension of the run profile next to an
+    output file, or a temporary one."""
+    if path:
+        return os.path.splitext(path)[0] + "_profile"
+    return QgsProcessingUtils.generateTempFilename("random_points_profile")
@@ -3,11 +3,11 @@
 from qgis.PyQt.QtCore import QSettings, QTranslator, QCoreApplication, QObject
 from qgis.PyQt.QtGui import QIcon
 from qgis.PyQt.QtWidgets import QAction, QToolBar
+from qgis.core import QgsApplication
 from qgis.utils import iface
 # Initialize Qt resources from file resources.py
 from .resources import *
-# Import the code for the dialog
-from .random_points_dialog import RandomPointsDialog
+from .random_points_provider import RandomPointsProvider
 
 import os.path
 
@@ -29,7 +29,7 @@ class RandomPoints:
         self.plugin_dir = os.path.dirname(__file__)
 
         # Initialize locale
-        locale = QSettings().value('locale/userLocale')[0:2]
+        locale = QSettings().value('locale/userLocale', '')[0:2]
         locale_path = os.path.join(
             self.plugin_dir,
             'i18n',
@@ -49,6 +49,7 @@ class RandomPoints:
 
         self.toolbar = None
         self.action = None
+        self.provider = None
 
     # noinspection PyMethodMayBeStatic
     def tr(self, message):
@@ -157,8 +158,16 @@ class RandomPoints:
             return True
         return False
 
+    def initProcessing(self):
+        """Register the Processing provider, also called by qgis_process."""
+        if self.provider is None:
+            self.provider = RandomPointsProvider()
+            QgsApplication.processingRegistry().addProvider(self.provider)
+
     def initGui(self):
         """Create the menu entries and toolbar icons inside the QGIS GUI."""
+        self.initProcessing()
+
         # Check if "MyTools" toolbar already exists
         self.toolbar = self.iface.mainWindow().findChild(QToolBar, "MyTools")
         if self.toolbar is None:
@@ -220,12 +229,17 @@ class RandomPoints:
         # Remove the toolbar
         if self.toolbar:
             self.toolbar.removeAction(self.action)
+        if self.provider is not None:
+            QgsApplication.processingRegistry().removeProvider(self.provider)
+            self.provider = None
 
     #--------------------------------------------------------------------------
 
     def run(self):
         """Create (if needed) and show the dialog."""
         if self.dlg is None:
+            # Imported on first use, qgis_process only needs the provider
+            from .random_points_dialog import RandomPointsDialog
             self.dlg = RandomPointsDialog(iface)
             # Connect once — stays permanently connected
             self.dlg.closingPlugin.connect(self.onClosePlugin)
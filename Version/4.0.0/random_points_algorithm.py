@@ -0,0 +1,324 @@
+# -*- coding: utf-8 -*-
+"""Processing algorithm generating random points on lines.
+
+The algorithm runs the same PointGenerator as the dialog, so it can be used
+from the Processing toolbox, the batch processing dialog, graphical models
+and ``qgis_process``.
+"""
+
+import os
+
+from qgis.PyQt.QtCore import QCoreApplication
+from qgis.PyQt.QtGui import QIcon
+from qgis.core import (
+    Qgis, QgsCoordinateReferenceSystem, QgsFeatureSink, QgsProcessingAlgorithm,
+    QgsProcessingException, QgsProcessingOutputNumber,
+    QgsProcessingParameterBoolean, QgsProcessingParameterExpression,
+    QgsProcessingParameterExtent, QgsProcessingParameterFeatureSink,
+    QgsProcessingParameterFileDestination, QgsProcessingParameterNumber,
+    QgsProcessingParameterVectorLayer,
+)
+
+from .generator import GenerationSettings, PointGenerator
+from .geometry_store import GeometryStore
+from .point_writer import (
+    SinkDestination, WriteError, output_fields, shortfall_features, shortfall_fields,
+)
+from .sampling_engine import MAX_SEED
+
+
+class RandomPointsAlgorithm(QgsProcessingAlgorithm):
+    """Generate random points along the features of a line layer."""
+
+    INPUT = "INPUT"
+    SELECTED_ONLY = "SELECTED_ONLY"
+    FILTER = "FILTER"
+    EXTENT = "EXTENT"
+    POINTS = "POINTS"
+    POINTS_EXPRESSION = "POINTS_EXPRESSION"
+    START_OFFSET = "START_OFFSET"
+    END_OFFSET = "END_OFFSET"
+    START_EXPRESSION = "START_EXPRESSION"
+    END_EXPRESSION = "END_EXPRESSION"
+    SEED = "SEED"
+    MIN_DISTANCE = "MIN_DISTANCE"
+    MIN_DISTANCE_EXPRESSION = "MIN_DISTANCE_EXPRESSION"
+    GLOBAL_MIN_DISTANCE = "GLOBAL_MIN_DISTANCE"
+    ALONG_LINE = "ALONG_LINE"
+    MAX_GAP = "MAX_GAP"
+    WORKERS = "WORKERS"
+    PIPELINED = "PIPELINED"
+    MEMORY_LIMIT = "MEMORY_LIMIT"
+    USE_STORE = "USE_STORE"
+    REPORT = "REPORT"
+    PROFILE = "PROFILE"
+    OUTPUT = "OUTPUT"
+    SHORTFALL = "SHORTFALL"
+    POINT_COUNT = "POINT_COUNT"
+    RUN_SEED = "RUN_SEED"
+
+    def __init__(self):
+        """Constructor."""
+        super().__init__()
+        self.generator = None
+
+    def tr(self, message):  # pylint: disable=invalid-name
+        """Get the translation for a string using Qt translation API."""
+        return QCoreApplication.translate("RandomPointsAlgorithm", message)
+
+    def createInstance(self):  # pylint: disable=invalid-name
+        """Return a new instance of the algorithm."""
+        return RandomPointsAlgorithm()
+
+    def name(self):
+        """Return the algorithm name used in scripts and ``qgis_process``."""
+        return "randompointsonlines"
+
+    def displayName(self):  # pylint: disable=invalid-name
+        """Return the translated algorithm name."""
+        return self.tr("Random points on lines")
+
+    def tags(self):
+        """Return the search tags of the algorithm."""
+        return self.tr("random,points,lines,sample,seed,distance,spacing").split(",")
+
+    def icon(self):
+        """Return the plugin icon."""
+        return QIcon(os.path.join(os.path.dirname(__file__), "icon.png"))
+
+    def shortHelpString(self):  # pylint: disable=invalid-name
+        """Return the help shown next to the parameters."""
+        return self.tr(
+            "Generates random points along the features of a line layer.\n\n"
+            "The number of points, the start and end offsets (in percent of the line "
+            "length) and the minimum distance can be fixed or data-defined by an "
+            "expression evaluated per feature. The minimum distance is Euclidean "
+            "between the points of a feature, or of all features with 'Keep the "
+            "minimum distance between all features', or measured along the line "
+            "with 'Measure the spacing along the line'.\n\n"
+            "A seed of -1 draws a new run seed, returned as RUN_SEED. A run with the "
+            "same seed and parameters reproduces the same points.\n\n"
+            "The optional shortfall table lists the features that got fewer points "
+            "than requested because the minimum distance could not be kept."
+        )
+
+    def initAlgorithm(self, config=None):  # pylint: disable=invalid-name,unused-argument
+        """Declare the parameters and outputs."""
+        self.addParameter(QgsProcessingParameterVectorLayer(
+            self.INPUT, self.tr("Input line layer"),
+            [Qgis.ProcessingSourceType.VectorLine],
+        ))
+        self.addParameter(QgsProcessingParameterBoolean(
+            self.SELECTED_ONLY, self.tr("Selected features only"), defaultValue=False,
+        ))
+        self.addParameter(QgsProcessingParameterExpression(
+            self.FILTER, self.tr("Filter expression"),
+            parentLayerParameterName=self.INPUT, optional=True,
+        ))
+        self.addParameter(QgsProcessingParameterExtent(
+            self.EXTENT, self.tr("Only lines intersecting the extent"), optional=True,
+        ))
+
+        self.addParameter(QgsProcessingParameterNumber(
+            self.POINTS, self.tr("Number of points per feature"),
+            Qgis.ProcessingNumberParameterType.Integer, defaultValue=10, minValue=1,
+        ))
+        self.addParameter(QgsProcessingParameterExpression(
+            self.POINTS_EXPRESSION, self.tr("Number of points from expression"),
+            parentLayerParameterName=self.INPUT, optional=True,
+        ))
+        self.addParameter(QgsProcessingParameterNumber(
+            self.START_OFFSET, self.tr("Start offset (%)"),
+            Qgis.ProcessingNumberParameterType.Double, defaultValue=0,
+            minValue=0, maxValue=100,
+        ))
+        self.addParameter(QgsProcessingParameterNumber(
+            self.END_OFFSET, self.tr("End offset (%)"),
+            Qgis.ProcessingNumberParameterType.Double, defaultValue=0,
+            minValue=0, maxValue=100,
+        ))
+        self.addParameter(QgsProcessingParameterExpression(
+            self.START_EXPRESSION, self.tr("Start offset from expression (%)"),
+            parentLayerParameterName=self.INPUT, optional=True,
+        ))
+        self.addParameter(QgsProcessingParameterExpression(
+            self.END_EXPRESSION, self.tr("End offset from expression (%)"),
+            parentLayerParameterName=self.INPUT, optional=True,
+        ))
+        self.addParameter(QgsProcessingParameterNumber(
+            self.SEED, self.tr("Random seed (-1 for a new seed)"),
+            Qgis.ProcessingNumberParameterType.Integer, defaultValue=-1, minValue=-1,
+            maxValue=MAX_SEED,
+        ))
+
+        self.addParameter(QgsProcessingParameterNumber(
+            self.MIN_DISTANCE, self.tr("Minimum distance between points"),
+            Qgis.ProcessingNumberParameterType.Double, defaultValue=0, minValue=0,
+        ))
+        self.addParameter(QgsProcessingParameterExpression(
+            self.MIN_DISTANCE_EXPRESSION, self.tr("Minimum distance from expression"),
+            parentLayerParameterName=self.INPUT, optional=True,
+        ))
+        self.addParameter(QgsProcessingParameterBoolean(
+            self.GLOBAL_MIN_DISTANCE,
+            self.tr("Keep the minimum distance between all features"), defaultValue=False,
+        ))
+        self.addParameter(QgsProcessingParameterBoolean(
+            self.ALONG_LINE, self.tr("Measure the spacing along the line"),
+            defaultValue=False,
+        ))
+        self.addParameter(QgsProcessingParameterNumber(
+            self.MAX_GAP, self.tr("Maximum gap along the line (0 for none)"),
+            Qgis.ProcessingNumberParameterType.Double, defaultValue=0, minValue=0,
+        ))
+
+        advanced = [
+            QgsProcessingParameterNumber(
+                self.WORKERS, self.tr("Worker processes"),
+                Qgis.ProcessingNumberParameterType.Integer, defaultValue=1,
+                minValue=1, maxValue=max(os.cpu_count() or 1, 1),
+            ),
+            QgsProcessingParameterBoolean(
+                self.PIPELINED, self.tr("Overlap reading, sampling and writing"),
+                defaultValue=False,
+            ),
+            QgsProcessingParameterNumber(
+                self.MEMORY_LIMIT, self.tr("Pipeline memory limit (MB)"),
+                Qgis.ProcessingNumberParameterType.Integer, defaultValue=256,
+                minValue=16, maxValue=65536,
+            ),
+            QgsProcessingParameterBoolean(
+                self.USE_STORE, self.tr("Keep the prepared lines on disk"),
+                defaultValue=False,
+            ),
+            QgsProcessingParameterFileDestination(
+                self.REPORT, self.tr("Run report"), self.tr("JSON files (*.json)"),
+                optional=True, createByDefault=False,
+            ),
+            QgsProcessingParameterFileDestination(
+                self.PROFILE, self.tr("Run profile"),
+                self.tr("Profile statistics (*.pstats)"), optional=True,
+                createByDefault=False,
+            ),
+        ]
+        for parameter in advanced:
+            parameter.setFlags(parameter.flags() | Qgis.ProcessingParameterFlag.Advanced)
+            self.addParameter(parameter)
+
+        self.addParameter(QgsProcessingParameterFeatureSink(
+            self.OUTPUT, self.tr("Random points"), Qgis.ProcessingSourceType.VectorPoint,
+        ))
+        self.addParameter(QgsProcessingParameterFeatureSink(
+            self.SHORTFALL, self.tr("Shortfall table"), Qgis.ProcessingSourceType.Vector,
+            optional=True, createByDefault=False,
+        ))
+        self.addOutput(QgsProcessingOutputNumber(self.POINT_COUNT, self.tr("Number of points")))
+        self.addOutput(QgsProcessingOutputNumber(self.RUN_SEED, self.tr("Run seed")))
+
+    def settings(self, parameters, context, layer):
+        """Return the generation parameters of a run.
+
+        :rtype: GenerationSettings
+        """
+        settings = GenerationSettings()
+        settings.selected_only = self.parameterAsBoolean(parameters, self.SELECTED_ONLY, context)
+        settings.filter_expression = self.parameterAsExpression(parameters, self.FILTER, context)
+        if parameters.get(self.EXTENT) is not None:
+            extent = self.parameterAsExtent(parameters, self.EXTENT, context, layer.crs())
+            if not extent.isNull():
+                settings.extent = extent
+        settings.num_points = self.parameterAsInt(parameters, self.POINTS, context)
+        settings.expression = self.parameterAsExpression(
+            parameters, self.POINTS_EXPRESSION, context)
+        settings.start_percent = self.parameterAsDouble(parameters, self.START_OFFSET, context)
+        settings.end_percent = self.parameterAsDouble(parameters, self.END_OFFSET, context)
+        settings.start_expression = self.parameterAsExpression(
+            parameters, self.START_EXPRESSION, context)
+        settings.end_expression = self.parameterAsExpression(
+            parameters, self.END_EXPRESSION, context)
+        settings.seed = self.parameterAsInt(parameters, self.SEED, context)
+        settings.min_distance = self.parameterAsDouble(parameters, self.MIN_DISTANCE, context)
+        settings.min_distance_expression = self.parameterAsExpression(
+            parameters, self.MIN_DISTANCE_EXPRESSION, context)
+        settings.global_min_distance = self.parameterAsBoolean(
+            parameters, self.GLOBAL_MIN_DISTANCE, context)
+        settings.along_line = self.parameterAsBoolean(parameters, self.ALONG_LINE, context)
+        settings.max_gap = self.parameterAsDouble(parameters, self.MAX_GAP, context)
+        settings.workers = self.parameterAsInt(parameters, self.WORKERS, context)
+        settings.pipelined = self.parameterAsBoolean(parameters, self.PIPELINED, context)
+        settings.memory_limit = (
+            self.parameterAsInt(parameters, self.MEMORY_LIMIT, context) * 1024 * 1024)
+        if parameters.get(self.REPORT):
+            settings.report_path = self.parameterAsFileOutput(parameters, self.REPORT, context)
+        if parameters.get(self.PROFILE):
+            settings.profile_path = os.path.splitext(
+                self.parameterAsFileOutput(parameters, self.PROFILE, context))[0]
+        return settings
+
+    def checkParameterValues(self, parameters, context):  # pylint: disable=invalid-name
+        """Reject offsets leaving no part of the lines."""
+        start = self.parameterAsDouble(parameters, self.START_OFFSET, context)
+        end = self.parameterAsDouble(parameters, self.END_OFFSET, context)
+        if start + end > 100:
+            return False, self.tr("The start and end offsets add up to more than 100%.")
+        return super().checkParameterValues(parameters, context)
+
+    def prepareAlgorithm(self, parameters, context, feedback):  # pylint: disable=invalid-name,unused-argument
+        """Set the run up on the main thread, where the layer lives."""
+        layer = self.parameterAsVectorLayer(parameters, self.INPUT, context)
+        if layer is None:
+            raise QgsProcessingException(self.invalidSourceError(parameters, self.INPUT))
+        settings = self.settings(parameters, context, layer)
+        store = None
+        if self.parameterAsBoolean(parameters, self.USE_STORE, context):
+            store = GeometryStore()
+        self.generator = PointGenerator(layer, settings, None, store=store)
+        return True
+
+    def processAlgorithm(self, parameters, context, feedback):  # pylint: disable=invalid-name
+        """Generate the points into the output sink."""
+        generator = self.generator
+        sink, dest_id = self.parameterAsSink(
+            parameters, self.OUTPUT, context, output_fields(), Qgis.WkbType.Point,
+            generator.layer.crs(),
+        )
+        if sink is None:
+            raise QgsProcessingException(self.invalidSinkError(parameters, self.OUTPUT))
+        generator.destination = SinkDestination(sink)
+        try:
+            generator.run(feedback)
+        except WriteError as e:
+            raise QgsProcessingException(str(e)) from e
+        generator.destination.finish()
+        for warning in generator.warnings:
+            feedback.pushWarning(warning)
+
+        results = {
+            self.OUTPUT: dest_id,
+            self.POINT_COUNT: generator.point_count,
+            self.RUN_SEED: generator.run_seed,
+        }
+        if parameters.get(self.SHORTFALL) is not None:
+            fields = shortfall_fields()
+            table, table_id = self.parameterAsSink(
+                parameters, self.SHORTFALL, context, fields, Qgis.WkbType.NoGeometry,
+                QgsCoordinateReferenceSystem(),
+            )
+            if table is not None:
+                table.addFeatures(
+                    shortfall_features(generator.shortfalls, fields),
+                    QgsFeatureSink.Flag.FastInsert,
+                )
+                results[self.SHORTFALL] = table_id
+        if generator.report.enabled:
+            generator.write_report()
+            results[self.REPORT] = generator.settings.report_path
+        if generator.profile.enabled:
+            results[self.PROFILE] = generator.write_profile()[0]
+        return results
+
+    def postProcessAlgorithm(self, context, feedback):  # pylint: disable=invalid-name,unused-argument
+        """Record the stage times in the profiler, on the main thread."""
+        if self.generator is not None and self.generator.report.enabled:
+            self.generator.report.publish()
+        return {}
@@ -1,27 +1,44 @@
 import os
-import random
+import time
 
 from qgis.PyQt.QtWidgets import (
     QDialog, QVBoxLayout, QLabel, QPushButton,
-    QSpinBox, QCheckBox,
+    QSpinBox, QCheckBox, QMessageBox,
     QStyle, QHBoxLayout, QGroupBox,
 )
-from qgis.gui import QgsMapLayerComboBox, QgsFieldExpressionWidget
+from qgis.gui import QgsMapLayerComboBox, QgsFieldExpressionWidget, QgsFileWidget
 from qgis.core import (
-    QgsVectorLayer, QgsFeature,
-    QgsGeometry, QgsPointXY, QgsWkbTypes, QgsProject,
-    QgsFieldProxyModel, QgsField, QgsExpression,
+    QgsApplication, QgsCoordinateTransform, QgsVectorLayer, QgsWkbTypes,
+    QgsProject,
+    QgsFieldProxyModel, QgsExpression,
     Qgis,
 )
-from qgis.PyQt.QtCore import Qt, pyqtSignal, QMetaType
+from qgis.PyQt.QtCore import Qt, QTimer, pyqtSignal
 from qgis.PyQt import QtWidgets
 from qgis.utils import iface
-from qgis.core import QgsExpressionContext, QgsExpressionContextUtils
+
+from .estimator import (
+    Throughput, available_memory, estimate_run, format_bytes, format_seconds,
+    new_scan_task, scan_key,
+)
+from .generation_task import GenerationTask
+from .generator import GenerationSettings, PointGenerator
+from .geometry_cache import LineTableCache
+from .geometry_store import GeometryStore
+from .incremental import EditTracker, UpdateTask
+from .point_writer import (
+    AUTO_FILE_THRESHOLD, FILE_FILTER, FileDestination, MemoryDestination,
+    ReplaceDestination, file_driver, is_flatgeobuf, output_path, run_profile_path,
+    run_report_path, shortfall_layer, temporary_file_path,
+)
+from .sampling_engine import MAX_SEED
 
 
 class RandomPointsDialog(QDialog):
     closingPlugin = pyqtSignal()
     DIALOG_TITLE = "Random Points Along Line V4.0"
+    # Milliseconds without parameter changes before the estimate is updated
+    ESTIMATE_DELAY = 400
 
     def __init__(self, iface):
         """Constructor."""
@@ -31,6 +48,20 @@ class RandomPointsDialog(QDialog):
 
         self.warning_shown = False
         self.mirroring = False
+        self.task = None
+        # Prepared lines kept between runs of this session
+        self.geometry_cache = LineTableCache()
+        self.geometry_store = GeometryStore()
+        # Follows the source edits of the last tracked run
+        self.tracker = None
+        # Source layer ID, output layer ID and settings of the last complete run
+        self.last_output = None
+        # Scan of the features of the current settings for the run estimate
+        self.scan = None
+        self.scan_task = None
+        self.scanned_layer = None
+        self.throughput = Throughput()
+        self.task_started = 0.0
 
         self.setup_ui()
         self.update_widget_state()
@@ -66,6 +97,20 @@ class RandomPointsDialog(QDialog):
         self.selected_features_checkbox.setChecked(False)
         layer_layout.addWidget(self.selected_features_checkbox)
 
+        self.extent_checkbox = QCheckBox("Use only features in the current map extent")
+        self.extent_checkbox.setChecked(False)
+        layer_layout.addWidget(self.extent_checkbox)
+
+        filter_layout = QHBoxLayout()
+        filter_label = QLabel("Feature Filter:")
+        self.filter_expression = QgsFieldExpressionWidget()
+        self.filter_expression.setToolTip(
+            "Only generate points on features matching this expression (empty for all features)"
+        )
+        filter_layout.addWidget(filter_label)
+        filter_layout.addWidget(self.filter_expression)
+        layer_layout.addLayout(filter_layout)
+
         layout.addWidget(layer_group)
 
         offset_group = QGroupBox("Offset Settings")
@@ -103,6 +148,34 @@ class RandomPointsDialog(QDialog):
         mirror_reset_layout.addWidget(self.reset_button)
         offset_layout.addLayout(mirror_reset_layout)
 
+        self.dynamic_offset_checkbox = QCheckBox("Use Fields for Dynamic Offsets")
+        self.dynamic_offset_checkbox.setChecked(False)
+        self.dynamic_offset_checkbox.setToolTip(
+            "Read the offsets of every feature from a field or expression "
+            "(an empty expression keeps the offset set above)"
+        )
+        offset_layout.addWidget(self.dynamic_offset_checkbox)
+
+        start_expression_layout = QHBoxLayout()
+        start_expression_label = QLabel("Start Offset:")
+        self.start_expression = QgsFieldExpressionWidget()
+        self.start_expression.setAllowEmptyFieldName(True)
+        self.start_expression.setFilters(QgsFieldProxyModel.Filter.Numeric)
+        self.start_expression.setEnabled(False)
+        start_expression_layout.addWidget(start_expression_label)
+        start_expression_layout.addWidget(self.start_expression)
+        offset_layout.addLayout(start_expression_layout)
+
+        end_expression_layout = QHBoxLayout()
+        end_expression_label = QLabel("End Offset:")
+        self.end_expression = QgsFieldExpressionWidget()
+        self.end_expression.setAllowEmptyFieldName(True)
+        self.end_expression.setFilters(QgsFieldProxyModel.Filter.Numeric)
+        self.end_expression.setEnabled(False)
+        end_expression_layout.addWidget(end_expression_label)
+        end_expression_layout.addWidget(self.end_expression)
+        offset_layout.addLayout(end_expression_layout)
+
         layout.addWidget(offset_group)
 
         generation_group = QGroupBox("Point Generation Settings")
@@ -112,7 +185,7 @@ class RandomPointsDialog(QDialog):
         seed_layout = QHBoxLayout()
         seed_label = QLabel("Random Seed:")
         self.seed_spin = QSpinBox()
-        self.seed_spin.setRange(-1, 999999)
+        self.seed_spin.setRange(-1, MAX_SEED)
         self.seed_spin.setValue(-1)
         self.seed_spin.setToolTip("Set a seed for reproducible results (-1 for random)")
         seed_layout.addWidget(seed_label)
@@ -129,6 +202,42 @@ class RandomPointsDialog(QDialog):
         min_dist_layout.addWidget(self.min_distance_spin)
         generation_layout.addLayout(min_dist_layout)
 
+        self.dynamic_distance_checkbox = QCheckBox("Use Field for Dynamic Min. Distance")
+        self.dynamic_distance_checkbox.setChecked(False)
+        generation_layout.addWidget(self.dynamic_distance_checkbox)
+
+        self.min_distance_expression = QgsFieldExpressionWidget()
+        self.min_distance_expression.setFilters(QgsFieldProxyModel.Filter.Numeric)
+        self.min_distance_expression.setEnabled(False)
+        generation_layout.addWidget(self.min_distance_expression)
+
+        self.global_distance_checkbox = QCheckBox("Apply Min. Distance Across Features")
+        self.global_distance_checkbox.setChecked(False)
+        self.global_distance_checkbox.setToolTip(
+            "Keep the minimum distance between points of different features too"
+        )
+        generation_layout.addWidget(self.global_distance_checkbox)
+
+        self.along_line_checkbox = QCheckBox("Measure Min. Distance Along the Line")
+        self.along_line_checkbox.setChecked(False)
+        self.along_line_checkbox.setToolTip(
+            "Space points by distance along the line instead of straight-line distance"
+        )
+        generation_layout.addWidget(self.along_line_checkbox)
+
+        max_gap_layout = QHBoxLayout()
+        max_gap_label = QLabel("Max. Gap:")
+        self.max_gap_spin = QtWidgets.QDoubleSpinBox()
+        self.max_gap_spin.setRange(0, 999999)
+        self.max_gap_spin.setValue(0)
+        self.max_gap_spin.setToolTip(
+            "Maximum distance along the line between consecutive points (0 for no maximum)"
+        )
+        self.max_gap_spin.setEnabled(False)
+        max_gap_layout.addWidget(max_gap_label)
+        max_gap_layout.addWidget(self.max_gap_spin)
+        generation_layout.addLayout(max_gap_layout)
+
         self.dynamic_point_checkbox = QCheckBox("Use Field for Dynamic Point Generation")
         self.dynamic_point_checkbox.setChecked(False)
         generation_layout.addWidget(self.dynamic_point_checkbox)
@@ -149,6 +258,173 @@ class RandomPointsDialog(QDialog):
 
         layout.addWidget(generation_group)
 
+        performance_group = QGroupBox("Performance Settings")
+        performance_layout = QVBoxLayout()
+        performance_group.setLayout(performance_layout)
+
+        workers_layout = QHBoxLayout()
+        workers_label = QLabel("Worker Processes:")
+        self.workers_spin = QSpinBox()
+        self.workers_spin.setRange(1, max(os.cpu_count() or 1, 1))
+        self.workers_spin.setValue(1)
+        self.workers_spin.setToolTip(
+            "Number of processes sampling in parallel. The points are identical to a "
+            "single process run with the same seed. Not used when the minimum distance "
+            "is applied across features"
+        )
+        workers_layout.addWidget(workers_label)
+        workers_layout.addWidget(self.workers_spin)
+        performance_layout.addLayout(workers_layout)
+
+        self.pipeline_checkbox = QCheckBox("Pipelined Reading, Sampling and Writing")
+        self.pipeline_checkbox.setChecked(False)
+        self.pipeline_checkbox.setToolTip(
+            "Read, sample and write in parallel threads connected by bounded queues"
+        )
+        performance_layout.addWidget(self.pipeline_checkbox)
+
+        memory_layout = QHBoxLayout()
+        memory_label = QLabel("Pipeline Memory Cap (MB):")
+        self.memory_limit_spin = QSpinBox()
+        self.memory_limit_spin.setRange(16, 65536)
+        self.memory_limit_spin.setValue(256)
+        self.memory_limit_spin.setToolTip(
+            "Peak memory of the data queued between the pipeline stages"
+        )
+        self.memory_limit_spin.setEnabled(False)
+        memory_layout.addWidget(memory_label)
+        memory_layout.addWidget(self.memory_limit_spin)
+        performance_layout.addLayout(memory_layout)
+
+        cache_layout = QHBoxLayout()
+        cache_label = QLabel("Geometry Cache (MB):")
+        self.cache_limit_spin = QSpinBox()
+        self.cache_limit_spin.setRange(0, 65536)
+        self.cache_limit_spin.setValue(LineTableCache.DEFAULT_MEMORY_LIMIT // (1024 * 1024))
+        self.cache_limit_spin.setToolTip(
+            "Keep the prepared lines in memory, so later runs on the same layer do not "
+            "read the geometries again (0 to disable)"
+        )
+        cache_layout.addWidget(cache_label)
+        cache_layout.addWidget(self.cache_limit_spin)
+        performance_layout.addLayout(cache_layout)
+
+        store_layout = QHBoxLayout()
+        self.store_checkbox = QCheckBox("Persistent Geometry Cache")
+        self.store_checkbox.setChecked(False)
+        self.store_checkbox.setToolTip(
+            "Keep the prepared lines on disk in the QGIS profile, so slow or remote "
+            "sources are only read again after they changed"
+        )
+        self.clear_cache_button = QPushButton("Clear Caches")
+        self.clear_cache_button.setToolTip("Delete the cached lines in memory and on disk")
+        store_layout.addWidget(self.store_checkbox)
+        store_layout.addWidget(self.clear_cache_button)
+        performance_layout.addLayout(store_layout)
+
+        self.report_checkbox = QCheckBox("Write Run Report")
+        self.report_checkbox.setChecked(False)
+        self.report_checkbox.setToolTip(
+            "Time every stage of the run for the QGIS profiler panel and write the timings "
+            "and counters to a JSON file next to the output"
+        )
+        performance_layout.addWidget(self.report_checkbox)
+
+        self.profile_checkbox = QCheckBox("Capture Profile")
+        self.profile_checkbox.setChecked(False)
+        self.profile_checkbox.setToolTip(
+            "Run under cProfile and tracemalloc and save a .pstats file and a report of the "
+            "largest allocations next to the output. Slows the run down; worker processes "
+            "and the reading and writing threads of a pipelined run are not profiled"
+        )
+        performance_layout.addWidget(self.profile_checkbox)
+
+        layout.addWidget(performance_group)
+
+        output_group = QGroupBox("Output")
+        output_layout = QVBoxLayout()
+        output_group.setLayout(output_layout)
+
+        self.output_file_widget = QgsFileWidget()
+        self.output_file_widget.setStorageMode(QgsFileWidget.StorageMode.SaveFile)
+        self.output_file_widget.setFilter(FILE_FILTER)
+        self.output_file_widget.lineEdit().setPlaceholderText("[Create temporary layer]")
+        self.output_file_widget.setToolTip(
+            "Write the points to a GeoPackage or FlatGeobuf file (leave empty for a temporary layer)"
+        )
+        output_layout.addWidget(self.output_file_widget)
+
+        self.keep_partial_checkbox = QCheckBox("Keep Partial Results on Cancel")
+        self.keep_partial_checkbox.setChecked(False)
+        output_layout.addWidget(self.keep_partial_checkbox)
+
+        self.replace_checkbox = QCheckBox("Replace Previous Output")
+        self.replace_checkbox.setChecked(False)
+        self.replace_checkbox.setToolTip(
+            "Write the points into the temporary or file layer of the last run instead of "
+            "creating a new layer. The layer keeps its style"
+        )
+        output_layout.addWidget(self.replace_checkbox)
+
+        self.shortfall_checkbox = QCheckBox("Add Shortfall Table")
+        self.shortfall_checkbox.setChecked(False)
+        self.shortfall_checkbox.setToolTip(
+            "Add a table of the features that got fewer points than requested, with the "
+            "requested and generated points and the rejected candidates"
+        )
+        output_layout.addWidget(self.shortfall_checkbox)
+
+        track_layout = QHBoxLayout()
+        self.track_edits_checkbox = QCheckBox("Track Source Edits")
+        self.track_edits_checkbox.setChecked(False)
+        self.track_edits_checkbox.setToolTip(
+            "Remember which line produced which points, so the points of edited lines "
+            "can be updated without regenerating the whole layer"
+        )
+        self.update_button = QPushButton("Update Edited Lines")
+        self.update_button.setToolTip(
+            "Regenerate the points of the lines added, changed or deleted since the "
+            "last tracked run. The points of all other lines stay the same"
+        )
+        self.update_button.setEnabled(False)
+        track_layout.addWidget(self.track_edits_checkbox)
+        track_layout.addWidget(self.update_button)
+        output_layout.addLayout(track_layout)
+
+        layout.addWidget(output_group)
+
+        estimate_group = QGroupBox("Estimate")
+        estimate_layout = QVBoxLayout()
+        estimate_group.setLayout(estimate_layout)
+
+        self.estimate_label = QLabel("")
+        self.estimate_label.setWordWrap(True)
+        self.estimate_label.setToolTip(
+            "Features, usable length after the offsets and expected points, memory and "
+            "runtime of a run with the current settings"
+        )
+        estimate_layout.addWidget(self.estimate_label)
+
+        budget_layout = QHBoxLayout()
+        budget_label = QLabel("Warn Above (min):")
+        self.time_budget_spin = QSpinBox()
+        self.time_budget_spin.setRange(0, 10000)
+        self.time_budget_spin.setValue(10)
+        self.time_budget_spin.setToolTip(
+            "Ask before starting a run expected to take longer (0 to never ask). "
+            "Runs expected to exceed the free memory are always confirmed"
+        )
+        budget_layout.addWidget(budget_label)
+        budget_layout.addWidget(self.time_budget_spin)
+        estimate_layout.addLayout(budget_layout)
+
+        layout.addWidget(estimate_group)
+
+        self.estimate_timer = QTimer(self)
+        self.estimate_timer.setSingleShot(True)
+        self.estimate_timer.setInterval(self.ESTIMATE_DELAY)
+        self.estimate_timer.timeout.connect(self.update_estimate)
+
         self.generate_button = QPushButton("Generate Points")
         layout.addWidget(self.generate_button)
 
@@ -160,10 +436,34 @@ class RandomPointsDialog(QDialog):
         self.end_slider.valueChanged.connect(self.slider2_changed)
         self.mirror_checkbox.stateChanged.connect(self.mirror_changed)
         self.reset_button.clicked.connect(self.reset_sliders)
+        self.clear_cache_button.clicked.connect(self.clear_caches)
+        self.update_button.clicked.connect(self.update_edited_features)
         self.dynamic_point_checkbox.stateChanged.connect(self.update_field_expression_state)
+        self.dynamic_offset_checkbox.toggled.connect(self.start_expression.setEnabled)
+        self.dynamic_offset_checkbox.toggled.connect(self.end_expression.setEnabled)
+        self.dynamic_distance_checkbox.stateChanged.connect(self.update_distance_state)
+        self.along_line_checkbox.stateChanged.connect(self.update_spacing_state)
+        self.pipeline_checkbox.toggled.connect(self.memory_limit_spin.setEnabled)
         self.generate_button.clicked.connect(self.generate_points)
         self.layer_combo.layerChanged.connect(self.field_expression.setLayer)
+        self.layer_combo.layerChanged.connect(self.filter_expression.setLayer)
+        self.layer_combo.layerChanged.connect(self.start_expression.setLayer)
+        self.layer_combo.layerChanged.connect(self.end_expression.setLayer)
+        self.layer_combo.layerChanged.connect(self.min_distance_expression.setLayer)
         self.layer_combo.layerChanged.connect(self.update_widget_state)
+        for signal in (
+            self.layer_combo.layerChanged, self.selected_features_checkbox.toggled,
+            self.extent_checkbox.toggled, self.filter_expression.fieldChanged,
+            self.start_slider.valueChanged, self.end_slider.valueChanged,
+            self.dynamic_offset_checkbox.toggled, self.start_expression.fieldChanged,
+            self.end_expression.fieldChanged, self.min_distance_spin.valueChanged,
+            self.dynamic_distance_checkbox.toggled, self.min_distance_expression.fieldChanged,
+            self.along_line_checkbox.toggled, self.dynamic_point_checkbox.toggled,
+            self.field_expression.fieldChanged, self.num_points_spin.valueChanged,
+            self.output_file_widget.fileChanged, self.cache_limit_spin.valueChanged,
+        ):
+            signal.connect(self.schedule_estimate)
+        self.iface.mapCanvas().extentsChanged.connect(self.canvas_extent_changed)
 
         self.setWindowFlags(
             Qt.WindowType.Dialog
@@ -171,7 +471,7 @@ class RandomPointsDialog(QDialog):
             | Qt.WindowType.WindowMinMaxButtonsHint
             | Qt.WindowType.WindowCloseButtonHint
         )
-        self.resize(420, 540)
+        self.resize(420, 960)
 
     @staticmethod
     def _is_line_layer(layer):
@@ -206,18 +506,41 @@ class RandomPointsDialog(QDialog):
         """Enable all interactive widgets."""
         self.layer_combo.setEnabled(True)
         self.selected_features_checkbox.setEnabled(True)
+        self.extent_checkbox.setEnabled(True)
+        self.filter_expression.setEnabled(True)
         self.start_slider.setEnabled(True)
         self.start_spin.setEnabled(True)
         self.end_slider.setEnabled(True)
         self.end_spin.setEnabled(True)
         self.mirror_checkbox.setEnabled(True)
         self.reset_button.setEnabled(True)
+        self.dynamic_offset_checkbox.setEnabled(True)
+        self.start_expression.setEnabled(self.dynamic_offset_checkbox.isChecked())
+        self.end_expression.setEnabled(self.dynamic_offset_checkbox.isChecked())
         self.dynamic_point_checkbox.setEnabled(True)
         self.num_points_spin.setEnabled(True)
-        self.generate_button.setEnabled(True)
+        self.generate_button.setEnabled(self.task is None)
+        self.output_file_widget.setEnabled(True)
+        self.keep_partial_checkbox.setEnabled(True)
+        self.replace_checkbox.setEnabled(True)
+        self.shortfall_checkbox.setEnabled(True)
+        self.track_edits_checkbox.setEnabled(True)
+        self.update_button.setEnabled(self.task is None and self.tracker is not None)
         self.seed_spin.setEnabled(True)
         self.min_distance_spin.setEnabled(True)
+        self.dynamic_distance_checkbox.setEnabled(True)
+        self.workers_spin.setEnabled(True)
+        self.pipeline_checkbox.setEnabled(True)
+        self.memory_limit_spin.setEnabled(self.pipeline_checkbox.isChecked())
+        self.cache_limit_spin.setEnabled(True)
+        self.store_checkbox.setEnabled(True)
+        self.clear_cache_button.setEnabled(True)
+        self.report_checkbox.setEnabled(True)
+        self.profile_checkbox.setEnabled(True)
+        self.time_budget_spin.setEnabled(True)
+        self.along_line_checkbox.setEnabled(True)
         self.update_field_expression_state(self.dynamic_point_checkbox.checkState())
+        self.update_distance_state(self.dynamic_distance_checkbox.checkState())
 
     def update_widget_state(self, *_args):
         """Enable or disable widgets based on available line layers."""
@@ -313,99 +636,282 @@ class RandomPointsDialog(QDialog):
         self.field_expression.setEnabled(checked)
         self.num_points_spin.setEnabled(not checked)
 
-    def generate_random_points(self, line, num_points):
-        """Generate random points along a given line geometry."""
-        if self.seed_spin.value() >= 0:
-            random.seed(self.seed_spin.value())
-
-        points = []
-        length = line.length()
-        min_distance = length * (self.start_slider.value() / 100)
-        max_distance = length * (1 - (self.end_slider.value() / 100))
-
-        attempts = 0
-        max_attempts = 1000
-        min_dist = self.min_distance_spin.value()
-
-        while len(points) < num_points and attempts < max_attempts:
-            distance = random.uniform(min_distance, max_distance)
-            point = line.interpolate(distance)
-            point_xy = point.asPoint()
-
-            if min_dist > 0:
-                too_close = False
-                for existing_point, _ in points:
-                    if point_xy.distance(existing_point) < min_dist:
-                        too_close = True
-                        break
-                if too_close:
-                    attempts += 1
-                    continue
+    def update_spacing_state(self, *_args):
+        """Switch between along-line and straight-line spacing options."""
+        along_line = self.along_line_checkbox.isChecked()
+        self.max_gap_spin.setEnabled(along_line)
+        # The layer-wide check needs the same distance for every feature
+        self.global_distance_checkbox.setEnabled(
+            not along_line and not self.dynamic_distance_checkbox.isChecked()
+        )
+
+    def update_distance_state(self, state):
+        """Switch between a fixed and a data-defined minimum distance."""
+        checked = state == Qt.CheckState.Checked
+        self.min_distance_expression.setEnabled(checked)
+        self.min_distance_spin.setEnabled(not checked)
+        self.update_spacing_state()
+
+    def clear_caches(self):
+        """Delete the cached lines in memory and on disk."""
+        self.geometry_cache.clear()
+        self.geometry_store.clear()
+
+    def schedule_estimate(self, *_args):
+        """Update the estimate once the parameters stop changing."""
+        self.estimate_timer.start()
+
+    def canvas_extent_changed(self):
+        """Update the estimate of a run restricted to the map extent."""
+        if self.extent_checkbox.isChecked():
+            self.schedule_estimate()
+
+    def update_estimate(self):
+        """Show the estimate of the current settings.
+
+        The features are scanned in the background when the layer, its
+        filters or the data-defined expressions changed, otherwise the
+        estimate is recomputed from the last scan.
+        """
+        layer = self.layer_combo.currentLayer()
+        if layer is None or not self.isVisible():
+            self.estimate_label.setText("")
+            return
+        settings = self.current_settings(layer)
+        if self.scan is not None and self.scan.key == scan_key(layer, settings):
+            self.estimate_label.setText(self.current_estimate(settings).summary())
+            return
+        if self.scan_task is not None:
+            self.scan_task.cancel()
+        self.watch_scanned_layer(layer)
+        cache_limit = self.cache_limit_spin.value() * 1024 * 1024
+        self.geometry_cache.set_memory_limit(cache_limit)
+        self.scan_task = new_scan_task(
+            layer, settings, self.scan_finished,
+            self.geometry_cache if cache_limit else None,
+            self.geometry_store if self.store_checkbox.isChecked() else None,
+        )
+        self.estimate_label.setText("Estimating...")
+        QgsApplication.taskManager().addTask(self.scan_task)
 
-            points.append((point_xy, distance))
-            attempts = 0
+    def scan_finished(self, task, scan):
+        """Show the estimate of a finished feature scan."""
+        if task is not self.scan_task:
+            return
+        self.scan_task = None
+        self.scan = scan
+        if scan is None:
+            self.estimate_label.setText("")
+            return
+        self.update_estimate()
+
+    def current_estimate(self, settings):
+        """Return the estimate of a run from the matching scan."""
+        return estimate_run(
+            self.scan, settings, self.throughput,
+            not self.output_file_widget.filePath(),
+            self.cache_limit_spin.value() * 1024 * 1024,
+        )
 
-        if len(points) < num_points:
-            self.iface.messageBar().pushMessage(
-                "Warning",
-                f"Could only generate {len(points)} points while maintaining minimum distance of {min_dist}",
-                level=Qgis.MessageLevel.Warning,
-                duration=5,
-            )
+    def watch_scanned_layer(self, layer):
+        """Drop the scan when the scanned layer is edited."""
+        if self.scanned_layer is layer:
+            return
+        if self.scanned_layer is not None:
+            try:
+                self.scanned_layer.layerModified.disconnect(self.scanned_layer_changed)
+                self.scanned_layer.dataChanged.disconnect(self.scanned_layer_changed)
+                self.scanned_layer.selectionChanged.disconnect(self.scanned_selection_changed)
+            except (TypeError, RuntimeError):
+                # The layer was already deleted
+                pass
+        self.scanned_layer = layer
+        layer.layerModified.connect(self.scanned_layer_changed)
+        layer.dataChanged.connect(self.scanned_layer_changed)
+        layer.selectionChanged.connect(self.scanned_selection_changed)
+
+    def scanned_layer_changed(self):
+        """Scan the edited layer again."""
+        self.scan = None
+        self.schedule_estimate()
+
+    def scanned_selection_changed(self, *_args):
+        """Scan the selected features again when only they are used."""
+        if self.selected_features_checkbox.isChecked():
+            self.scanned_layer_changed()
 
-        return points
+    def confirm_estimate(self, layer, settings):
+        """Ask before a run expected to exceed the free memory or time budget.
 
-    def validate_expression(self):
-        """Validate that the field expression returns a numeric value."""
-        if not self.dynamic_point_checkbox.isChecked():
+        :returns: False if the run should not start.
+        :rtype: bool
+        """
+        if self.scan is None or self.scan.key != scan_key(layer, settings):
+            return True
+        estimate = self.current_estimate(settings)
+        reasons = []
+        available = available_memory()
+        if available is not None and estimate.memory_bytes > available:
+            reasons.append(
+                f"needs about {format_bytes(estimate.memory_bytes)} of memory while "
+                f"{format_bytes(available)} are free"
+            )
+        budget = self.time_budget_spin.value() * 60
+        if budget and estimate.seconds > budget:
+            reasons.append(f"is expected to take {format_seconds(estimate.seconds)}")
+        if not reasons:
             return True
+        answer = QMessageBox.question(
+            self, self.DIALOG_TITLE,
+            f"This run of {estimate.point_count:,} points " + " and ".join(reasons)
+            + ". Generate the points anyway?",
+        )
+        return answer == QMessageBox.StandardButton.Yes
 
-        layer = self.layer_combo.currentLayer()
-        if not layer:
-            return False
+    def estimated_point_count(self, layer):
+        """Return the expected number of output points, None if unknown."""
+        settings = self.current_settings(layer)
+        if self.scan is not None and self.scan.key == scan_key(layer, settings):
+            return self.current_estimate(settings).point_count
+        if self.dynamic_point_checkbox.isChecked():
+            return None
+        if self.selected_features_checkbox.isChecked():
+            feature_count = layer.selectedFeatureCount()
+        else:
+            feature_count = layer.featureCount()
+        if feature_count < 0:
+            return None
+        return feature_count * self.num_points_spin.value()
+
+    def create_destination(self, layer):
+        """Create the memory layer or file the points are written to.
+
+        Without an output file, runs expected to exceed AUTO_FILE_THRESHOLD
+        points are written to a temporary GeoPackage instead of memory.
+        """
+        path = self.output_file_widget.filePath()
+        if not path:
+            estimate = self.estimated_point_count(layer)
+            if estimate is None or estimate <= AUTO_FILE_THRESHOLD:
+                return MemoryDestination(layer.crs())
+            path = temporary_file_path()
+            self.iface.messageBar().pushMessage(
+                "Info",
+                f"About {estimate} points expected, writing them to the temporary file {path}",
+                level=Qgis.MessageLevel.Info,
+                duration=5,
+            )
+        return FileDestination(
+            output_path(path), layer.crs(), QgsProject.instance().transformContext()
+        )
 
-        expression = QgsExpression(self.field_expression.currentText())
+    def replace_destination(self, layer, settings):
+        """Return a destination rewriting the output of the last run.
+
+        The layer is only changed once the run has succeeded: the points
+        are overwritten in place when only their placement changed,
+        otherwise they replace the old points. Returns None when the
+        previous output is not replaced.
+        """
+        if (not self.replace_checkbox.isChecked() or self.last_output is None
+                or self.output_file_widget.filePath()):
+            return None
+        source_id, output_id, previous = self.last_output
+        output = QgsProject.instance().mapLayer(output_id)
+        if output is None or output.crs() != layer.crs():
+            return None
+        if is_flatgeobuf(output):
+            self.iface.messageBar().pushMessage(
+                "Info",
+                "Creating a new layer, FlatGeobuf output cannot be replaced.",
+                level=Qgis.MessageLevel.Info,
+                duration=5,
+            )
+            return None
+        if self.tracker is not None and self.tracker.output_layer is output:
+            self.set_tracker(None)
+        update = source_id == layer.id() and settings.only_placement_differs(previous)
+        destination = ReplaceDestination(output, update)
+        if destination.error:
+            self.iface.messageBar().pushMessage(
+                "Info",
+                f"Creating a new layer, {destination.error}.",
+                level=Qgis.MessageLevel.Info,
+                duration=5,
+            )
+            return None
+        return destination
+
+    def validate_filter_expression(self):
+        """Validate the syntax of the feature filter expression."""
+        expression = QgsExpression(self.filter_expression.currentText())
         if expression.hasParserError():
             self.iface.messageBar().pushMessage(
                 "Warning",
-                "Invalid expression: " + expression.parserErrorString(),
+                "Invalid feature filter: " + expression.parserErrorString(),
                 level=Qgis.MessageLevel.Warning,
                 duration=5,
             )
             return False
+        return True
 
-        context = QgsExpressionContext()
-        context.appendScope(QgsExpressionContextUtils.layerScope(layer))
-
-        for feature in layer.getFeatures():
-            context.setFeature(feature)
-            value = expression.evaluate(context)
+    def data_defined_expressions(self):
+        """Return the enabled data-defined expressions by label."""
+        expressions = {}
+        if self.dynamic_point_checkbox.isChecked():
+            expressions["Number of Points"] = self.field_expression.currentText()
+        if self.dynamic_offset_checkbox.isChecked():
+            expressions["Start Offset"] = self.start_expression.currentText()
+            expressions["End Offset"] = self.end_expression.currentText()
+        if self.dynamic_distance_checkbox.isChecked():
+            expressions["Min. Distance"] = self.min_distance_expression.currentText()
+        return expressions
 
-            if value is None:
+    def validate_expression(self):
+        """Validate the syntax of the data-defined expressions.
+
+        The values are checked per feature while the points are generated,
+        invalid features are skipped and reported at the end of the run.
+        """
+        for label, text in self.data_defined_expressions().items():
+            if not text:
+                if label in ("Start Offset", "End Offset"):
+                    continue
                 self.iface.messageBar().pushMessage(
                     "Warning",
-                    "Expression returns no value",
+                    f"Please choose a field or expression for {label}.",
                     level=Qgis.MessageLevel.Warning,
                     duration=5,
                 )
                 return False
 
-            if not isinstance(value, (int, float)) or value <= 0:
+            expression = QgsExpression(text)
+            if expression.hasParserError():
                 self.iface.messageBar().pushMessage(
                     "Warning",
-                    "Expression must return a positive number",
+                    f"Invalid expression for {label}: " + expression.parserErrorString(),
                     level=Qgis.MessageLevel.Warning,
                     duration=5,
                 )
                 return False
 
-            break
-
         return True
 
     def generate_points(self):
         """Generate points based on user selection."""
-        if not self.validate_expression():
+        if not self.validate_expression() or not self.validate_filter_expression():
+            return
+
+        max_gap = self.max_gap_spin.value()
+        if (self.along_line_checkbox.isChecked() and max_gap > 0
+                and not self.dynamic_distance_checkbox.isChecked()
+                and max_gap < self.min_distance_spin.value()):
+            self.iface.messageBar().pushMessage(
+                "Warning",
+                "Max. Gap must not be smaller than Min. Distance.",
+                level=Qgis.MessageLevel.Warning,
+                duration=5,
+            )
             return
 
         layer = self.layer_combo.currentLayer()
@@ -418,83 +924,250 @@ class RandomPointsDialog(QDialog):
             )
             return
 
-        crs = layer.crs()
-        random_points_layer = QgsVectorLayer("Point", "Random Points", "memory")
-        random_points_layer.setCrs(crs)
+        if (self.selected_features_checkbox.isChecked()
+                and not layer.selectedFeatureCount()):
+            self.iface.messageBar().pushMessage(
+                "Warning",
+                "No features selected.",
+                level=Qgis.MessageLevel.Warning,
+                duration=5,
+            )
+            return
 
-        pr = random_points_layer.dataProvider()
-        pr.addAttributes([
-            QgsField("ID", QMetaType.Type.Int),
-            QgsField("Distance", QMetaType.Type.Double),
-            QgsField("XCoord", QMetaType.Type.Double),
-            QgsField("YCoord", QMetaType.Type.Double),
-            QgsField("CRSXCoord", QMetaType.Type.Double),
-            QgsField("CRSYCoord", QMetaType.Type.Double),
-        ])
-        random_points_layer.updateFields()
-        random_points_layer.startEditing()
+        settings = self.current_settings(layer)
+        if not self.confirm_estimate(layer, settings):
+            return
+        path = self.output_file_widget.filePath()
+        if self.report_checkbox.isChecked():
+            settings.report_path = run_report_path(output_path(path) if path else "")
+        if self.profile_checkbox.isChecked():
+            settings.profile_path = run_profile_path(output_path(path) if path else "")
+        destination = self.replace_destination(layer, settings)
+        if destination is None:
+            destination = self.create_destination(layer)
+        if destination.error:
+            self.iface.messageBar().pushMessage(
+                "Warning",
+                "Could not create output file: " + destination.error,
+                level=Qgis.MessageLevel.Warning,
+                duration=5,
+            )
+            return
 
-        unique_id = 1
+        cache_limit = self.cache_limit_spin.value() * 1024 * 1024
+        self.geometry_cache.set_memory_limit(cache_limit)
+        if settings.track_points and settings.global_min_distance:
+            settings.track_points = False
+            self.iface.messageBar().pushMessage(
+                "Info",
+                "Source edits are not tracked when the minimum distance applies across features.",
+                level=Qgis.MessageLevel.Info,
+                duration=5,
+            )
+        if (settings.track_points and isinstance(destination, FileDestination)
+                and file_driver(destination.path) == "FlatGeobuf"):
+            settings.track_points = False
+            self.iface.messageBar().pushMessage(
+                "Info",
+                "Source edits are not tracked for FlatGeobuf output.",
+                level=Qgis.MessageLevel.Info,
+                duration=5,
+            )
+        generator = PointGenerator(
+            layer, settings, destination,
+            self.geometry_cache if cache_limit else None,
+            self.geometry_store if self.store_checkbox.isChecked() else None,
+        )
+        self.task = GenerationTask(generator, self.generation_finished)
+        self.task_started = time.monotonic()
+        self.generate_button.setEnabled(False)
+        self.update_button.setEnabled(False)
+        QgsApplication.taskManager().addTask(self.task)
+
+    def canvas_extent(self, layer):
+        """Return the current map canvas extent in the CRS of ``layer``."""
+        canvas = self.iface.mapCanvas()
+        transform = QgsCoordinateTransform(
+            canvas.mapSettings().destinationCrs(), layer.crs(), QgsProject.instance()
+        )
+        return transform.transformBoundingBox(canvas.extent())
 
-        if self.selected_features_checkbox.isChecked():
-            features = layer.selectedFeatures()
-            if not features:
+    def current_settings(self, layer):
+        """Return the generation parameters set in the dialog."""
+        settings = GenerationSettings()
+        settings.num_points = self.num_points_spin.value()
+        if self.dynamic_point_checkbox.isChecked():
+            settings.expression = self.field_expression.currentText()
+        settings.start_percent = self.start_slider.value()
+        settings.end_percent = self.end_slider.value()
+        if self.dynamic_offset_checkbox.isChecked():
+            settings.start_expression = self.start_expression.currentText()
+            settings.end_expression = self.end_expression.currentText()
+        settings.seed = self.seed_spin.value()
+        settings.min_distance = self.min_distance_spin.value()
+        if self.dynamic_distance_checkbox.isChecked():
+            settings.min_distance_expression = self.min_distance_expression.currentText()
+        settings.global_min_distance = self.global_distance_checkbox.isChecked()
+        settings.along_line = self.along_line_checkbox.isChecked()
+        settings.max_gap = self.max_gap_spin.value()
+        settings.selected_only = self.selected_features_checkbox.isChecked()
+        settings.filter_expression = self.filter_expression.currentText()
+        if self.extent_checkbox.isChecked():
+            settings.extent = self.canvas_extent(layer)
+        settings.keep_partial = self.keep_partial_checkbox.isChecked()
+        settings.track_points = self.track_edits_checkbox.isChecked()
+        settings.workers = self.workers_spin.value()
+        settings.pipelined = self.pipeline_checkbox.isChecked()
+        settings.memory_limit = self.memory_limit_spin.value() * 1024 * 1024
+        return settings
+
+    def generation_finished(self, task, layer):
+        """Add the output of a finished generation task to the project."""
+        if task is self.task:
+            self.task = None
+        self.generate_button.setEnabled(self._has_usable_line_layer())
+
+        generator = task.generator
+        for warning in generator.warnings:
+            self.iface.messageBar().pushMessage(
+                "Warning",
+                warning,
+                level=Qgis.MessageLevel.Warning,
+                duration=5,
+            )
+        if task.exception is not None:
+            self.iface.messageBar().pushMessage(
+                "Error",
+                f"Random points generation failed: {task.exception}",
+                level=Qgis.MessageLevel.Critical,
+                duration=5,
+            )
+        elif generator.canceled:
+            self.iface.messageBar().pushMessage(
+                "Info",
+                f"Generation canceled after {generator.point_count} points.",
+                level=Qgis.MessageLevel.Info,
+                duration=5,
+            )
+        else:
+            settings = generator.settings
+            self.throughput.calibrate(
+                generator.report.features_read, generator.point_count,
+                not settings.along_line and (settings.min_distance > 0
+                                             or bool(settings.min_distance_expression)),
+                time.monotonic() - self.task_started,
+            )
+            self.schedule_estimate()
+        if generator.report.enabled and os.path.exists(generator.settings.report_path):
+            self.iface.messageBar().pushMessage(
+                "Info",
+                f"Run report written to {generator.settings.report_path}",
+                level=Qgis.MessageLevel.Info,
+                duration=5,
+            )
+        if generator.profile.enabled and os.path.exists(generator.settings.profile_path + ".pstats"):
+            self.iface.messageBar().pushMessage(
+                "Info",
+                f"Run profile written to {generator.settings.profile_path}.pstats",
+                level=Qgis.MessageLevel.Info,
+                duration=5,
+            )
+
+        if layer is not None:
+            if QgsProject.instance().mapLayer(layer.id()) is None:
+                QgsProject.instance().addMapLayer(layer)
+            self.iface.mapCanvas().refresh()
+            if not generator.canceled:
+                self.last_output = (generator.layer.id(), layer.id(), generator.settings)
+            if self.shortfall_checkbox.isChecked() and generator.shortfalls:
+                QgsProject.instance().addMapLayer(shortfall_layer(generator.shortfalls))
+            if generator.settings.track_points and not generator.canceled:
+                self.set_tracker(EditTracker(generator.layer, layer, generator))
+        self.update_button.setEnabled(self.tracker is not None)
+
+    def set_tracker(self, tracker):
+        """Replace the edit tracker of the last tracked run."""
+        if self.tracker is not None:
+            self.tracker.close()
+        self.tracker = tracker
+
+    def update_edited_features(self):
+        """Regenerate the points of the source features edited since the tracked run."""
+        tracker = self.tracker
+        if tracker is None:
+            return
+        project = QgsProject.instance()
+        if (project.mapLayer(tracker.layer.id()) is None
+                or project.mapLayer(tracker.output_layer.id()) is None):
+            self.set_tracker(None)
+            self.update_button.setEnabled(False)
+            self.iface.messageBar().pushMessage(
+                "Warning",
+                "The tracked line or points layer was removed, generate the points again.",
+                level=Qgis.MessageLevel.Warning,
+                duration=5,
+            )
+            return
+        if not tracker.pending():
+            self.iface.messageBar().pushMessage(
+                "Info",
+                "No lines were edited since the points were generated.",
+                level=Qgis.MessageLevel.Info,
+                duration=5,
+            )
+            return
+
+        try:
+            self.task = UpdateTask(tracker, self.update_finished)
+        except RuntimeError as e:
+            self.iface.messageBar().pushMessage(
+                "Warning",
+                f"Could not update the points: {e}",
+                level=Qgis.MessageLevel.Warning,
+                duration=5,
+            )
+            return
+        self.generate_button.setEnabled(False)
+        self.update_button.setEnabled(False)
+        QgsApplication.taskManager().addTask(self.task)
+
+    def update_finished(self, task):
+        """Report the end of an update of the edited features."""
+        if task is self.task:
+            self.task = None
+        self.generate_button.setEnabled(self._has_usable_line_layer())
+        self.update_button.setEnabled(self.tracker is not None)
+
+        if task.generator is not None:
+            for warning in task.generator.warnings:
                 self.iface.messageBar().pushMessage(
                     "Warning",
-                    "No features selected.",
+                    warning,
                     level=Qgis.MessageLevel.Warning,
                     duration=5,
                 )
-                return
-        else:
-            features = layer.getFeatures()
-
-        if self.dynamic_point_checkbox.isChecked():
-            expression = QgsExpression(self.field_expression.currentText())
-            context = QgsExpressionContext()
-            context.appendScope(QgsExpressionContextUtils.layerScope(layer))
-
-            for feature in features:
-                context.setFeature(feature)
-                num_points = expression.evaluate(context)
-                if num_points:
-                    random_points = self.generate_random_points(
-                        feature.geometry(), int(num_points)
-                    )
-                    for point, distance in random_points:
-                        point_feature = QgsFeature()
-                        point_feature.setGeometry(
-                            QgsGeometry.fromPointXY(QgsPointXY(point))
-                        )
-                        x_coord = point.x()
-                        y_coord = point.y()
-                        point_feature.setAttributes([
-                            unique_id, distance, x_coord, y_coord, x_coord, y_coord
-                        ])
-                        unique_id += 1
-                        pr.addFeatures([point_feature])
+        if task.exception is not None:
+            self.iface.messageBar().pushMessage(
+                "Warning",
+                f"Could not update the points: {task.exception}",
+                level=Qgis.MessageLevel.Warning,
+                duration=5,
+            )
+        elif task.isCanceled():
+            self.iface.messageBar().pushMessage(
+                "Info",
+                "Update canceled, the edited lines are kept for the next update.",
+                level=Qgis.MessageLevel.Info,
+                duration=5,
+            )
         else:
-            num_points = self.num_points_spin.value()
-            for feature in features:
-                random_points = self.generate_random_points(
-                    feature.geometry(), num_points
-                )
-                for point, distance in random_points:
-                    point_feature = QgsFeature()
-                    point_feature.setGeometry(
-                        QgsGeometry.fromPointXY(QgsPointXY(point))
-                    )
-                    x_coord = point.x()
-                    y_coord = point.y()
-                    point_feature.setAttributes([
-                        unique_id, distance, x_coord, y_coord, x_coord, y_coord
-                    ])
-                    unique_id += 1
-                    pr.addFeatures([point_feature])
-
-        random_points_layer.commitChanges()
-        QgsProject.instance().addMapLayer(random_points_layer)
-        iface.mapCanvas().refresh()
+            self.iface.messageBar().pushMessage(
+                "Info",
+                f"Updated the points of {task.edited()} edited lines.",
+                level=Qgis.MessageLevel.Info,
+                duration=5,
+            )
+            self.iface.mapCanvas().refresh()
 
     def show_help(self):
         """Show help dialog with instructions."""
@@ -519,18 +1192,43 @@ class RandomPointsDialog(QDialog):
         """Disable all widgets."""
         self.layer_combo.setEnabled(False)
         self.selected_features_checkbox.setEnabled(False)
+        self.extent_checkbox.setEnabled(False)
+        self.filter_expression.setEnabled(False)
         self.start_slider.setEnabled(False)
         self.start_spin.setEnabled(False)
         self.end_slider.setEnabled(False)
         self.end_spin.setEnabled(False)
         self.mirror_checkbox.setEnabled(False)
         self.reset_button.setEnabled(False)
+        self.dynamic_offset_checkbox.setEnabled(False)
+        self.start_expression.setEnabled(False)
+        self.end_expression.setEnabled(False)
         self.dynamic_point_checkbox.setEnabled(False)
         self.field_expression.setEnabled(False)
         self.num_points_spin.setEnabled(False)
         self.generate_button.setEnabled(False)
+        self.output_file_widget.setEnabled(False)
+        self.keep_partial_checkbox.setEnabled(False)
+        self.replace_checkbox.setEnabled(False)
+        self.shortfall_checkbox.setEnabled(False)
+        self.track_edits_checkbox.setEnabled(False)
+        self.update_button.setEnabled(False)
         self.seed_spin.setEnabled(False)
         self.min_distance_spin.setEnabled(False)
+        self.dynamic_distance_checkbox.setEnabled(False)
+        self.min_distance_expression.setEnabled(False)
+        self.workers_spin.setEnabled(False)
+        self.pipeline_checkbox.setEnabled(False)
+        self.memory_limit_spin.setEnabled(False)
+        self.cache_limit_spin.setEnabled(False)
+        self.store_checkbox.setEnabled(False)
+        self.clear_cache_button.setEnabled(False)
+        self.report_checkbox.setEnabled(False)
+        self.profile_checkbox.setEnabled(False)
+        self.time_budget_spin.setEnabled(False)
+        self.global_distance_checkbox.setEnabled(False)
+        self.along_line_checkbox.setEnabled(False)
+        self.max_gap_spin.setEnabled(False)
 
     def cancel(self):
         """Triggered when Cancel button is clicked."""
@@ -540,6 +1238,7 @@ class RandomPointsDialog(QDialog):
         """Refresh widget state each time the dialog is shown."""
         super().showEvent(event)
         self.update_widget_state()
+        self.schedule_estimate()
 
     def closeEvent(self, event):
         event.accept()
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+"""Processing provider of the Random Points on Lines plugin."""
+
+import os
+
+from qgis.PyQt.QtGui import QIcon
+from qgis.core import QgsProcessingProvider
+
+from .random_points_algorithm import RandomPointsAlgorithm
+
+
+class RandomPointsProvider(QgsProcessingProvider):
+    """Provide the random points algorithm to the Processing framework."""
+
+    def id(self):
+        """Return the provider id, the prefix of the algorithm ids."""
+        return "randompointsonlines"
+
+    def name(self):
+        """Return the provider name shown in the toolbox."""
+        return "Random Points on Lines"
+
+    def icon(self):
+        """Return the plugin icon."""
+        return QIcon(os.path.join(os.path.dirname(__file__), "icon.png"))
+
+    def loadAlgorithms(self):  # pylint: disable=invalid-name
+        """Register the algorithms of the provider."""
+        self.addAlgorithm(RandomPointsAlgorithm())
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""cProfile and tracemalloc capture of a generation run.
+
+A captured run saves two files next to its output: ``<name>.pstats``, the
+cProfile statistics of the thread running the generation, to be opened
+with :mod:`pstats` or a viewer like snakeviz, and ``<name>_allocations.txt``,
+the lines holding the most memory at the peak of the run with the slowest
+functions, headed by the input layer and the parameters of the run.
+
+The allocations are snapshot whenever the traced memory grew by a tenth
+since the last snapshot, at most a few dozen times per run.
+
+cProfile only sees the thread it is enabled on: the reading and writing
+stages of a pipelined run and the worker processes are missing from the
+statistics. tracemalloc traces every thread of the QGIS process. Memory
+allocated by C++ code, e.g. inside QgsGeometry, is not traced.
+"""
+
+import cProfile
+import io
+import os
+import pstats
+import tracemalloc
+
+# Frames kept per traced allocation
+ALLOCATION_FRAMES = 10
+# Entries of the allocation and function listings
+TOP_ENTRIES = 25
+# Growth of the traced memory since the last snapshot taking a new one
+SNAPSHOT_GROWTH = 1.1
+
+
+class RunProfile:
+    """Profile and allocation trace of one run."""
+
+    def __init__(self, enabled=False):
+        """Constructor.
+
+        :param enabled: Capture the run.
+        :type enabled: bool
+        """
+        self.enabled = enabled
+        self.profile = None
+        self.snapshot = None
+        # Traced memory when the snapshot was taken
+        self.snapshot_bytes = 0
+        self.peak_bytes = 0
+        self._started_tracing = False
+
+    def __enter__(self):
+        if self.enabled:
+            # Keep the tracing of whoever else started it
+            self._started_tracing = not tracemalloc.is_tracing()
+            if self._started_tracing:
+                tracemalloc.start(ALLOCATION_FRAMES)
+            tracemalloc.reset_peak()
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.enabled:
+            self.profile.disable()
+            self.checkpoint()
+            self.peak_bytes = tracemalloc.get_traced_memory()[1]
+            if self._started_tracing:
+                tracemalloc.stop()
+        return False
+
+    def checkpoint(self):
+        """Snapshot the allocations if the traced memory reached a new high.
+
+        Called once per group of features; cheap unless a snapshot is taken.
+        """
+        if not self.enabled:
+            return
+        current = tracemalloc.get_traced_memory()[0]
+        if self.snapshot is None or current > self.snapshot_bytes * SNAPSHOT_GROWTH:
+            self.snapshot_bytes = current
+            self.snapshot = tracemalloc.take_snapshot()
+
+    def write(self, path, header):
+        """Write the ``.pstats`` file and the allocations report.
+
+        :param path: Path of the files without extension.
+        :type path: str
+
+        :param header: Lines heading the allocations report, e.g. the input
+            layer and the parameters.
+        :type header: list
+
+        :returns: The paths of the statistics and of the report.
+        :rtype: (str, str)
+        """
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        stats_path = path + ".pstats"
+        report_path = path + "_allocations.txt"
+        self.profile.dump_stats(stats_path)
+
+        lines = list(header)
+        lines.append("")
+        lines.append(f"Profile: {os.path.basename(stats_path)}")
+        lines.append(f"Peak traced memory: {self.peak_bytes:,} bytes")
+        statistics = self.snapshot.filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<unknown>"),
+        )).statistics("lineno")
+        lines.append(f"Traced memory at the snapshot: {self.snapshot_bytes:,} bytes")
+        lines.append("")
+        lines.append(f"Top {TOP_ENTRIES} lines holding memory at the snapshot (size, blocks):")
+        for stat in statistics[:TOP_ENTRIES]:
+            frame = stat.traceback[0]
+            lines.append(
+                f"  {stat.size:>14,} {stat.count:>10,}  {frame.filename}:{frame.lineno}"
+            )
+
+        stream = io.StringIO()
+        stats = pstats.Stats(self.profile, stream=stream)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(TOP_ENTRIES)
+        lines.append("")
+        lines.append(f"Top {TOP_ENTRIES} functions by cumulative time:")
+        lines.append(stream.getvalue().strip("\n"))
+
+        with open(report_path, "w", encoding="utf-8") as report_file:
+            report_file.write("\n".join(lines) + "\n")
+        return stats_path, report_path
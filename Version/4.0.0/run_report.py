@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""Stage timings and counters of a generation run.
+
+When a run report is requested, the run measures the wall time spent in
+each stage: fetching features from the provider, evaluating the filter and
+data-defined expressions, preparing the lines, sampling, building the point
+features and handing them to the output provider. The times are recorded
+in the QGIS runtime profiler, shown in the Debugging/Development Tools
+panel, and written with the counters of the run to a JSON file.
+
+Without a report the stages are not timed; what remains are a few boolean
+checks per feature and the counters, which are updated once per group.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+
+from qgis.core import QgsApplication
+
+# Group of the records in the QGIS runtime profiler
+PROFILER_GROUP = "Random Points on Lines"
+
+# Stages in run order
+PROVIDER_READ = "Fetch features"
+EXPRESSIONS = "Evaluate expressions"
+PREPARE = "Prepare lines"
+VALIDATE = "Validate parameters"
+SAMPLE = "Sample points"
+BUILD = "Build point features"
+PROVIDER_WRITE = "Write to provider"
+STAGES = (PROVIDER_READ, EXPRESSIONS, PREPARE, VALIDATE, SAMPLE, BUILD, PROVIDER_WRITE)
+
+
+class RunReport:
+    """Stage timings and counters of one run."""
+
+    def __init__(self, enabled=False):
+        """Constructor.
+
+        :param enabled: Time the stages of the run.
+        :type enabled: bool
+        """
+        self.enabled = enabled
+        # Stage name -> seconds, excluding the stages nested in it;
+        # pipelined stages overlap in time
+        self.seconds = defaultdict(float)
+        self.local = threading.local()
+        self.wall_seconds = 0.0
+        self.features_read = 0
+        self.points = 0
+        self.rejected = 0
+        self.bytes_written = 0
+
+    def stage(self, name):
+        """Return a context manager timing ``name``, a no-op when disabled."""
+        if not self.enabled:
+            return nullcontext()
+        return self._timed(name)
+
+    @contextmanager
+    def _timed(self, name):
+        # Time of the nested stages of each open stage of this thread
+        stack = getattr(self.local, "stack", None)
+        if stack is None:
+            stack = self.local.stack = []
+        stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.seconds[name] += elapsed - stack.pop()
+            if stack:
+                stack[-1] += elapsed
+
+    def timed_iterator(self, name, iterator):
+        """Return ``iterator``, timing each step as ``name`` when enabled."""
+        if not self.enabled:
+            return iterator
+        return self._timed_iterator(name, iter(iterator))
+
+    def _timed_iterator(self, name, iterator):
+        seconds = self.seconds
+        clock = time.perf_counter
+        while True:
+            start = clock()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                seconds[name] += clock() - start
+                return
+            seconds[name] += clock() - start
+            yield item
+
+    def publish(self, name="Random points run"):
+        """Record the stage times in the QGIS runtime profiler.
+
+        Must be called on the main thread once the run has finished.
+        """
+        profiler = QgsApplication.profiler()
+        profiler.record(name, self.wall_seconds, PROFILER_GROUP)
+        for stage in STAGES:
+            if stage in self.seconds:
+                profiler.record(f"{name}: {stage}", self.seconds[stage], PROFILER_GROUP)
+
+    def as_dict(self):
+        """Return the timings and counters as plain data."""
+        return {
+            "wall_seconds": round(self.wall_seconds, 6),
+            "stage_seconds": {
+                stage: round(self.seconds[stage], 6) for stage in STAGES if stage in self.seconds
+            },
+            "counters": {
+                "features_read": self.features_read,
+                "points_produced": self.points,
+                "candidates_rejected": self.rejected,
+                "bytes_written": self.bytes_written,
+            },
+        }
+
+    def write(self, path, **details):
+        """Write the report as JSON.
+
+        :param path: File to write.
+        :type path: str
+
+        :param details: Further top-level entries, e.g. the run parameters.
+        """
+        report = self.as_dict()
+        report.update(details)
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as report_file:
+            json.dump(report, report_file, indent=2, default=str)
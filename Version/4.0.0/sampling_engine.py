@@ -0,0 +1,677 @@
+# -*- coding: utf-8 -*-
+"""Vectorized sampling engine for random points along lines.
+
+This module is deliberately free of any Qt/QGIS import so it can be used
+from worker threads, worker processes and tests. Line geometries are handed
+over as plain coordinate arrays; all sampling is done with NumPy.
+"""
+
+import math
+import secrets
+
+import numpy as np
+
+
+class LineTable:
+    """Vertex arrays and cumulative length table of one line feature.
+
+    Multipart lines are stored as consecutive parts. The jump from the last
+    vertex of one part to the first vertex of the next part is stored as a
+    zero length segment, so distances are measured along the parts only, the
+    same way ``QgsGeometry.interpolate`` measures them.
+    """
+
+    def __init__(self, parts):
+        """Constructor.
+
+        :param parts: Sequence of ``(x, y)`` coordinate array pairs, one per
+            line part.
+        :type parts: list
+        """
+        xs = []
+        ys = []
+        lengths = []
+        for part_x, part_y in parts:
+            part_x = np.asarray(part_x, dtype=np.float64)
+            part_y = np.asarray(part_y, dtype=np.float64)
+            if part_x.size == 0:
+                continue
+            if xs:
+                # Zero length link between two parts
+                lengths.append(np.zeros(1))
+            xs.append(part_x)
+            ys.append(part_y)
+            lengths.append(np.hypot(np.diff(part_x), np.diff(part_y)))
+
+        if xs:
+            self.x = np.concatenate(xs)
+            self.y = np.concatenate(ys)
+            segment_lengths = np.concatenate(lengths)
+        else:
+            self.x = np.zeros(0)
+            self.y = np.zeros(0)
+            segment_lengths = np.zeros(0)
+
+        self.cumulative = np.concatenate(([0.0], np.cumsum(segment_lengths)))
+        self.length = float(self.cumulative[-1]) if self.x.size else 0.0
+
+    @classmethod
+    def from_arrays(cls, x, y, cumulative):
+        """Create a table from already prepared vertex and length arrays."""
+        table = cls.__new__(cls)
+        table.x = x
+        table.y = y
+        table.cumulative = cumulative if x.size else np.zeros(1)
+        table.length = float(cumulative[-1]) if x.size else 0.0
+        return table
+
+    @property
+    def nbytes(self):
+        """Memory held by the vertex and length arrays."""
+        return self.x.nbytes + self.y.nbytes + self.cumulative.nbytes
+
+    def interpolate(self, distances):
+        """Return the coordinates at the given distances along the line.
+
+        :param distances: Distances from the start of the line.
+        :type distances: numpy.ndarray
+
+        :returns: Tuple of x and y coordinate arrays.
+        :rtype: (numpy.ndarray, numpy.ndarray)
+        """
+        distances = np.asarray(distances, dtype=np.float64)
+        if self.x.size == 0:
+            return np.zeros(0), np.zeros(0)
+        if self.x.size == 1:
+            return (np.full(distances.shape, self.x[0]),
+                    np.full(distances.shape, self.y[0]))
+
+        segment = np.searchsorted(self.cumulative, distances, side="right") - 1
+        np.clip(segment, 0, self.x.size - 2, out=segment)
+        return interpolate_segments(
+            self.x, self.y, self.cumulative, segment, distances
+        )
+
+
+class LineBatch:
+    """Ragged array of many prepared lines, in GeoArrow style.
+
+    The vertices of all lines are packed into flat coordinate arrays and
+    ``offsets[i]:offsets[i + 1]`` selects the vertices of line ``i``. The
+    cumulative length table is kept per line, so a point sampled in a batch
+    is bit-identical to the same point sampled on the single
+    :class:`LineTable`, whatever the batch composition.
+    """
+
+    def __init__(self, tables):
+        """Constructor.
+
+        :param tables: Prepared lines.
+        :type tables: list
+        """
+        counts = np.fromiter(
+            (table.x.size for table in tables), dtype=np.int64, count=len(tables)
+        )
+        self._setup(
+            np.concatenate([table.x for table in tables] + [np.zeros(0)]),
+            np.concatenate([table.y for table in tables] + [np.zeros(0)]),
+            np.concatenate(
+                [table.cumulative[:table.x.size] for table in tables] + [np.zeros(0)]
+            ),
+            np.concatenate(([0], np.cumsum(counts))),
+            np.fromiter(
+                (table.length for table in tables), dtype=np.float64, count=len(tables)
+            ),
+        )
+
+    @classmethod
+    def from_arrays(cls, x, y, cumulative, offsets, lengths):
+        """Create a batch from its flat arrays, e.g. read from shared memory.
+
+        :param x: Flat x coordinates of all lines.
+        :param y: Flat y coordinates of all lines.
+        :param cumulative: Flat per-line cumulative lengths at each vertex.
+        :param offsets: Vertex offsets, one more than the number of lines.
+        :param lengths: Length of every line.
+        """
+        batch = cls.__new__(cls)
+        batch._setup(x, y, cumulative, offsets, lengths)
+        return batch
+
+    def _setup(self, x, y, cumulative, offsets, lengths):
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.lengths = np.asarray(lengths, dtype=np.float64)
+        self.vertex_counts = np.diff(self.offsets)
+        # One padding vertex so the segment end of the last vertex exists
+        self.x = np.concatenate((x, np.zeros(1)))
+        self.y = np.concatenate((y, np.zeros(1)))
+        self.cumulative = np.concatenate((cumulative, np.zeros(1)))
+        # Monotonic search key over the whole batch
+        self.bases = np.concatenate(([0.0], np.cumsum(self.lengths)[:-1]))
+        self.search_key = (np.repeat(self.bases, self.vertex_counts)
+                           + self.cumulative[:-1])
+
+    def __len__(self):
+        return self.lengths.size
+
+    def table(self, line_index):
+        """Return line ``line_index`` as a LineTable sharing the batch arrays."""
+        start, end = self.offsets[line_index], self.offsets[line_index + 1]
+        return LineTable.from_arrays(
+            self.x[start:end], self.y[start:end], self.cumulative[start:end]
+        )
+
+    def interpolate(self, line_index, distances):
+        """Return the coordinates at distances along the given lines.
+
+        :param line_index: Index of the line for every distance.
+        :type line_index: numpy.ndarray
+
+        :param distances: Distances from the start of each line.
+        :type distances: numpy.ndarray
+
+        :returns: Tuple of x and y coordinate arrays.
+        :rtype: (numpy.ndarray, numpy.ndarray)
+        """
+        distances = np.asarray(distances, dtype=np.float64)
+        first = self.offsets[line_index]
+        last = first + np.maximum(self.vertex_counts[line_index] - 2, 0)
+        segment = np.searchsorted(
+            self.search_key, self.bases[line_index] + distances, side="right"
+        ) - 1
+        np.clip(segment, first, last, out=segment)
+
+        # The shifted search key may round onto a neighbouring vertex; move
+        # to the last vertex whose own cumulative length is <= distance.
+        cumulative = self.cumulative
+        while True:
+            following = cumulative[np.minimum(segment + 1, last)]
+            forward = (segment < last) & (following <= distances)
+            backward = (segment > first) & (cumulative[segment] > distances)
+            if not forward.any() and not backward.any():
+                break
+            segment += forward
+            segment -= backward
+
+        return interpolate_segments(
+            self.x, self.y, cumulative, segment, distances
+        )
+
+
+class GridIndex:
+    """Uniform grid hash of accepted points for minimum distance checks.
+
+    The cell size is the minimum distance, widened by a relative margin that
+    absorbs rounding in the cell computation. Any point closer than the
+    minimum distance to a candidate therefore lies in the candidate's cell or
+    in one of its eight neighbours, and the exact distance test decides.
+    """
+
+    CELL_MARGIN = 1e-6
+
+    def __init__(self, min_distance):
+        """Constructor.
+
+        :param min_distance: Minimum Euclidean distance between points.
+        :type min_distance: float
+        """
+        self.min_distance = min_distance
+        self.cell_size = min_distance * (1 + self.CELL_MARGIN)
+        self.cells = {}
+
+    def _cell(self, x, y):
+        return (math.floor(x / self.cell_size),
+                math.floor(y / self.cell_size))
+
+    def is_too_close(self, x, y):
+        """Return True if an indexed point is closer than the minimum distance."""
+        min_distance = self.min_distance
+        cell_x, cell_y = self._cell(x, y)
+        cells = self.cells
+        for i in (cell_x - 1, cell_x, cell_x + 1):
+            for j in (cell_y - 1, cell_y, cell_y + 1):
+                for px, py in cells.get((i, j), ()):
+                    dx = x - px
+                    dy = y - py
+                    if math.sqrt(dx * dx + dy * dy) < min_distance:
+                        return True
+        return False
+
+    def insert(self, x, y):
+        """Add an accepted point to the index."""
+        self.cells.setdefault(self._cell(x, y), []).append((x, y))
+
+
+class FeatureGroup:
+    """Prepared lines of a group of features with per-feature parameters.
+
+    The parameters are NumPy columns with one value per feature, so
+    data-defined values and constants are handled the same way.
+    """
+
+    def __init__(self, feature_ids, tables, counts, start_percent, end_percent,
+                 min_distance):
+        """Constructor.
+
+        :param feature_ids: Feature id of every line.
+        :param tables: Prepared lines.
+        :param counts: Number of points of every line.
+        :param start_percent: Start offset of every line in percent.
+        :param end_percent: End offset of every line in percent.
+        :param min_distance: Minimum distance between points of every line.
+        """
+        self.feature_ids = np.asarray(feature_ids, dtype=np.int64)
+        self.tables = list(tables)
+        self.counts = np.asarray(counts, dtype=np.int64)
+        self.start_percent = np.asarray(start_percent, dtype=np.float64)
+        self.end_percent = np.asarray(end_percent, dtype=np.float64)
+        self.min_distance = np.asarray(min_distance, dtype=np.float64)
+
+    def __len__(self):
+        return len(self.tables)
+
+    def subset(self, selection):
+        """Return the features picked by a slice or boolean mask."""
+        if isinstance(selection, slice):
+            tables = self.tables[selection]
+        else:
+            tables = [table for table, keep in zip(self.tables, selection) if keep]
+        return FeatureGroup(
+            self.feature_ids[selection], tables, self.counts[selection],
+            self.start_percent[selection], self.end_percent[selection],
+            self.min_distance[selection],
+        )
+
+    def vertex_bytes(self):
+        """Return the memory held by the vertex arrays of the group."""
+        return sum(table.x.nbytes * 3 for table in self.tables)
+
+
+def interpolate_segments(x, y, cumulative, segment, distances):
+    """Linear interpolation of ``distances`` on the given segment indices."""
+    start = cumulative[segment]
+    segment_length = cumulative[segment + 1] - start
+    with np.errstate(divide="ignore", invalid="ignore"):
+        fraction = np.where(
+            segment_length > 0, (distances - start) / segment_length, 0.0
+        )
+    np.clip(fraction, 0.0, 1.0, out=fraction)
+    x0 = x[segment]
+    y0 = y[segment]
+    return (x0 + (x[segment + 1] - x0) * fraction,
+            y0 + (y[segment + 1] - y0) * fraction)
+
+
+_MASK32 = np.uint64(0xFFFFFFFF)
+_PHILOX_M0 = np.uint64(0xD2511F53)
+_PHILOX_M1 = np.uint64(0xCD9E8D57)
+_PHILOX_W0 = 0x9E3779B9
+_PHILOX_W1 = 0xBB67AE85
+_PHILOX_ROUNDS = 10
+
+
+def philox4x32(counter, key):
+    """Vectorized Philox4x32-10 counter-based generator (Random123).
+
+    :param counter: Four arrays of 32 bit counter words.
+    :type counter: tuple
+
+    :param key: Two 32 bit key words.
+    :type key: tuple
+
+    :returns: Four arrays of 32 bit random words, as ``uint64`` arrays.
+    :rtype: tuple
+    """
+    c0, c1, c2, c3 = (np.asarray(word, dtype=np.uint64) & _MASK32
+                      for word in counter)
+    k0, k1 = int(key[0]) & 0xFFFFFFFF, int(key[1]) & 0xFFFFFFFF
+    for round_index in range(_PHILOX_ROUNDS):
+        if round_index:
+            k0 = (k0 + _PHILOX_W0) & 0xFFFFFFFF
+            k1 = (k1 + _PHILOX_W1) & 0xFFFFFFFF
+        product0 = c0 * _PHILOX_M0
+        product1 = c2 * _PHILOX_M1
+        c0, c1, c2, c3 = (
+            (product1 >> np.uint64(32)) ^ c1 ^ np.uint64(k0),
+            product1 & _MASK32,
+            (product0 >> np.uint64(32)) ^ c3 ^ np.uint64(k1),
+            product0 & _MASK32,
+        )
+    return c0, c1, c2, c3
+
+
+def keyed_random(seed, keys, draws):
+    """Return uniform doubles in ``[0, 1)`` for ``(seed, key, draw)`` triples.
+
+    Every value only depends on the run seed, the stream key (the feature id)
+    and the draw number inside that stream, so any subset of draws can be
+    reproduced without replaying the others. One Philox block yields two
+    doubles with 53 random bits each.
+
+    :param seed: Run seed, up to 64 bits.
+    :type seed: int
+
+    :param keys: Stream key per value, e.g. the feature id.
+    :type keys: numpy.ndarray
+
+    :param draws: Draw number inside the stream per value.
+    :type draws: numpy.ndarray
+
+    :rtype: numpy.ndarray
+    """
+    keys = np.asarray(keys, dtype=np.int64).view(np.uint64)
+    draws = np.asarray(draws, dtype=np.uint64)
+    blocks = draws >> np.uint64(1)
+    seed = int(seed) & 0xFFFFFFFFFFFFFFFF
+    words = philox4x32(
+        (blocks & _MASK32, blocks >> np.uint64(32),
+         keys & _MASK32, keys >> np.uint64(32)),
+        (seed & 0xFFFFFFFF, seed >> 32),
+    )
+    second = (draws & np.uint64(1)).astype(bool)
+    high = np.where(second, words[2], words[0]) >> np.uint64(5)
+    low = np.where(second, words[3], words[1]) >> np.uint64(6)
+    return ((high << np.uint64(26)) | low).astype(np.float64) * (1.0 / 9007199254740992.0)
+
+
+# Largest seed, the limit of the 32 bit seed inputs of the dialog and the
+# Processing algorithm
+MAX_SEED = 2 ** 31 - 1
+
+
+def random_run_seed():
+    """Return a fresh run seed for runs without a fixed seed.
+
+    The seed fits the seed inputs, so a run can be reproduced from the seed
+    of its report.
+    """
+    return secrets.randbelow(MAX_SEED + 1)
+
+
+class FeatureStream:
+    """Reproducible random stream of one feature.
+
+    The stream is keyed by ``(seed, feature id)`` and only keeps a draw
+    counter, so it exposes the ``random(size)`` method of
+    ``numpy.random.Generator`` without any hidden state shared between
+    features.
+    """
+
+    def __init__(self, seed, feature_id):
+        """Constructor.
+
+        :param seed: Run seed.
+        :type seed: int
+
+        :param feature_id: Id of the feature the stream belongs to.
+        :type feature_id: int
+        """
+        self.seed = seed
+        self.feature_id = feature_id
+        self.counter = 0
+
+    def random(self, size):
+        """Return the next ``size`` uniform doubles of the stream."""
+        draws = np.arange(self.counter, self.counter + size, dtype=np.uint64)
+        self.counter += size
+        return keyed_random(
+            self.seed, np.full(size, self.feature_id, dtype=np.int64), draws
+        )
+
+
+def offset_range(length, start_percent, end_percent):
+    """Return the usable ``(low, high)`` distance range of a line.
+
+    :param length: Total length of the line.
+    :type length: float
+
+    :param start_percent: Start offset in percent of the line length.
+    :type start_percent: float
+
+    :param end_percent: End offset in percent of the line length.
+    :type end_percent: float
+    """
+    return (length * (start_percent / 100),
+            length * (1 - (end_percent / 100)))
+
+
+def sample_distances(rng, low, high, count):
+    """Draw ``count`` uniform distances in ``[low, high]`` in a single call.
+
+    :param rng: Random source providing ``random(size)``, e.g. a
+        ``numpy.random.Generator``.
+    """
+    return low + (high - low) * rng.random(count)
+
+
+def sample_line(table, rng, count, start_percent=0, end_percent=0):
+    """Sample ``count`` random points on a prepared line.
+
+    :param table: Prepared line.
+    :type table: LineTable
+
+    :returns: Tuple of distance, x and y arrays.
+    :rtype: (numpy.ndarray, numpy.ndarray, numpy.ndarray)
+    """
+    if table.x.size == 0:
+        # No vertex to place a point on, e.g. a NULL geometry
+        return np.zeros(0), np.zeros(0), np.zeros(0)
+    low, high = offset_range(table.length, start_percent, end_percent)
+    distances = sample_distances(rng, low, high, count)
+    x, y = table.interpolate(distances)
+    return distances, x, y
+
+
+def sample_line_min_distance(table, rng, count, min_distance,
+                             start_percent=0, end_percent=0,
+                             max_attempts=1000, batch_size=256, index=None):
+    """Sample points on a line keeping a minimum Euclidean distance.
+
+    Candidates are drawn and interpolated in batches, then accepted one by
+    one in draw order. A candidate closer than ``min_distance`` to an
+    accepted point is rejected; sampling stops after ``max_attempts``
+    consecutive rejections. Accepted points are kept in a :class:`GridIndex`
+    so each check only visits the neighbouring grid cells.
+
+    :param index: Optional index shared between several lines. Candidates
+        are then also checked against the points accepted on the other
+        lines, and the accepted points are added to it.
+    :type index: GridIndex
+
+    :returns: Tuple of distance, x and y arrays of the accepted points, and
+        the total number of rejected candidates.
+    :rtype: (numpy.ndarray, numpy.ndarray, numpy.ndarray, int)
+    """
+    if table.x.size == 0:
+        # Candidates without coordinates would never be rejected nor accepted
+        return np.zeros(0), np.zeros(0), np.zeros(0), 0
+    low, high = offset_range(table.length, start_percent, end_percent)
+    if index is None:
+        index = GridIndex(min_distance)
+    accepted_d = []
+    accepted_x = []
+    accepted_y = []
+    attempts = 0
+    rejected = 0
+
+    while len(accepted_d) < count and attempts < max_attempts:
+        distances = sample_distances(rng, low, high, batch_size)
+        xs, ys = table.interpolate(distances)
+        for distance, px, py in zip(distances.tolist(), xs.tolist(), ys.tolist()):
+            if index.is_too_close(px, py):
+                attempts += 1
+                rejected += 1
+                if attempts >= max_attempts:
+                    break
+                continue
+            index.insert(px, py)
+            accepted_d.append(distance)
+            accepted_x.append(px)
+            accepted_y.append(py)
+            attempts = 0
+            if len(accepted_d) >= count:
+                break
+
+    return (np.asarray(accepted_d, dtype=np.float64),
+            np.asarray(accepted_x, dtype=np.float64),
+            np.asarray(accepted_y, dtype=np.float64),
+            rejected)
+
+
+def max_spaced_count(usable_length, min_gap):
+    """Return how many points fit on a usable length with a minimum gap.
+
+    :param usable_length: Length between the start and end offsets.
+    :type usable_length: float
+
+    :param min_gap: Minimum distance along the line between two points.
+    :type min_gap: float
+
+    :returns: Maximum feasible number of points, ``None`` if unbounded.
+    :rtype: int
+    """
+    if usable_length < 0:
+        return 0
+    if min_gap <= 0:
+        return None
+    return int(math.floor(usable_length / min_gap)) + 1
+
+
+def sample_spaced_distances(rng, low, high, count, min_gap, max_gap=0):
+    """Draw sorted distances in ``[low, high]`` with bounded spacings.
+
+    The gaps are drawn directly instead of rejecting candidates: the slack
+    left after reserving ``min_gap`` between consecutive points is split
+    into ``count + 1`` uniform spacings (normalised exponential variates).
+    Without ``max_gap`` this is exactly the uniform distribution over all
+    admissible configurations. With ``max_gap`` each interior spacing is
+    capped and the removed slack is moved to the line ends.
+
+    The caller is responsible for checking ``count`` against
+    :func:`max_spaced_count`; the count is clipped to the feasible maximum.
+
+    :returns: Sorted distance array.
+    :rtype: numpy.ndarray
+    """
+    usable = high - low
+    feasible = max_spaced_count(usable, min_gap)
+    if feasible is not None:
+        count = min(count, feasible)
+    if count <= 0:
+        return np.zeros(0)
+
+    slack = usable - (count - 1) * min_gap
+    spacings = -np.log1p(-rng.random(count + 1))
+    total = spacings.sum()
+    if total > 0:
+        spacings *= slack / total
+    else:
+        spacings[:] = slack / (count + 1)
+
+    lead = spacings[0]
+    interior = spacings[1:count]
+    if max_gap > 0 and interior.size:
+        capped = np.minimum(interior, max(max_gap - min_gap, 0.0))
+        freed = float(np.sum(interior - capped))
+        lead += freed * rng.random(1)[0]
+        interior = capped
+
+    gaps = np.empty(count)
+    gaps[0] = low + lead
+    gaps[1:] = interior + min_gap
+    distances = np.cumsum(gaps)
+    np.clip(distances, low, high, out=distances)
+    return distances
+
+
+def sample_line_spaced(table, rng, count, min_gap, max_gap=0,
+                       start_percent=0, end_percent=0):
+    """Sample points on a line with a minimum (and maximum) gap along it.
+
+    Gaps are measured along the line, so exactly ``count`` points are
+    returned whenever they fit between the start and end offsets.
+
+    :returns: Tuple of distance, x and y arrays.
+    :rtype: (numpy.ndarray, numpy.ndarray, numpy.ndarray)
+    """
+    if table.x.size == 0:
+        # A single point would still fit on the zero usable length
+        return np.zeros(0), np.zeros(0), np.zeros(0)
+    low, high = offset_range(table.length, start_percent, end_percent)
+    distances = sample_spaced_distances(rng, low, high, count, min_gap, max_gap)
+    x, y = table.interpolate(distances)
+    return distances, x, y
+
+
+def sample_line_constrained(table, rng, count, min_distance=0, along_line=False,
+                            max_gap=0, start_percent=0, end_percent=0,
+                            index=None):
+    """Sample a line with the spacing mode of a run.
+
+    Dispatches to :func:`sample_line_spaced` when spacing is measured along
+    the line, to :func:`sample_line_min_distance` for a Euclidean minimum
+    distance and to :func:`sample_line` otherwise.
+
+    Fewer than ``count`` points are returned when they do not fit with the
+    minimum distance; comparing the sizes is left to the caller.
+
+    :returns: Tuple of distance, x and y arrays, and the number of
+        candidates rejected for being too close to an accepted point.
+    :rtype: (numpy.ndarray, numpy.ndarray, numpy.ndarray, int)
+    """
+    if along_line:
+        distances, xs, ys = sample_line_spaced(
+            table, rng, count, min_distance, max_gap, start_percent, end_percent
+        )
+        return distances, xs, ys, 0
+
+    if min_distance > 0:
+        return sample_line_min_distance(
+            table, rng, count, min_distance, start_percent, end_percent,
+            index=index,
+        )
+    distances, xs, ys = sample_line(
+        table, rng, count, start_percent, end_percent
+    )
+    return distances, xs, ys, 0
+
+
+def sample_batch(batch, seed, feature_ids, counts, start_percent=0, end_percent=0):
+    """Sample random points on every line of a batch in one vectorized call.
+
+    Draw ``k`` of line ``i`` uses the stream keyed by ``feature_ids[i]``, so
+    the result for a line equals :func:`sample_line` with its
+    :class:`FeatureStream`.
+
+    :param batch: Prepared lines.
+    :type batch: LineBatch
+
+    :param seed: Run seed.
+    :type seed: int
+
+    :param feature_ids: Feature id of every line.
+    :type feature_ids: numpy.ndarray
+
+    :param counts: Number of points for every line.
+    :type counts: numpy.ndarray
+
+    :param start_percent: Start offset, a scalar or one value per line.
+    :param end_percent: End offset, a scalar or one value per line.
+
+    :returns: Flat arrays of line index, distance, x and y.
+    :rtype: (numpy.ndarray, numpy.ndarray, numpy.ndarray, numpy.ndarray)
+    """
+    feature_ids = np.asarray(feature_ids, dtype=np.int64)
+    counts = np.where(
+        batch.vertex_counts > 0, np.maximum(np.asarray(counts, dtype=np.int64), 0), 0
+    )
+    line_index = np.repeat(np.arange(len(batch)), counts)
+    first_draw = np.cumsum(counts) - counts
+    draws = np.arange(line_index.size, dtype=np.int64) - np.repeat(first_draw, counts)
+
+    low, high = offset_range(batch.lengths, start_percent, end_percent)
+    random = keyed_random(seed, feature_ids[line_index], draws)
+    low = low[line_index]
+    distances = low + (high[line_index] - low) * random
+    x, y = batch.interpolate(line_index, distances)
+    return line_index, distances, x, y
@@ -0,0 +1,6 @@
+# import qgis libs so that ve set the correct sip api version
+try:
+    import qgis   # pylint: disable=W0611  # NOQA
+except ImportError:
+    # The tests of the Qt-free engine run without QGIS
+    pass
@@ -0,0 +1,311 @@
+# coding=utf-8
+"""Benchmarks of the random points generation on synthetic line networks.
+
+Run from the plugin folder::
+
+    python -m test.benchmark run --output baseline.json
+    python -m test.benchmark run --sizes 1000,10000 --output current.json
+    python -m test.benchmark compare baseline.json current.json
+
+Every network size is generated with two profiles: ``long`` has few
+features with many vertices, ``short`` many features with few vertices.
+The generation is timed per stage in the serial, worker process and
+pipelined modes. The pipelined stages run in parallel threads, their
+times are the busy time of each stage and add up to more than the total.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+import numpy as np
+
+from .utilities import get_plugin_module, get_qgis_app
+
+DEFAULT_SIZES = (1000, 10000, 100000, 1000000, 10000000)
+PROFILES = ('long', 'short')
+MODES = ('serial', 'workers', 'pipelined')
+STAGES = ('read', 'sample', 'min_distance', 'write', 'add_to_project', 'total')
+
+# Features of the long profile, vertices per feature of the short profile
+LONG_FEATURES = 50
+SHORT_VERTICES = 5
+# Mean distance between two vertices of the synthetic roads, in metres
+STEP_LENGTH = 50.0
+# Minimum distance of the min_distance stage, small against STEP_LENGTH so
+# nearly every point fits
+MIN_DISTANCE = 1.0
+FEATURE_CHUNK = 10000
+
+
+def road_network(vertex_count, profile, seed=0):
+    """Generate the vertices of a synthetic road network.
+
+    Every road is a random walk with a persistent heading, like roads
+    bending through a landscape.
+
+    :param vertex_count: Total number of vertices.
+    :type vertex_count: int
+
+    :param profile: 'long' for few long roads, 'short' for many short ones.
+    :type profile: str
+
+    :returns: x and y arrays of shape (roads, vertices per road).
+    :rtype: (numpy.ndarray, numpy.ndarray)
+    """
+    if profile == 'long':
+        features = min(LONG_FEATURES, max(vertex_count // 2, 1))
+    else:
+        features = max(vertex_count // SHORT_VERTICES, 1)
+    vertices = max(vertex_count // features, 2)
+
+    rng = np.random.default_rng(seed)
+    extent = STEP_LENGTH * np.sqrt(vertex_count) * 10
+    headings = rng.uniform(0, 2 * np.pi, (features, 1)) + np.cumsum(
+        rng.normal(0, 0.3, (features, vertices - 1)), axis=1
+    )
+    steps = rng.uniform(0.5, 1.5, (features, vertices - 1)) * STEP_LENGTH
+    x = np.empty((features, vertices))
+    y = np.empty((features, vertices))
+    x[:, 0] = rng.uniform(0, extent, features)
+    y[:, 0] = rng.uniform(0, extent, features)
+    x[:, 1:] = x[:, :1] + np.cumsum(steps * np.cos(headings), axis=1)
+    y[:, 1:] = y[:, :1] + np.cumsum(steps * np.sin(headings), axis=1)
+    return x, y
+
+
+def network_layer(x, y, name):
+    """Return a memory line layer holding the roads of :func:`road_network`."""
+    from qgis.core import QgsFeature, QgsGeometry, QgsLineString, QgsVectorLayer
+
+    layer = QgsVectorLayer('LineString?crs=EPSG:3857', name, 'memory')
+    provider = layer.dataProvider()
+    features = []
+    for xs, ys in zip(x.tolist(), y.tolist()):
+        feature = QgsFeature()
+        feature.setGeometry(QgsGeometry(QgsLineString(xs, ys)))
+        features.append(feature)
+        if len(features) >= FEATURE_CHUNK:
+            provider.addFeatures(features)
+            features = []
+    provider.addFeatures(features)
+    layer.updateExtents()
+    return layer
+
+
+class StageTimer:
+    """Accumulate the time spent in the stages of a run."""
+
+    def __init__(self):
+        """Constructor."""
+        self.seconds = defaultdict(float)
+
+    @contextmanager
+    def measure(self, stage):
+        """Time a block of code."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[stage] += time.perf_counter() - start
+
+    def wrap(self, stage, function):
+        """Return ``function`` timed as ``stage``."""
+        def timed(*args, **kwargs):
+            with self.measure(stage):
+                return function(*args, **kwargs)
+        return timed
+
+    def iterate(self, stage, iterator):
+        """Yield the items of ``iterator``, timing how long each takes."""
+        while True:
+            with self.measure(stage):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+
+def timed_run(layer, settings, timer, sample_stage='sample'):
+    """Generate points into a memory layer, timing every stage.
+
+    :returns: The output layer and the number of points.
+    :rtype: (QgsVectorLayer, int)
+    """
+    generator = get_plugin_module('generator')
+    point_writer = get_plugin_module('point_writer')
+
+    destination = point_writer.MemoryDestination(layer.crs())
+    run = generator.PointGenerator(layer, settings, destination)
+    read_groups = run.read_groups
+    run.read_groups = lambda *args: timer.iterate('read', read_groups(*args))
+    run.sample_group = timer.wrap(sample_stage, run.sample_group)
+
+    writer_class = point_writer.PointWriter
+    add_points, close = writer_class.add_points, writer_class.close
+    writer_class.add_points = timer.wrap('write', add_points)
+    writer_class.close = timer.wrap('write', close)
+    try:
+        with timer.measure('total'):
+            run.run()
+    finally:
+        writer_class.add_points, writer_class.close = add_points, close
+    return destination.finish(), run.point_count
+
+
+def benchmark_network(layer, vertices_per_feature, mode, workers):
+    """Time all stages of one network in one mode.
+
+    :returns: Seconds per stage and the number of points.
+    :rtype: dict
+    """
+    from qgis.core import QgsProject
+
+    generator = get_plugin_module('generator')
+    settings = generator.GenerationSettings()
+    settings.seed = 1
+    # About as many points as vertices
+    settings.num_points = max(int(vertices_per_feature), 1)
+    settings.workers = workers if mode == 'workers' else 1
+    settings.pipelined = mode == 'pipelined'
+
+    timer = StageTimer()
+    output, points = timed_run(layer, settings, timer)
+    with timer.measure('add_to_project'):
+        QgsProject.instance().addMapLayer(output)
+    QgsProject.instance().removeMapLayer(output.id())
+
+    settings.min_distance = MIN_DISTANCE
+    constrained = StageTimer()
+    timed_run(layer, settings, constrained, 'min_distance')
+    timer.seconds['min_distance'] = constrained.seconds['min_distance']
+
+    result = {stage: round(timer.seconds[stage], 6) for stage in STAGES}
+    result['points'] = points
+    return result
+
+
+def environment():
+    """Return the versions the benchmarks ran with."""
+    from qgis.core import Qgis
+
+    return {
+        'qgis': Qgis.version(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def run_benchmarks(sizes, workers, repeat, output):
+    """Run the benchmarks and write the results as JSON.
+
+    Each network is timed ``repeat`` times and the fastest time of every
+    stage is kept.
+    """
+    get_qgis_app()
+    results = {}
+    for vertex_count in sizes:
+        for profile in PROFILES:
+            x, y = road_network(vertex_count, profile)
+            layer = network_layer(x, y, '{}-{}'.format(profile, vertex_count))
+            for mode in MODES:
+                key = '{}-{}-{}'.format(profile, vertex_count, mode)
+                runs = [benchmark_network(layer, x.shape[1], mode, workers)
+                        for _ in range(repeat)]
+                results[key] = {
+                    name: min(run[name] for run in runs) for name in runs[0]
+                }
+                print('{:<28} {}'.format(key, '  '.join(
+                    '{} {:.3f}s'.format(stage, results[key][stage]) for stage in STAGES
+                )), flush=True)
+            del layer
+    report = {'environment': environment(), 'results': results}
+    with open(output, 'w', encoding='utf-8') as report_file:
+        json.dump(report, report_file, indent=2, sort_keys=True)
+
+
+def compare(baseline, current, tolerance, min_seconds):
+    """Compare two benchmark reports.
+
+    A stage regressed when it is more than ``tolerance`` (a fraction)
+    and ``min_seconds`` slower than in the baseline.
+
+    :returns: The regressions as ``(key, stage, baseline, current)``.
+    :rtype: list
+    """
+    regressions = []
+    for key, stages in sorted(current['results'].items()):
+        reference = baseline['results'].get(key)
+        if reference is None:
+            continue
+        for stage in STAGES:
+            before, after = reference.get(stage), stages.get(stage)
+            if before is None or after is None:
+                continue
+            if after > before * (1 + tolerance) and after - before > min_seconds:
+                regressions.append((key, stage, before, after))
+    return regressions
+
+
+def main(argv=None):
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='Run the benchmarks')
+    run_parser.add_argument(
+        '--sizes', default=','.join(str(size) for size in DEFAULT_SIZES),
+        help='Comma separated vertex counts of the networks')
+    run_parser.add_argument(
+        '--workers', type=int, default=min(os.cpu_count() or 1, 4),
+        help='Worker processes of the workers mode')
+    run_parser.add_argument(
+        '--repeat', type=int, default=1, help='Runs per network, the fastest is kept')
+    run_parser.add_argument('--output', required=True, help='JSON report to write')
+
+    compare_parser = commands.add_parser(
+        'compare', help='Flag the stages slower than in a baseline')
+    compare_parser.add_argument('baseline', help='Baseline JSON report')
+    compare_parser.add_argument('current', help='Current JSON report')
+    compare_parser.add_argument(
+        '--tolerance', type=float, default=0.2,
+        help='Allowed slowdown as a fraction of the baseline time')
+    compare_parser.add_argument(
+        '--min-seconds', type=float, default=0.05,
+        help='Slowdowns smaller than this are ignored as noise')
+
+    args = parser.parse_args(argv)
+    if args.command == 'run':
+        sizes = [int(size) for size in args.sizes.split(',')]
+        run_benchmarks(sizes, args.workers, args.repeat, args.output)
+        return 0
+
+    with open(args.baseline, encoding='utf-8') as baseline_file:
+        baseline = json.load(baseline_file)
+    with open(args.current, encoding='utf-8') as current_file:
+        current = json.load(current_file)
+    regressions = compare(baseline, current, args.tolerance, args.min_seconds)
+    for key, stage, before, after in regressions:
+        print('REGRESSION {:<28} {:<15} {:.3f}s -> {:.3f}s ({:+.0%})'.format(
+            key, stage, before, after, after / before - 1 if before else float('inf')))
+    if not regressions:
+        print('No regressions beyond {:.0%}'.format(args.tolerance))
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
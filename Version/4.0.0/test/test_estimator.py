@@ -0,0 +1,138 @@
+# coding=utf-8
+"""Tests of the run estimate.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+import unittest
+
+import numpy as np
+
+from .utilities import get_plugin_module
+
+try:
+    estimator = get_plugin_module('estimator')
+    generator = get_plugin_module('generator')
+except ImportError:
+    # The estimator reads the layers through QGIS
+    estimator = None
+
+MB = 1024 * 1024
+
+
+def scan(lengths, vertices=0, **columns):
+    """Return a finished scan of lines of the given lengths."""
+    layer_scan = estimator.LayerScan(None)
+    layer_scan.lengths = np.asarray(lengths, dtype=np.float32)
+    layer_scan.features_read = len(lengths)
+    layer_scan.vertices = vertices
+    layer_scan.columns = {name: np.asarray(column, dtype=float)
+                          for name, column in columns.items()}
+    return layer_scan
+
+
+@unittest.skipIf(estimator is None, 'QGIS is not available')
+class EstimateRunTest(unittest.TestCase):
+    """Test estimate_run."""
+
+    def setUp(self):
+        self.settings = generator.GenerationSettings()
+        self.throughput = estimator.Throughput()
+
+    def estimate(self, layer_scan, in_memory=False, cache_limit=0):
+        return estimator.estimate_run(
+            layer_scan, self.settings, self.throughput, in_memory, cache_limit
+        )
+
+    def test_fixed_count(self):
+        """Every valid line gets the fixed number of points."""
+        self.settings.num_points = 7
+        estimate = self.estimate(scan([100, 200, 300]))
+        self.assertEqual(estimate.feature_count, 3)
+        self.assertEqual(estimate.point_count, 21)
+        self.assertAlmostEqual(estimate.usable_length, 600)
+        self.assertFalse(estimate.upper_bound)
+
+    def test_offsets(self):
+        """The offsets shorten the usable length; overlapping offsets drop lines."""
+        self.settings.start_percent = 10
+        self.settings.end_percent = 20
+        estimate = self.estimate(scan([100, 200]))
+        self.assertAlmostEqual(estimate.usable_length, 210)
+
+        estimate = self.estimate(scan([100, 200], start_percent=[50, 80],
+                                      end_percent=[50, 30]))
+        self.assertEqual(estimate.feature_count, 1)
+        self.assertEqual(estimate.point_count, self.settings.num_points)
+
+    def test_data_defined_counts(self):
+        """Data-defined counts are summed per line."""
+        estimate = self.estimate(scan([100, 100, 100], counts=[1, 5, 10]))
+        self.assertEqual(estimate.point_count, 16)
+
+    def test_along_line_capacity(self):
+        """Along the line, no more points than fit with the minimum gap."""
+        self.settings.along_line = True
+        self.settings.num_points = 100
+        self.settings.min_distance = 10
+        estimate = self.estimate(scan([100, 15]))
+        self.assertEqual(estimate.point_count, 11 + 2)
+        self.assertFalse(estimate.upper_bound)
+
+    def test_constrained_upper_bound(self):
+        """A Euclidean minimum distance makes the count an upper bound."""
+        self.settings.min_distance = 10
+        self.assertTrue(self.estimate(scan([100])).upper_bound)
+
+    def test_points_in_memory(self):
+        """Points of a temporary layer count as memory up to the threshold."""
+        self.settings.num_points = 1000
+        estimate = self.estimate(scan([100]), in_memory=True)
+        self.assertEqual(estimate.memory_bytes, 1000 * estimator.POINT_MEMORY_BYTES)
+        self.assertEqual(self.estimate(scan([100]), in_memory=False).memory_bytes, 0)
+
+    def test_memory_without_cache(self):
+        """Without the cache, the lines of the group in flight still count."""
+        features = 4 * generator.PointGenerator.BATCH_FEATURES
+        layer_scan = scan(np.ones(features), vertices=features * 100)
+        line_bytes = features * 100 * estimator.VERTEX_BYTES
+        self.assertEqual(self.estimate(layer_scan).memory_bytes, line_bytes // 4)
+
+        # A small layer is read as a single group
+        self.assertEqual(self.estimate(scan([1, 1], vertices=200)).memory_bytes,
+                         200 * estimator.VERTEX_BYTES)
+
+    def test_memory_with_cache(self):
+        """The cache holds the lines up to its limit."""
+        features = 4 * generator.PointGenerator.BATCH_FEATURES
+        layer_scan = scan(np.ones(features), vertices=features * 100)
+        line_bytes = features * 100 * estimator.VERTEX_BYTES
+        self.assertEqual(self.estimate(layer_scan, cache_limit=1024 * MB).memory_bytes,
+                         line_bytes)
+        # A small cache still leaves the group in flight
+        self.assertEqual(self.estimate(layer_scan, cache_limit=1).memory_bytes,
+                         line_bytes // 4)
+
+    def test_memory_pipelined(self):
+        """A pipelined run holds up to its memory budget."""
+        self.settings.pipelined = True
+        self.settings.memory_limit = 8 * MB
+        layer_scan = scan(np.ones(1000), vertices=10 * MB)
+        self.assertEqual(self.estimate(layer_scan).memory_bytes, 8 * MB)
+
+    def test_calibration(self):
+        """The runtime follows the measured runs."""
+        layer_scan = scan(np.ones(50000))
+        self.settings.num_points = 8
+        modelled = self.estimate(layer_scan).seconds
+        self.assertGreater(modelled, 0)
+        self.throughput.calibrate(50000, 400000, False, 3 * modelled)
+        self.assertAlmostEqual(self.estimate(layer_scan).seconds, 3 * modelled)
+
+
+if __name__ == '__main__':
+    unittest.main()
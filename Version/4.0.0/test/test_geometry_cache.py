@@ -0,0 +1,226 @@
+# coding=utf-8
+"""Tests of the session cache of prepared lines.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+import threading
+import unittest
+
+import numpy as np
+
+from .utilities import get_plugin_module
+
+engine = get_plugin_module('sampling_engine')
+geometry_cache = get_plugin_module('geometry_cache')
+
+
+class Signal:
+    """Stand-in for a Qt signal."""
+
+    def __init__(self):
+        self.slots = []
+
+    def connect(self, slot):
+        self.slots.append(slot)
+
+    def disconnect(self, slot):
+        self.slots.remove(slot)
+
+    def emit(self, *args):
+        for slot in list(self.slots):
+            slot(*args)
+
+
+class Provider:
+    """Stand-in for the data provider of a layer."""
+
+    def __init__(self):
+        self.dataChanged = Signal()  # pylint: disable=invalid-name
+
+
+class Layer:
+    """Stand-in for a line layer with the signals watched by the cache."""
+
+    SIGNALS = ('geometryChanged', 'featureDeleted', 'featureAdded', 'subsetStringChanged',
+               'dataSourceChanged', 'dataChanged', 'willBeDeleted')
+
+    def __init__(self, layer_id='lines'):
+        self.layer_id = layer_id
+        self.provider = Provider()
+        for name in self.SIGNALS:
+            setattr(self, name, Signal())
+
+    def id(self):
+        return self.layer_id
+
+    def dataProvider(self):  # pylint: disable=invalid-name
+        return self.provider
+
+    def connected(self):
+        """Return the number of slots connected to the layer and provider."""
+        return (sum(len(getattr(self, name).slots) for name in self.SIGNALS)
+                + len(self.provider.dataChanged.slots))
+
+
+def line(vertices=10):
+    """Return a prepared line of ``vertices`` vertices."""
+    x = np.arange(vertices, dtype=float)
+    return engine.LineTable([(x, np.zeros(vertices))])
+
+
+class LineTableCacheTest(unittest.TestCase):
+    """Test LineTableCache."""
+
+    def setUp(self):
+        self.cache = geometry_cache.LineTableCache()
+        self.layer = Layer()
+        self.revision = self.cache.watch(self.layer)
+
+    def test_get_put(self):
+        """A cached line is returned for its layer, feature and revision."""
+        table = line()
+        self.cache.put('lines', 1, self.revision, table)
+        self.assertIs(self.cache.get('lines', 1, self.revision), table)
+        self.assertIsNone(self.cache.get('lines', 2, self.revision))
+        self.assertIsNone(self.cache.get('lines', 1, self.revision + 1))
+        self.assertEqual(self.cache.used, table.nbytes)
+
+    def test_lru_limit(self):
+        """The least recently used lines are evicted beyond the memory limit."""
+        size = line().nbytes
+        self.cache.set_memory_limit(3 * size)
+        for fid in range(3):
+            self.cache.put('lines', fid, self.revision, line())
+        self.cache.get('lines', 0, self.revision)
+        self.cache.put('lines', 3, self.revision, line())
+        self.assertIsNone(self.cache.get('lines', 1, self.revision))
+        for fid in (0, 2, 3):
+            self.assertIsNotNone(self.cache.get('lines', fid, self.revision))
+        self.assertEqual(self.cache.used, 3 * size)
+
+        self.cache.set_memory_limit(size)
+        self.assertEqual(list(self.cache.entries), [('lines', 3, self.revision)])
+        self.assertEqual(self.cache.used, size)
+
+    def test_oversized_line(self):
+        """A line larger than the whole limit is not cached."""
+        self.cache.set_memory_limit(line().nbytes)
+        self.cache.put('lines', 1, self.revision, line(1000))
+        self.assertIsNone(self.cache.get('lines', 1, self.revision))
+        self.assertEqual(self.cache.used, 0)
+
+    def test_feature_edit(self):
+        """An edited or deleted feature only drops its own line."""
+        for fid in range(3):
+            self.cache.put('lines', fid, self.revision, line())
+        self.cache.set_feature_ids('lines', self.revision, [0, 1, 2])
+        self.layer.geometryChanged.emit(1, None)
+        self.layer.featureDeleted.emit(2)
+        self.assertIsNotNone(self.cache.get('lines', 0, self.revision))
+        self.assertIsNone(self.cache.get('lines', 1, self.revision))
+        self.assertIsNone(self.cache.get('lines', 2, self.revision))
+        self.assertIsNone(self.cache.feature_ids('lines', self.revision))
+
+    def test_layer_data_changed(self):
+        """Edits signaled by the layer's dataChanged keep the other lines."""
+        self.cache.put('lines', 1, self.revision, line())
+        self.layer.dataChanged.emit()
+        self.assertEqual(self.cache.watch(self.layer), self.revision)
+        self.assertIsNotNone(self.cache.get('lines', 1, self.revision))
+
+    def test_revision_invalidation(self):
+        """A new filter or a provider reload bumps the revision."""
+        self.cache.put('lines', 1, self.revision, line())
+        self.cache.set_feature_ids('lines', self.revision, [1])
+        self.assertEqual(self.cache.feature_ids('lines', self.revision), [1])
+
+        self.layer.subsetStringChanged.emit()
+        revision = self.cache.watch(self.layer)
+        self.assertEqual(revision, self.revision + 1)
+        self.assertIsNone(self.cache.get('lines', 1, revision))
+        self.assertIsNone(self.cache.feature_ids('lines', self.revision))
+
+        self.layer.provider.dataChanged.emit()
+        self.assertEqual(self.cache.watch(self.layer), revision + 1)
+
+        # Lines of an old revision are not cached any more
+        self.cache.put('lines', 2, self.revision, line())
+        self.assertNotIn(('lines', 2, self.revision), self.cache.entries)
+
+    def test_feature_ids(self):
+        """The feature list is only kept while every line is cached."""
+        self.cache.put('lines', 1, self.revision, line())
+        self.cache.set_feature_ids('lines', self.revision, [1, 2])
+        self.assertIsNone(self.cache.feature_ids('lines', self.revision))
+        self.cache.put('lines', 2, self.revision, line())
+        self.cache.set_feature_ids('lines', self.revision, [1, 2])
+        self.assertEqual(self.cache.feature_ids('lines', self.revision), [1, 2])
+        self.layer.featureAdded.emit(3)
+        self.assertIsNone(self.cache.feature_ids('lines', self.revision))
+
+    def test_remove_layer(self):
+        """A deleted layer releases its lines and its connections."""
+        self.cache.put('lines', 1, self.revision, line())
+        self.assertGreater(self.layer.connected(), 0)
+        self.layer.willBeDeleted.emit()
+        self.assertEqual(self.layer.connected(), 0)
+        self.assertEqual(self.cache.used, 0)
+        self.assertEqual(len(self.cache.entries), 0)
+        # Watching again starts over
+        self.assertEqual(self.cache.watch(self.layer), 0)
+        self.assertEqual(self.layer.connected(), len(Layer.SIGNALS))
+
+    def test_data_source_changed(self):
+        """A new data source drops the lines and the old provider connection."""
+        provider = self.layer.provider
+        self.cache.put('lines', 1, self.revision, line())
+        self.layer.provider = Provider()
+        self.layer.dataSourceChanged.emit()
+        self.assertEqual(provider.dataChanged.slots, [])
+        self.assertEqual(self.cache.used, 0)
+        self.cache.watch(self.layer)
+        self.assertEqual(len(self.layer.provider.dataChanged.slots), 1)
+
+    def test_thread_safety(self):
+        """Concurrent puts, gets and invalidations keep the accounting exact."""
+        size = line().nbytes
+        self.cache.set_memory_limit(50 * size)
+        errors = []
+
+        def fill(offset):
+            try:
+                for fid in range(offset, offset + 2000):
+                    revision = self.cache.watch(self.layer) if fid % 500 == 0 else self.revision
+                    self.cache.put('lines', fid % 300, revision, line())
+                    self.cache.get('lines', (fid * 7) % 300, revision)
+            except Exception as e:  # pylint: disable=broad-except
+                errors.append(e)
+
+        def invalidate():
+            try:
+                for fid in range(2000):
+                    self.cache.invalidate_feature('lines', fid % 300)
+                    if fid % 400 == 0:
+                        self.cache.invalidate_layer('lines')
+            except Exception as e:  # pylint: disable=broad-except
+                errors.append(e)
+
+        threads = [threading.Thread(target=fill, args=(offset,)) for offset in (0, 2000, 4000)]
+        threads.append(threading.Thread(target=invalidate))
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertLessEqual(self.cache.used, 50 * size)
+        self.assertEqual(self.cache.used,
+                         sum(table.nbytes for table in self.cache.entries.values()))
+
+
+if __name__ == '__main__':
+    unittest.main()
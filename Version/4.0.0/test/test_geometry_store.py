@@ -0,0 +1,189 @@
+# coding=utf-8
+"""Tests of the persistent store of prepared lines.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+import numpy as np
+
+from .utilities import get_plugin_module
+
+engine = get_plugin_module('sampling_engine')
+try:
+    geometry_store = get_plugin_module('geometry_store')
+except ImportError:
+    # The store is located in the QGIS profile
+    geometry_store = None
+
+
+class Timestamp:
+    """Stand-in for the QDateTime of a provider."""
+
+    def __init__(self, msecs):
+        self.msecs = msecs
+
+    def isValid(self):  # pylint: disable=invalid-name
+        return True
+
+    def toMSecsSinceEpoch(self):  # pylint: disable=invalid-name
+        return self.msecs
+
+
+class Provider:
+    """Stand-in for a data provider reporting its modification time."""
+
+    def __init__(self):
+        self.msecs = 1000
+
+    def dataTimestamp(self):  # pylint: disable=invalid-name
+        return Timestamp(self.msecs)
+
+
+class Layer:
+    """Stand-in for a line layer."""
+
+    def __init__(self):
+        self.provider = Provider()
+        self.modified = False
+
+    def dataProvider(self):  # pylint: disable=invalid-name
+        return self.provider
+
+    def isModified(self):  # pylint: disable=invalid-name
+        return self.modified
+
+    def providerType(self):  # pylint: disable=invalid-name
+        return 'ogr'
+
+    def source(self):
+        return '/data/lines.gpkg|layername=lines'
+
+    def subsetString(self):  # pylint: disable=invalid-name
+        return ''
+
+
+def lines(count=20, seed=0):
+    """Return feature IDs and prepared lines of varying vertex counts."""
+    rng = np.random.default_rng(seed)
+    tables = {}
+    for fid in rng.permutation(np.arange(100, 100 + count)).tolist():
+        vertices = int(rng.integers(2, 50))
+        tables[fid] = engine.LineTable([(rng.random(vertices) * 1000,
+                                         rng.random(vertices) * 1000)])
+    return tables
+
+
+@unittest.skipIf(geometry_store is None, 'QGIS is not available')
+class GeometryStoreTest(unittest.TestCase):
+    """Test GeometryStore, StoreWriter and StoredLines."""
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.store = geometry_store.GeometryStore(os.path.join(self.root, 'store'))
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def write(self, key, tables):
+        """Write a complete entry."""
+        writer = self.store.writer(key)
+        self.assertIsNotNone(writer)
+        for fid, table in tables.items():
+            writer.add(fid, table)
+        writer.commit()
+
+    def test_round_trip(self):
+        """Lines read back from a reopened store equal the written ones."""
+        tables = lines()
+        self.write('key', tables)
+        stored = geometry_store.GeometryStore(self.store.root).open('key')
+        self.assertIsNotNone(stored)
+        self.assertEqual(stored.feature_ids.tolist(), list(tables))
+        for fid, table in tables.items():
+            read = stored.table(fid)
+            np.testing.assert_array_equal(read.x, table.x)
+            np.testing.assert_array_equal(read.y, table.y)
+            np.testing.assert_array_equal(read.cumulative, table.cumulative)
+            self.assertEqual(read.length, table.length)
+        self.assertIsNone(stored.table(99))
+        self.assertIsNone(stored.table(10000))
+
+    def test_empty_entry(self):
+        """A source without lines is stored as well."""
+        self.write('key', {})
+        stored = self.store.open('key')
+        self.assertEqual(stored.feature_ids.size, 0)
+        self.assertIsNone(stored.table(1))
+
+    def test_abort(self):
+        """An aborted entry leaves nothing behind."""
+        writer = self.store.writer('key')
+        writer.add(1, next(iter(lines().values())))
+        writer.abort()
+        self.assertIsNone(self.store.open('key'))
+        self.assertEqual(os.listdir(self.store.root), [])
+
+    def test_damaged_entry(self):
+        """A damaged entry is deleted instead of being read."""
+        self.write('key', lines())
+        folder = os.path.join(self.store.root, 'key')
+        os.remove(os.path.join(folder, 'offsets.npy'))
+        self.assertIsNone(self.store.open('key'))
+        self.assertFalse(os.path.exists(folder))
+
+    def test_source_stamp_invalidation(self):
+        """A new modification time or unsaved edits give no entry."""
+        layer = Layer()
+        key = geometry_store.source_key(layer)
+        self.write(key, lines())
+        self.assertIsNotNone(self.store.open(geometry_store.source_key(layer)))
+
+        layer.provider.msecs += 1
+        changed = geometry_store.source_key(layer)
+        self.assertNotEqual(changed, key)
+        self.assertIsNone(self.store.open(changed))
+
+        layer.modified = True
+        self.assertIsNone(geometry_store.source_key(layer))
+
+    def test_prune(self):
+        """The least recently used entries go beyond the disk limit."""
+        for number in range(3):
+            self.write(f'key{number}', lines(seed=number))
+            folder = os.path.join(self.store.root, f'key{number}')
+            os.utime(folder, (1000 + number, 1000 + number))
+        # Opening an entry marks it as used
+        self.store.open('key0')
+        sizes = {
+            name: sum(entry.stat().st_size for entry in os.scandir(
+                os.path.join(self.store.root, name)))
+            for name in os.listdir(self.store.root)
+        }
+        self.store.disk_limit = sizes['key0'] + sizes['key2']
+        self.store.prune()
+        self.assertEqual(sorted(os.listdir(self.store.root)), ['key0', 'key2'])
+
+    def test_prune_stale_temporary(self):
+        """Only abandoned unfinished entries are deleted."""
+        writer = self.store.writer('key')
+        stale = tempfile.mkdtemp(suffix='.tmp', dir=self.store.root)
+        old = time.time() - geometry_store.STALE_SECONDS - 60
+        os.utime(stale, (old, old))
+        self.store.prune()
+        self.assertFalse(os.path.exists(stale))
+        self.assertTrue(os.path.isdir(writer.folder))
+        writer.abort()
+
+
+if __name__ == '__main__':
+    unittest.main()
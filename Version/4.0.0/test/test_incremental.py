@@ -0,0 +1,247 @@
+# coding=utf-8
+"""Tests of the regeneration of the points of edited source features.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+import unittest
+
+from .utilities import get_plugin_module, get_qgis_app
+
+try:
+    from qgis.core import QgsFeature, QgsGeometry, QgsPointXY, QgsVectorLayer
+    generator = get_plugin_module('generator')
+    incremental = get_plugin_module('incremental')
+    point_writer = get_plugin_module('point_writer')
+except ImportError:
+    # The tracker follows the edit signals of QGIS layers
+    incremental = None
+
+SEED = 7
+POINTS = 5
+
+
+def line_geometry(offset, length=100.0):
+    """Return a bent line starting at ``offset`` times 200 m."""
+    x = offset * 200.0
+    return QgsGeometry.fromPolylineXY([
+        QgsPointXY(x, 0.0), QgsPointXY(x + length, length / 2), QgsPointXY(x, length),
+    ])
+
+
+def line_layer(count=6):
+    """Return a memory line layer of ``count`` features, IDs 1 to ``count``."""
+    layer = QgsVectorLayer('LineString?crs=EPSG:3857', 'lines', 'memory')
+    features = []
+    for offset in range(count):
+        feature = QgsFeature(layer.fields())
+        feature.setGeometry(line_geometry(offset))
+        features.append(feature)
+    layer.dataProvider().addFeatures(features)
+    return layer
+
+
+def generate(lines, destination, seed=SEED, feature_ids=None):
+    """Run a tracked generation of POINTS points per line into ``destination``."""
+    settings = generator.GenerationSettings()
+    settings.num_points = POINTS
+    settings.seed = seed
+    settings.track_points = True
+    settings.feature_ids = feature_ids
+    run = generator.PointGenerator(lines, settings, destination)
+    if not run.run():
+        raise AssertionError('the run was canceled')
+    return run
+
+
+def points(layer):
+    """Return the attributes and WKB geometry of every point by ID value."""
+    return {feature['ID']: (feature.attributes(), bytes(feature.geometry().asWkb()))
+            for feature in layer.getFeatures()}
+
+
+def rows(point_map):
+    """Return the points without their ID value, sorted."""
+    return sorted((attributes[1:], wkb) for attributes, wkb in point_map.values())
+
+
+def expected_rows(lines, feature_ids, seed=SEED):
+    """Return the points a new run gives the features, sorted."""
+    expected = []
+    for fid in feature_ids:
+        destination = point_writer.MemoryDestination(lines.crs())
+        generate(lines, destination, seed, [fid])
+        expected += rows(points(destination.finish()))
+    return sorted(expected)
+
+
+def ids_of(fid):
+    """Return the ID values of the points of a feature in the first run."""
+    return range(POINTS * (fid - 1) + 1, POINTS * fid + 1)
+
+
+@unittest.skipIf(incremental is None, 'QGIS is not available')
+class UpdateTaskTest(unittest.TestCase):
+    """Test EditTracker, UpdateTask and point_index."""
+
+    @classmethod
+    def setUpClass(cls):
+        get_qgis_app()
+
+    def setUp(self):
+        self.lines = line_layer()
+        destination = point_writer.MemoryDestination(self.lines.crs())
+        run = generate(self.lines, destination)
+        self.output = destination.finish()
+        self.tracker = incremental.EditTracker(self.lines, self.output, run)
+
+    def tearDown(self):
+        self.tracker.close()
+
+    def edit(self, fid, length=150.0):
+        """Change the geometry of a source feature and save it."""
+        self.lines.startEditing()
+        self.assertTrue(self.lines.changeGeometry(fid, line_geometry(fid, length)))
+        self.assertTrue(self.lines.commitChanges())
+
+    def update(self):
+        """Run an update task to the end, as the task manager would."""
+        finished = []
+        task = incremental.UpdateTask(self.tracker, finished.append)
+        task.finished(task.run())
+        self.assertIsNone(task.exception)
+        self.assertEqual(finished, [task])
+        self.assertFalse(self.tracker.pending())
+
+    def assertKept(self, before, after, feature_ids):
+        """Assert that the points of the features are bit-identical."""
+        kept = [point_id for fid in feature_ids for point_id in ids_of(fid)]
+        self.assertEqual({point_id: after[point_id] for point_id in kept},
+                         {point_id: before[point_id] for point_id in kept})
+
+    def new_points(self, before, after):
+        """Return the points added by an update, sorted."""
+        return rows({point_id: point for point_id, point in after.items()
+                     if point_id not in before})
+
+    def test_point_index(self):
+        """The index pairs every ID value with the feature ID of its point."""
+        point_ids, point_fids = incremental.point_index(
+            self.output, self.output.fields().indexOf('ID'))
+        self.assertEqual(point_ids.tolist(), list(range(1, 6 * POINTS + 1)))
+        for point_id, fid in zip(point_ids.tolist(), point_fids.tolist()):
+            self.assertEqual(self.output.getFeature(fid)['ID'], point_id)
+
+    def test_edit_and_delete(self):
+        """An edited feature gets exactly its new points, a deleted one
+        none, and the other points stay the same."""
+        before = points(self.output)
+        self.edit(2)
+        self.lines.startEditing()
+        self.assertTrue(self.lines.deleteFeature(4))
+        self.assertTrue(self.lines.commitChanges())
+        self.update()
+
+        after = points(self.output)
+        self.assertKept(before, after, (1, 3, 5, 6))
+        for fid in (2, 4):
+            self.assertFalse(set(ids_of(fid)) & set(after))
+        self.assertEqual(self.new_points(before, after), expected_rows(self.lines, [2]))
+        self.assertEqual(len(after), 5 * POINTS)
+
+    def test_temporary_feature_id(self):
+        """A feature added in the edit buffer gets points under its
+        temporary ID, replaced by those of its saved ID on commit."""
+        before = points(self.output)
+        self.lines.startEditing()
+        feature = QgsFeature(self.lines.fields())
+        feature.setGeometry(line_geometry(7))
+        self.assertTrue(self.lines.addFeature(feature))
+        temporary = feature.id()
+        self.assertLess(temporary, 0)
+        self.update()
+        self.assertEqual(self.new_points(before, points(self.output)),
+                         expected_rows(self.lines, [temporary]))
+
+        self.assertTrue(self.lines.commitChanges())
+        saved = max(self.lines.allFeatureIds())
+        self.assertTrue(self.tracker.pending())
+        self.update()
+        after = points(self.output)
+        self.assertKept(before, after, range(1, 7))
+        self.assertEqual(self.new_points(before, after), expected_rows(self.lines, [saved]))
+
+    def test_requeue_after_cancel(self):
+        """A canceled update leaves the points unchanged and keeps its
+        features for the next update."""
+        before = points(self.output)
+        self.edit(2)
+        finished = []
+        task = incremental.UpdateTask(self.tracker, finished.append)
+        self.assertFalse(self.tracker.pending())
+        task.cancel()
+        task.finished(task.run())
+        self.assertEqual(finished, [task])
+        self.assertEqual(points(self.output), before)
+        self.assertEqual(self.tracker.changed, {2})
+
+        self.update()
+        after = points(self.output)
+        self.assertKept(before, after, (1, 3, 4, 5, 6))
+        self.assertEqual(self.new_points(before, after), expected_rows(self.lines, [2]))
+
+    def test_index_after_output_commit(self):
+        """Saving the output layer drops the index, the next update reads
+        it again."""
+        self.edit(2)
+        self.update()
+        self.assertIsNotNone(self.tracker.point_ids)
+        self.output.startEditing()
+        self.assertTrue(self.output.commitChanges())
+        self.assertIsNone(self.tracker.point_ids)
+
+        before = points(self.output)
+        self.edit(3)
+        self.update()
+        after = points(self.output)
+        self.assertKept(before, after, (1, 4, 5, 6))
+        self.assertFalse(set(ids_of(3)) & set(after))
+        self.assertEqual(self.new_points(before, after), expected_rows(self.lines, [3]))
+
+    def replace_output(self, update):
+        """Replace the points with a run of another seed and track it."""
+        self.tracker.close()
+        destination = point_writer.ReplaceDestination(self.output, update)
+        run = generate(self.lines, destination, seed=SEED + 1)
+        self.assertIs(destination.finish(), self.output)
+        self.tracker = incremental.EditTracker(self.lines, self.output, run)
+
+    def check_replaced(self):
+        """Update an edit of the replacing run."""
+        before = points(self.output)
+        self.assertEqual(rows(before), expected_rows(self.lines, range(1, 7), SEED + 1))
+        self.edit(2)
+        self.update()
+        after = points(self.output)
+        self.assertKept(before, after, (1, 3, 4, 5, 6))
+        self.assertEqual(self.new_points(before, after),
+                         expected_rows(self.lines, [2], SEED + 1))
+
+    def test_index_after_replacing_run(self):
+        """The tracker of a run replacing the points reads their new
+        feature IDs."""
+        self.replace_output(update=False)
+        self.check_replaced()
+
+    def test_index_after_updating_run(self):
+        """The tracker of a run overwriting the points in place finds them."""
+        self.replace_output(update=True)
+        self.check_replaced()
+
+
+if __name__ == '__main__':
+    unittest.main()
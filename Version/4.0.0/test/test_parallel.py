@@ -0,0 +1,105 @@
+# coding=utf-8
+"""Tests of the process pool sampler.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import numpy as np
+
+from .utilities import get_plugin_module
+
+engine = get_plugin_module('sampling_engine')
+parallel = get_plugin_module('parallel')
+
+WORKERS = 4
+
+
+def group(size=40):
+    """Return a FeatureGroup of straight lines."""
+    tables = [engine.LineTable([(np.array([0.0, 100.0]), np.zeros(2))])] * size
+    return engine.FeatureGroup(
+        np.arange(size), tables, np.full(size, 10), np.zeros(size), np.zeros(size),
+        np.zeros(size))
+
+
+class PartitionSamplerTest(unittest.TestCase):
+    """Test PartitionSampler with the partitions sampled in threads."""
+
+    def setUp(self):
+        self.sampler = parallel.PartitionSampler(
+            WORKERS, {'batched': True, 'seed': 1, 'along_line': False, 'max_gap': 0})
+        # No process was started yet, threads share the patched functions
+        self.sampler.executor.shutdown()
+        self.sampler.executor = ThreadPoolExecutor(WORKERS)
+
+    def tearDown(self):
+        self.sampler.close()
+
+    def test_error_waits_for_running_partitions(self):
+        """After an error, the shared memory of the partitions still running
+        is only unlinked once they are done with it."""
+        sample_partition = parallel.sample_partition
+        submit = self.sampler.executor.submit
+        running = threading.Barrier(WORKERS)
+        submitted = []
+        attached = []
+
+        def record(function, source, target, params):
+            submitted.append(source[0])
+            return submit(function, source, target, params)
+
+        def sample(source, target, params):
+            running.wait(5)
+            if source[0] == submitted[0]:
+                raise ValueError('partition')
+            threading.Event().wait(0.3)
+            # Fails when the blocks were unlinked meanwhile
+            result = sample_partition(source, target, params)
+            attached.append(source[0])
+            return result
+
+        with mock.patch.object(parallel, 'sample_partition', sample), \
+                mock.patch.object(self.sampler.executor, 'submit', record):
+            with self.assertRaisesRegex(ValueError, 'partition'):
+                self.sampler.sample(group())
+        self.assertEqual(len(attached), WORKERS - 1)
+
+    def test_result(self):
+        """The partitions are merged in feature order."""
+        line_index, distances, _, _, shortfall, rejected = self.sampler.sample(group())
+        np.testing.assert_array_equal(line_index, np.repeat(np.arange(40), 10))
+        self.assertEqual(distances.size, 400)
+        self.assertEqual(shortfall[0].size, 0)
+        self.assertEqual(rejected, 0)
+
+    def test_empty_line_matches_serial(self):
+        """A line without vertices gets no points, in the partitions as in a
+        serial run, and the other lines keep their points."""
+        features = group(8)
+        features.tables[3] = engine.LineTable([])
+        for min_distance, along_line in ((0.0, False), (2.0, False), (2.0, True)):
+            features.min_distance[:] = min_distance
+            self.sampler.params = {'batched': False, 'seed': 1, 'along_line': along_line,
+                                   'max_gap': 0}
+            line_index, distances, x, y, shortfall, _ = self.sampler.sample(features)
+            self.assertNotIn(3, line_index)
+            self.assertNotIn(3, shortfall[0])
+            for line, table in enumerate(features.tables):
+                expected = engine.sample_line_constrained(
+                    table, engine.FeatureStream(1, line), 10, min_distance, along_line)
+                mask = line_index == line
+                for actual, wanted in zip((distances[mask], x[mask], y[mask]), expected):
+                    np.testing.assert_array_equal(actual, wanted)
+
+
+if __name__ == '__main__':
+    unittest.main()
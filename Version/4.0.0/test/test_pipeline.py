@@ -0,0 +1,170 @@
+# coding=utf-8
+"""Tests of the reader / sampler / writer pipeline.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+import itertools
+import threading
+import unittest
+
+from .utilities import get_plugin_module
+
+pipeline = get_plugin_module('pipeline')
+
+# Seconds a pipeline may take to shut down in the tests
+TIMEOUT = 10
+
+
+def pipeline_threads():
+    """Return the reader and writer threads still running."""
+    return [thread for thread in threading.enumerate()
+            if thread.name in ('RandomPointsReader', 'RandomPointsWriter')]
+
+
+class RunPipelineTest(unittest.TestCase):
+    """Test run_pipeline."""
+
+    def run_in_thread(self, *args, **kwargs):
+        """Run a pipeline in a thread and return its result or exception,
+        failing if it does not end within TIMEOUT seconds."""
+        outcome = {}
+
+        def target():
+            try:
+                outcome['result'] = pipeline.run_pipeline(*args, **kwargs)
+            except BaseException as e:  # pylint: disable=broad-except
+                outcome['error'] = e
+
+        thread = threading.Thread(target=target, daemon=True)
+        thread.start()
+        thread.join(TIMEOUT)
+        self.assertFalse(thread.is_alive(), 'the pipeline did not shut down')
+        self.assertEqual(pipeline_threads(), [])
+        return outcome
+
+    def test_order(self):
+        """Every item is sampled and written in input order."""
+        written = []
+        outcome = self.run_in_thread(
+            ((item, 1) for item in range(1000)),
+            lambda item: (item * 2, 1),
+            written.append,
+            memory_limit=16, queue_size=2,
+        )
+        self.assertIs(outcome['result'], True)
+        self.assertEqual(written, [item * 2 for item in range(1000)])
+
+    def test_read_error(self):
+        """An error of the reader is raised by run_pipeline."""
+        def read():
+            yield 1, 1
+            raise ValueError('read')
+
+        outcome = self.run_in_thread(read(), lambda item: (item, 1), lambda result: None, 16)
+        self.assertIsInstance(outcome['error'], ValueError)
+        self.assertEqual(str(outcome['error']), 'read')
+
+    def test_sample_error(self):
+        """An error of the sampler stops the reader and is raised."""
+        def sample(item):
+            if item == 10:
+                raise ValueError('sample')
+            return item, 1
+
+        outcome = self.run_in_thread(
+            ((item, 1) for item in itertools.count()), sample, lambda result: None, 16,
+            queue_size=2,
+        )
+        self.assertIsInstance(outcome['error'], ValueError)
+        self.assertEqual(str(outcome['error']), 'sample')
+
+    def test_write_error(self):
+        """An error of the writer stops the pipeline and is raised."""
+        def write(result):
+            if result == 10:
+                raise ValueError('write')
+
+        outcome = self.run_in_thread(
+            ((item, 1) for item in itertools.count()), lambda item: (item, 1), write, 16,
+            queue_size=2,
+        )
+        self.assertIsInstance(outcome['error'], ValueError)
+        self.assertEqual(str(outcome['error']), 'write')
+
+    def test_interrupt_with_blocked_reader(self):
+        """A KeyboardInterrupt in the sampler ends the pipeline while the
+        reader waits on the full queue."""
+        started = threading.Event()
+
+        def sample(item):
+            started.wait(1)
+            raise KeyboardInterrupt
+
+        def read():
+            for item in itertools.count():
+                if item == 3:
+                    started.set()
+                yield item, 0
+
+        outcome = self.run_in_thread(
+            read(), sample, lambda result: None, memory_limit=1 << 30, queue_size=1,
+        )
+        self.assertIsInstance(outcome['error'], KeyboardInterrupt)
+
+    def test_cancel(self):
+        """A cancelation stops the reader, the items read are written."""
+        written = []
+        outcome = self.run_in_thread(
+            ((item, 1) for item in range(1000)),
+            lambda item: (item, 1),
+            written.append,
+            16,
+            is_canceled=lambda: len(written) >= 20,
+            queue_size=2,
+        )
+        self.assertIs(outcome['result'], False)
+        self.assertGreaterEqual(len(written), 20)
+        self.assertLess(len(written), 1000)
+        self.assertEqual(written, list(range(len(written))))
+
+    def test_oversized_item(self):
+        """Items larger than the whole budget still pass one at a time."""
+        written = []
+        outcome = self.run_in_thread(
+            ((item, 1000) for item in range(5)),
+            lambda item: (item, 1000),
+            written.append,
+            memory_limit=10,
+        )
+        self.assertIs(outcome['result'], True)
+        self.assertEqual(written, list(range(5)))
+
+
+class MemoryBudgetTest(unittest.TestCase):
+    """Test MemoryBudget."""
+
+    def test_admits_oversized_item_when_empty(self):
+        """An item larger than the limit is admitted when nothing is charged."""
+        budget = pipeline.MemoryBudget(10, threading.Event())
+        self.assertTrue(budget.acquire(100))
+        self.assertEqual(budget.used, 100)
+        budget.release(100)
+        self.assertEqual(budget.used, 0)
+
+    def test_stop_while_waiting(self):
+        """A waiting acquire gives up once the pipeline is stopped."""
+        stop = threading.Event()
+        budget = pipeline.MemoryBudget(10, stop)
+        budget.acquire(8)
+        threading.Timer(0.2, stop.set).start()
+        self.assertFalse(budget.acquire(8))
+        self.assertEqual(budget.used, 8)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,163 @@
+# coding=utf-8
+"""Tests of the destinations replacing the output of an earlier run.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from .utilities import get_plugin_module, get_qgis_app
+
+try:
+    from qgis.core import QgsCoordinateReferenceSystem, QgsCoordinateTransformContext
+    point_writer = get_plugin_module('point_writer')
+except ImportError:
+    # The destinations write QGIS layers
+    point_writer = None
+
+OLD_POINTS = 10
+
+
+def write(destination, count, offset=0.0):
+    """Write ``count`` points along the x axis from ``offset`` on."""
+    writer = point_writer.PointWriter(destination.sink, destination.fields,
+                                      destination.first_id)
+    distances = np.arange(count, dtype=float) + offset
+    writer.add_points(distances, distances, np.zeros(count))
+    writer.close()
+
+
+def points(layer):
+    """Return the ID and X attributes of the points in ID order."""
+    return sorted((feature['ID'], feature['XCoord']) for feature in layer.getFeatures())
+
+
+@unittest.skipIf(point_writer is None, 'QGIS is not available')
+class ReplaceDestinationTest(unittest.TestCase):
+    """Test ReplaceDestination and UpdateSink."""
+
+    @classmethod
+    def setUpClass(cls):
+        get_qgis_app()
+
+    def setUp(self):
+        self.crs = QgsCoordinateReferenceSystem('EPSG:3857')
+        destination = point_writer.MemoryDestination(self.crs)
+        write(destination, OLD_POINTS)
+        self.layer = destination.finish()
+        self.old_fids = point_writer.ordered_feature_ids(self.layer)
+
+    def replace(self, count, update, layer=None):
+        """Replace the points of a layer by ``count`` new points."""
+        layer = layer or self.layer
+        destination = point_writer.ReplaceDestination(layer, update)
+        self.assertIsNone(destination.error)
+        write(destination, count, offset=1000.0)
+        self.assertIs(destination.finish(), layer)
+        self.assertIsNone(destination.staging)
+
+    def assertReplaced(self, count, layer=None):
+        """Assert that the layer holds exactly the new points."""
+        self.assertEqual(points(layer or self.layer),
+                         [(number + 1, 1000.0 + number) for number in range(count)])
+
+    def test_replace(self):
+        """More or fewer new points than old ones replace all of them."""
+        for count in (OLD_POINTS + 5, OLD_POINTS - 6, 0):
+            self.replace(count, update=False)
+            self.assertReplaced(count)
+            self.assertFalse(set(self.layer.allFeatureIds()) & set(self.old_fids))
+            self.old_fids = point_writer.ordered_feature_ids(self.layer)
+
+    def test_update(self):
+        """Overwriting in place keeps the feature IDs of the points still
+        needed, in ID order."""
+        self.replace(OLD_POINTS, update=True)
+        self.assertReplaced(OLD_POINTS)
+        self.assertEqual(point_writer.ordered_feature_ids(self.layer), self.old_fids)
+
+        self.replace(OLD_POINTS + 5, update=True)
+        self.assertReplaced(OLD_POINTS + 5)
+        self.assertEqual(point_writer.ordered_feature_ids(self.layer)[:OLD_POINTS],
+                         self.old_fids)
+
+        self.replace(OLD_POINTS - 6, update=True)
+        self.assertReplaced(OLD_POINTS - 6)
+        self.assertEqual(point_writer.ordered_feature_ids(self.layer),
+                         self.old_fids[:OLD_POINTS - 6])
+
+    def test_large_run(self):
+        """Points of several chunks are moved in order."""
+        with mock.patch.object(point_writer.PointWriter, 'CHUNK_SIZE', 4):
+            for update in (False, True):
+                self.replace(OLD_POINTS * 3 + 1, update)
+                self.assertReplaced(OLD_POINTS * 3 + 1)
+
+    def test_discard(self):
+        """A canceled or failed run leaves the layer unchanged."""
+        before = points(self.layer)
+        for update in (False, True):
+            destination = point_writer.ReplaceDestination(self.layer, update)
+            write(destination, OLD_POINTS + 5, offset=1000.0)
+            destination.discard()
+            self.assertEqual(points(self.layer), before)
+            self.assertEqual(point_writer.ordered_feature_ids(self.layer), self.old_fids)
+
+    def failing_copy(self, destination):
+        """Finish a destination whose second chunk is rejected."""
+        add_chunk = point_writer._add_chunk  # pylint: disable=protected-access
+        calls = []
+
+        def reject(target, features, added):
+            calls.append(len(features))
+            if len(calls) == 2:
+                raise point_writer.WriteError('rejected')
+            add_chunk(target, features, added)
+
+        with mock.patch.object(point_writer.PointWriter, 'CHUNK_SIZE', 4), \
+                mock.patch.object(point_writer, '_add_chunk', reject):
+            with self.assertRaisesRegex(point_writer.WriteError, 'rejected'):
+                destination.finish()
+
+    def test_failure_file_layer(self):
+        """A file layer keeps its old points when the new ones are rejected."""
+        folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, folder, ignore_errors=True)
+        destination = point_writer.FileDestination(
+            os.path.join(folder, 'points.gpkg'), self.crs, QgsCoordinateTransformContext())
+        self.assertIsNone(destination.error)
+        write(destination, OLD_POINTS)
+        layer = destination.finish()
+        self.assertTrue(layer.isValid())
+        before = points(layer)
+
+        destination = point_writer.ReplaceDestination(layer, update=False)
+        write(destination, OLD_POINTS + 5, offset=1000.0)
+        self.failing_copy(destination)
+        self.assertEqual(points(layer), before)
+
+        # The layer can still be replaced
+        self.replace(OLD_POINTS + 5, update=False, layer=layer)
+        self.assertReplaced(OLD_POINTS + 5, layer)
+
+    def test_failure_memory_layer(self):
+        """A memory layer, truncated first to bound the memory, is left
+        without points when the new ones are rejected."""
+        destination = point_writer.ReplaceDestination(self.layer, update=False)
+        write(destination, OLD_POINTS + 5, offset=1000.0)
+        self.failing_copy(destination)
+        self.assertEqual(points(self.layer), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
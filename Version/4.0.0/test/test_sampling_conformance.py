@@ -0,0 +1,558 @@
+# coding=utf-8
+"""Statistical conformance of the sampling engines.
+
+Millions of points are drawn on reference geometries (a straight line, a
+zig-zag, a multipart line and a long coastline-like line) and checked for
+uniformity along the line with Kolmogorov-Smirnov and chi-square tests,
+for the start and end offsets and for the spacing constraints. The engines
+are compared with a port of the original ``generate_random_points`` of the
+dialog. Every test has a runtime budget, so a slower engine fails as well.
+
+The seeds are fixed, the tests are deterministic. Set
+``RANDOM_POINTS_CONFORMANCE_SCALE`` to scale the number of points and
+``RANDOM_POINTS_BUDGET_FACTOR`` to scale the runtime budgets on slow
+machines.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+import math
+import os
+import random
+import time
+import unittest
+from contextlib import contextmanager
+
+import numpy as np
+
+from .utilities import get_plugin_module
+
+engine = get_plugin_module('sampling_engine')
+
+SCALE = float(os.environ.get('RANDOM_POINTS_CONFORMANCE_SCALE', '1'))
+BUDGET_FACTOR = float(os.environ.get('RANDOM_POINTS_BUDGET_FACTOR', '1'))
+# Significance level of the statistical tests
+ALPHA = 1e-3
+SEED = 20241021
+# Points per reference geometry in the vectorized tests
+POINTS = 1000000
+CHI_SQUARE_BINS = 1000
+
+
+def scaled(count):
+    """Return a point count scaled by RANDOM_POINTS_CONFORMANCE_SCALE."""
+    return max(int(count * SCALE), 1)
+
+
+def ks_uniform(values):
+    """One-sample Kolmogorov-Smirnov test against the uniform [0, 1] law.
+
+    :returns: The statistic and its asymptotic p-value.
+    :rtype: (float, float)
+    """
+    values = np.sort(np.asarray(values, dtype=np.float64))
+    n = values.size
+    steps = np.arange(1, n + 1) / n
+    statistic = max(float(np.max(steps - values)), float(np.max(values - (steps - 1 / n))))
+    return statistic, kolmogorov_pvalue(statistic, n)
+
+
+def ks_two_sample(first, second):
+    """Two-sample Kolmogorov-Smirnov test.
+
+    :returns: The statistic and its asymptotic p-value.
+    :rtype: (float, float)
+    """
+    first = np.sort(np.asarray(first, dtype=np.float64))
+    second = np.sort(np.asarray(second, dtype=np.float64))
+    values = np.concatenate((first, second))
+    statistic = float(np.max(np.abs(
+        np.searchsorted(first, values, side='right') / first.size
+        - np.searchsorted(second, values, side='right') / second.size
+    )))
+    effective = first.size * second.size / (first.size + second.size)
+    return statistic, kolmogorov_pvalue(statistic, effective)
+
+
+def kolmogorov_pvalue(statistic, n):
+    """Return the asymptotic p-value of a Kolmogorov-Smirnov statistic."""
+    root = math.sqrt(n)
+    scale = (root + 0.12 + 0.11 / root) * statistic
+    if scale < 0.2:
+        return 1.0
+    total = sum((-1) ** (k - 1) * math.exp(-2 * k * k * scale * scale) for k in range(1, 101))
+    return min(max(2 * total, 0.0), 1.0)
+
+
+def chi_square_uniform(values, bins=CHI_SQUARE_BINS):
+    """Chi-square test of equal bin counts on [0, 1].
+
+    The p-value uses the Wilson-Hilferty normal approximation, accurate for
+    the hundreds of degrees of freedom used here.
+
+    :returns: The statistic and its p-value.
+    :rtype: (float, float)
+    """
+    counts = np.bincount(
+        np.minimum((np.asarray(values) * bins).astype(np.int64), bins - 1), minlength=bins
+    )
+    expected = counts.sum() / bins
+    statistic = float(np.sum((counts - expected) ** 2) / expected)
+    freedom = bins - 1
+    z = ((statistic / freedom) ** (1 / 3) - (1 - 2 / (9 * freedom))) / math.sqrt(2 / (9 * freedom))
+    return statistic, 0.5 * math.erfc(z / math.sqrt(2))
+
+
+def min_pairwise_distance(x, y, chunk=2048):
+    """Return the smallest Euclidean distance between two of the points."""
+    smallest = math.inf
+    for first in range(0, x.size, chunk):
+        dx = x[first:first + chunk, None] - x[None, :]
+        dy = y[first:first + chunk, None] - y[None, :]
+        distances = np.hypot(dx, dy)
+        rows = np.arange(distances.shape[0])
+        distances[rows, rows + first] = math.inf
+        smallest = min(smallest, float(distances.min()))
+    return smallest
+
+
+def straight_line():
+    """Return the parts of a straight 1000 m line."""
+    return [(np.array([0.0, 1000.0]), np.array([0.0, 0.0]))]
+
+
+def zigzag_line(vertices=201, seed=1):
+    """Return the parts of a zig-zag with uneven segments and increasing x."""
+    rng = np.random.default_rng(seed)
+    x = np.concatenate(([0.0], np.cumsum(rng.uniform(1.0, 20.0, vertices - 1))))
+    y = np.where(np.arange(vertices) % 2, 1.0, -1.0) * rng.uniform(5.0, 50.0, vertices)
+    return [(x, y)]
+
+
+def multipart_line():
+    """Return the parts of a multipart line of three zig-zags with gaps
+    between them, x increasing over all parts."""
+    parts = []
+    start = 0.0
+    for vertices, seed in ((31, 2), (101, 3), (11, 4)):
+        (x, y), = zigzag_line(vertices, seed)
+        parts.append((x + start, y))
+        start += x[-1] + 200.0
+    return parts
+
+
+def coastline(vertices=200000, seed=5):
+    """Return the parts of a long coastline-like line.
+
+    The steps have a heavy-tailed length and a slowly wandering heading, so
+    short and long segments alternate at every scale.
+    """
+    rng = np.random.default_rng(seed)
+    headings = np.cumsum(rng.normal(0.0, 0.6, vertices - 1))
+    steps = rng.lognormal(2.0, 1.0, vertices - 1)
+    x = np.concatenate(([0.0], np.cumsum(steps * np.cos(headings))))
+    y = np.concatenate(([0.0], np.cumsum(steps * np.sin(headings))))
+    return [(x, y)]
+
+
+def arc_position_from_x(parts, x):
+    """Recover the distance along a line with increasing x from the x
+    coordinate of a point, independently of the engine interpolation."""
+    vertex_x = np.concatenate([part_x for part_x, _ in parts])
+    cumulative = engine.LineTable(parts).cumulative
+    segment = np.searchsorted(vertex_x, x, side='right') - 1
+    np.clip(segment, 0, vertex_x.size - 2, out=segment)
+    part_y = np.concatenate([part_y for _, part_y in parts])
+    dx = vertex_x[segment + 1] - vertex_x[segment]
+    length = np.hypot(dx, part_y[segment + 1] - part_y[segment])
+    return cumulative[segment] + (x - vertex_x[segment]) / dx * length
+
+
+def reference_points(parts, count, start_percent=0, end_percent=0, min_distance=0, seed=0):
+    """Port of the original ``generate_random_points`` of the dialog.
+
+    ``QgsGeometry.interpolate`` is replaced by ``numpy.interp`` on the
+    cumulative length, so single part lines only.
+
+    :returns: Distance, x and y arrays of the points.
+    :rtype: (numpy.ndarray, numpy.ndarray, numpy.ndarray)
+    """
+    (vertex_x, vertex_y), = parts
+    cumulative = engine.LineTable(parts).cumulative
+    length = cumulative[-1]
+    generator = random.Random(seed)
+    low = length * (start_percent / 100)
+    high = length * (1 - (end_percent / 100))
+
+    points = []
+    attempts = 0
+    max_attempts = 1000
+    while len(points) < count and attempts < max_attempts:
+        distance = generator.uniform(low, high)
+        px = float(np.interp(distance, cumulative, vertex_x))
+        py = float(np.interp(distance, cumulative, vertex_y))
+        if min_distance > 0:
+            if any(math.hypot(px - qx, py - qy) < min_distance for _, qx, qy in points):
+                attempts += 1
+                continue
+        points.append((distance, px, py))
+        attempts = 0
+    if not points:
+        return np.zeros(0), np.zeros(0), np.zeros(0)
+    return tuple(np.array(column) for column in zip(*points))
+
+
+class ConformanceTestCase(unittest.TestCase):
+    """Shared assertions of the conformance tests."""
+
+    @contextmanager
+    def budget(self, seconds):
+        """Fail if the block takes longer than ``seconds`` times
+        RANDOM_POINTS_BUDGET_FACTOR, and scaled with the point counts."""
+        limit = seconds * BUDGET_FACTOR * max(SCALE, 1.0)
+        start = time.perf_counter()
+        yield
+        elapsed = time.perf_counter() - start
+        self.assertLessEqual(
+            elapsed, limit, 'took {:.2f}s, budget {:.2f}s'.format(elapsed, limit))
+
+    def assertUniform(self, values, label):
+        """Assert that values in [0, 1] pass the KS and chi-square tests."""
+        values = np.asarray(values)
+        self.assertGreaterEqual(values.min(), 0.0, label)
+        self.assertLessEqual(values.max(), 1.0, label)
+        statistic, p_value = ks_uniform(values)
+        self.assertGreater(
+            p_value, ALPHA, '{}: KS statistic {:.2e}, p {:.2e}'.format(label, statistic, p_value))
+        statistic, p_value = chi_square_uniform(values)
+        self.assertGreater(
+            p_value, ALPHA, '{}: chi-square {:.1f}, p {:.2e}'.format(label, statistic, p_value))
+
+    def assertSameDistribution(self, first, second, label):
+        """Assert that a two-sample KS test does not tell the samples apart."""
+        statistic, p_value = ks_two_sample(first, second)
+        self.assertGreater(
+            p_value, ALPHA, '{}: KS statistic {:.2e}, p {:.2e}'.format(label, statistic, p_value))
+
+
+class BatchUniformityTest(ConformanceTestCase):
+    """The vectorized engine places points uniformly along the lines."""
+
+    FEATURES = 1000
+
+    def sample(self, parts, features=FEATURES):
+        """Sample POINTS points over copies of a line."""
+        table = engine.LineTable(parts)
+        batch = engine.LineBatch([table] * features)
+        counts = np.full(features, scaled(POINTS) // features)
+        feature_ids = np.arange(features, dtype=np.int64) * 7919 + 1
+        return table, engine.sample_batch(batch, SEED, feature_ids, counts)
+
+    def test_straight(self):
+        """Positions and coordinates are uniform on a straight line."""
+        with self.budget(10):
+            table, (_, distances, x, y) = self.sample(straight_line())
+        self.assertUniform(distances / table.length, 'straight distances')
+        self.assertUniform(x / 1000.0, 'straight x')
+        self.assertTrue(np.all(y == 0.0))
+
+    def test_zigzag(self):
+        """Points lie on the zig-zag, uniformly along its length."""
+        parts = zigzag_line()
+        with self.budget(10):
+            table, (_, distances, x, y) = self.sample(parts)
+        positions = arc_position_from_x(parts, x)
+        np.testing.assert_allclose(positions, distances, rtol=0, atol=1e-6 * table.length)
+        np.testing.assert_allclose(
+            y, np.interp(x, parts[0][0], parts[0][1]), rtol=0, atol=1e-9 * table.length)
+        self.assertUniform(positions / table.length, 'zig-zag positions')
+
+    def test_multipart(self):
+        """No point falls between the parts, positions are uniform."""
+        parts = multipart_line()
+        with self.budget(10):
+            table, (_, distances, x, _) = self.sample(parts)
+        in_part = np.zeros(x.size, dtype=bool)
+        for part_x, _ in parts:
+            in_part |= (x >= part_x[0]) & (x <= part_x[-1])
+        self.assertTrue(np.all(in_part))
+        positions = arc_position_from_x(parts, x)
+        np.testing.assert_allclose(positions, distances, rtol=0, atol=1e-6 * table.length)
+        self.assertUniform(positions / table.length, 'multipart positions')
+
+    def test_coastline(self):
+        """Positions are uniform on a long line of 200 000 vertices."""
+        parts = coastline()
+        with self.budget(15):
+            table, (_, distances, x, y) = self.sample(parts, features=10)
+        self.assertUniform(distances / table.length, 'coastline distances')
+        subset = slice(0, None, 97)
+        np.testing.assert_allclose(
+            x[subset], np.interp(distances[subset], table.cumulative, parts[0][0]),
+            rtol=0, atol=1e-6)
+        np.testing.assert_allclose(
+            y[subset], np.interp(distances[subset], table.cumulative, parts[0][1]),
+            rtol=0, atol=1e-6)
+
+    def test_offsets(self):
+        """Points stay between per-feature start and end offsets and are
+        uniform in between."""
+        parts = zigzag_line()
+        table = engine.LineTable(parts)
+        batch = engine.LineBatch([table] * self.FEATURES)
+        rng = np.random.default_rng(SEED)
+        start = rng.uniform(0, 45, self.FEATURES)
+        end = rng.uniform(0, 45, self.FEATURES)
+        counts = np.full(self.FEATURES, scaled(POINTS) // self.FEATURES)
+        with self.budget(10):
+            line_index, distances, x, _ = engine.sample_batch(
+                batch, SEED, np.arange(self.FEATURES), counts, start, end)
+        low = table.length * start[line_index] / 100
+        high = table.length * (1 - end[line_index] / 100)
+        positions = arc_position_from_x(parts, x)
+        tolerance = 1e-6 * table.length
+        self.assertTrue(np.all(positions >= low - tolerance))
+        self.assertTrue(np.all(positions <= high + tolerance))
+        self.assertUniform(
+            np.clip((distances - low) / (high - low), 0, 1), 'offset positions')
+
+    def test_matches_reference(self):
+        """The engine and the original sampler draw the same distribution
+        and interpolate the same coordinates."""
+        parts = zigzag_line()
+        count = scaled(200000)
+        with self.budget(10):
+            distances, x, y = engine.sample_line(
+                engine.LineTable(parts), engine.FeatureStream(SEED, 1), count, 10, 20)
+        reference_distances, _, _ = reference_points(parts, count, 10, 20, seed=SEED)
+        self.assertSameDistribution(distances, reference_distances, 'engine and reference')
+        cumulative = engine.LineTable(parts).cumulative
+        np.testing.assert_allclose(x, np.interp(distances, cumulative, parts[0][0]), atol=1e-9)
+        np.testing.assert_allclose(y, np.interp(distances, cumulative, parts[0][1]), atol=1e-9)
+
+    def test_batch_matches_single_lines(self):
+        """A batch gives every line the points of its own feature stream."""
+        tables = [engine.LineTable(parts) for parts in
+                  (straight_line(), zigzag_line(), multipart_line())] * 50
+        feature_ids = np.arange(len(tables), dtype=np.int64) * 3 + 11
+        counts = np.arange(len(tables)) % 40
+        line_index, distances, x, y = engine.sample_batch(
+            engine.LineBatch(tables), SEED, feature_ids, counts, 5, 5)
+        for line, table in enumerate(tables):
+            expected = engine.sample_line(
+                table, engine.FeatureStream(SEED, int(feature_ids[line])), int(counts[line]), 5, 5)
+            mask = line_index == line
+            for actual, wanted in zip((distances[mask], x[mask], y[mask]), expected):
+                np.testing.assert_array_equal(actual, wanted)
+
+
+class SpacingTest(ConformanceTestCase):
+    """The spacing constraints hold and the points stay uniform under them."""
+
+    def test_min_distance(self):
+        """No two points of a line are closer than the minimum distance."""
+        for name, parts, min_distance in (
+                ('straight', straight_line(), 2.0),
+                ('zig-zag', zigzag_line(), 5.0),
+                ('multipart', multipart_line(), 5.0),
+                ('coastline', coastline(20000), 50.0)):
+            table = engine.LineTable(parts)
+            with self.budget(10):
+                _, x, y, _ = engine.sample_line_min_distance(
+                    table, engine.FeatureStream(SEED, 1), scaled(5000), min_distance)
+            self.assertGreater(x.size, 0, name)
+            self.assertGreaterEqual(min_pairwise_distance(x, y), min_distance, name)
+
+    def test_global_min_distance(self):
+        """A shared index keeps the minimum distance across lines."""
+        index = engine.GridIndex(5.0)
+        xs, ys = [], []
+        with self.budget(10):
+            for feature_id, offset in enumerate((0.0, 3.0, 6.0, 9.0)):
+                (x, y), = zigzag_line(101, seed=feature_id)
+                table = engine.LineTable([(x, y + offset)])
+                _, px, py, _ = engine.sample_line_min_distance(
+                    table, engine.FeatureStream(SEED, feature_id), scaled(1000), 5.0,
+                    index=index)
+                xs.append(px)
+                ys.append(py)
+        self.assertGreaterEqual(
+            min_pairwise_distance(np.concatenate(xs), np.concatenate(ys)), 5.0)
+
+    def test_min_distance_matches_reference(self):
+        """Rejection sampling accepts as many points, at the same positions,
+        as the original sampler."""
+        parts = zigzag_line(51)
+        table = engine.LineTable(parts)
+        runs = scaled(200)
+        engine_counts, reference_counts = [], []
+        engine_positions, reference_positions = [], []
+        with self.budget(20):
+            for run in range(runs):
+                distances, _, _, _ = engine.sample_line_min_distance(
+                    table, engine.FeatureStream(SEED, run), 60, 15.0, 10, 10)
+                engine_counts.append(distances.size)
+                engine_positions.append(distances)
+        for run in range(runs):
+            distances, _, _ = reference_points(parts, 60, 10, 10, 15.0, seed=SEED + run)
+            reference_counts.append(distances.size)
+            reference_positions.append(distances)
+        self.assertAlmostEqual(
+            np.mean(engine_counts) / np.mean(reference_counts), 1.0, delta=0.02)
+        self.assertSameDistribution(
+            np.concatenate(engine_positions), np.concatenate(reference_positions),
+            'min-distance positions')
+
+    def test_along_line(self):
+        """Spacings along the line respect the bounds and the configurations
+        are uniform among the admissible ones."""
+        table = engine.LineTable(coastline(20000))
+        low, high = engine.offset_range(table.length, 10, 10)
+        min_gap = (high - low) / 2000
+        runs = scaled(1000)
+        count = 1000
+        normalized = []
+        with self.budget(10):
+            for run in range(runs):
+                distances, _, _ = engine.sample_line_spaced(
+                    table, engine.FeatureStream(SEED, run), count, min_gap,
+                    start_percent=10, end_percent=10)
+                self.assertEqual(distances.size, count)
+                gaps = np.diff(distances)
+                self.assertGreaterEqual(gaps.min(), min_gap * (1 - 1e-9))
+                self.assertGreaterEqual(distances[0], low)
+                self.assertLessEqual(distances[-1], high)
+                # Removing the reserved gaps leaves sorted uniform positions
+                normalized.append(
+                    (distances - low - np.arange(count) * min_gap)
+                    / (high - low - (count - 1) * min_gap))
+        self.assertUniform(np.clip(np.concatenate(normalized), 0, 1), 'along-line positions')
+
+    def test_along_line_max_gap(self):
+        """No interior spacing exceeds the maximum gap and infeasible counts
+        are clipped to what fits."""
+        table = engine.LineTable(zigzag_line())
+        for run in range(scaled(200)):
+            distances, _, _ = engine.sample_line_spaced(
+                table, engine.FeatureStream(SEED, run), 400, 5.0, 15.0)
+            gaps = np.diff(distances)
+            self.assertGreaterEqual(gaps.min(), 5.0 * (1 - 1e-9))
+            self.assertLessEqual(gaps.max(), 15.0 * (1 + 1e-9))
+        feasible = engine.max_spaced_count(table.length, 5.0)
+        distances, _, _ = engine.sample_line_spaced(
+            table, engine.FeatureStream(SEED, 0), feasible + 100, 5.0)
+        self.assertEqual(distances.size, feasible)
+
+
+class EmptyLineTest(unittest.TestCase):
+    """A line without vertices, like a NULL geometry, gets no points."""
+
+    def setUp(self):
+        self.table = engine.LineTable([])
+
+    def assertEmpty(self, result):
+        """Assert that every column of a sampler result is empty."""
+        for column in result[:3]:
+            self.assertEqual(column.size, 0)
+
+    def test_sample_line(self):
+        """No distances are drawn without coordinates to match them."""
+        self.assertEmpty(engine.sample_line(self.table, engine.FeatureStream(SEED, 1), 10))
+
+    def test_min_distance(self):
+        """Rejection sampling returns at once instead of drawing forever."""
+        result = engine.sample_line_min_distance(
+            self.table, engine.FeatureStream(SEED, 1), 10, 5.0)
+        self.assertEmpty(result)
+        self.assertEqual(result[3], 0)
+
+    def test_constrained(self):
+        """Every spacing mode of a run skips the line."""
+        for min_distance in (0, 5.0):
+            result = engine.sample_line_constrained(
+                self.table, engine.FeatureStream(SEED, 1), 10, min_distance)
+            self.assertEmpty(result)
+            self.assertEqual(result[3], 0)
+
+    def test_along_line(self):
+        """Spacing along the line places no point on the zero length."""
+        for max_gap in (0, 10.0):
+            self.assertEmpty(engine.sample_line_spaced(
+                self.table, engine.FeatureStream(SEED, 1), 10, 5.0, max_gap))
+            result = engine.sample_line_constrained(
+                self.table, engine.FeatureStream(SEED, 1), 10, 5.0, along_line=True,
+                max_gap=max_gap)
+            self.assertEmpty(result)
+
+    def test_batch(self):
+        """The empty line of a batch neither gets points nor shifts the others."""
+        line = engine.LineTable(straight_line())
+        line_index, distances, x, _ = engine.sample_batch(
+            engine.LineBatch([line, self.table, line]), SEED, np.arange(3), np.full(3, 10))
+        np.testing.assert_array_equal(line_index, np.repeat([0, 2], 10))
+        self.assertEqual(distances.size, x.size)
+
+
+class ParallelConformanceTest(ConformanceTestCase):
+    """Worker processes produce exactly the points of a serial run."""
+
+    WORKERS = 2
+
+    def group(self):
+        """Return a FeatureGroup mixing all reference geometries."""
+        tables = [engine.LineTable(parts) for parts in
+                  (straight_line(), zigzag_line(), multipart_line(), coastline(5000))] * 250
+        size = len(tables)
+        return engine.FeatureGroup(
+            np.arange(size) * 5 + 3, tables, np.full(size, scaled(POINTS) // size),
+            np.full(size, 5.0), np.full(size, 15.0), np.full(size, 0.0))
+
+    def run_parallel(self, group, params):
+        """Sample a group in a pool of worker processes."""
+        parallel = get_plugin_module('parallel')
+        sampler = parallel.PartitionSampler(self.WORKERS, params)
+        try:
+            return sampler.sample(group)
+        finally:
+            sampler.close()
+
+    def test_batched(self):
+        """Batched partitions equal one batch in this process."""
+        group = self.group()
+        with self.budget(30):
+            line_index, distances, x, y, _, _ = self.run_parallel(
+                group, {'batched': True, 'seed': SEED, 'along_line': False, 'max_gap': 0})
+        expected = engine.sample_batch(
+            engine.LineBatch(group.tables), SEED, group.feature_ids, group.counts,
+            group.start_percent, group.end_percent)
+        for actual, wanted in zip((line_index, distances, x, y), expected):
+            np.testing.assert_array_equal(actual, wanted)
+        lengths = engine.LineBatch(group.tables).lengths[line_index]
+        self.assertUniform(
+            np.clip((distances / lengths - 0.05) / 0.8, 0, 1), 'parallel positions')
+
+    def test_constrained(self):
+        """Partitions with a minimum distance equal the serial sampler."""
+        group = self.group().subset(slice(0, 40))
+        group.min_distance[:] = 2.0
+        group.counts[:] = 200
+        with self.budget(30):
+            line_index, distances, _, _, shortfall, rejected = self.run_parallel(
+                group, {'batched': False, 'seed': SEED, 'along_line': False, 'max_gap': 0})
+        total_rejected = 0
+        for line, table in enumerate(group.tables):
+            expected, _, _, line_rejected = engine.sample_line_constrained(
+                table, engine.FeatureStream(SEED, int(group.feature_ids[line])), 200, 2.0,
+                start_percent=5.0, end_percent=15.0)
+            total_rejected += line_rejected
+            np.testing.assert_array_equal(distances[line_index == line], expected)
+            self.assertEqual(expected.size < 200, line in shortfall[0])
+        self.assertEqual(rejected, total_rejected)
+
+
+if __name__ == '__main__':
+    unittest.main()
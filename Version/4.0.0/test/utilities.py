@@ -0,0 +1,95 @@
+# coding=utf-8
+"""Common functionality used by regression tests."""
+
+import importlib
+import logging
+import os
+import shutil
+import sys
+import tempfile
+
+
+LOGGER = logging.getLogger('QGIS')
+QGIS_APP = None  # Static variable used to hold hand to running QGIS app
+CANVAS = None
+PARENT = None
+IFACE = None
+
+# Package name the plugin modules are imported under, the plugin folder
+# name is not a valid Python identifier
+PLUGIN_PACKAGE = 'random_points_on_lines'
+PLUGIN_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def get_qgis_app():
+    """ Start one QGIS application to test against.
+
+    :returns: Handle to QGIS app, canvas, iface and parent. If there are any
+        errors the tuple members will be returned as None.
+    :rtype: (QgsApplication, CANVAS, IFACE, PARENT)
+
+    If QGIS is already running the handle to that app will be returned.
+    """
+
+    try:
+        from qgis.PyQt import QtWidgets, QtCore
+        from qgis.core import QgsApplication
+        from qgis.gui import QgsMapCanvas
+        from .qgis_interface import QgisInterface
+    except ImportError:
+        return None, None, None, None
+
+    global QGIS_APP  # pylint: disable=W0603
+
+    if QGIS_APP is None:
+        gui_flag = True  # All test will run qgis in gui mode
+        #noinspection PyPep8Naming
+        QGIS_APP = QgsApplication(sys.argv, gui_flag)
+        # Make sure QGIS_PREFIX_PATH is set in your env if needed!
+        QGIS_APP.initQgis()
+        s = QGIS_APP.showSettings()
+        LOGGER.debug(s)
+
+    global PARENT  # pylint: disable=W0603
+    if PARENT is None:
+        #noinspection PyPep8Naming
+        PARENT = QtWidgets.QWidget()
+
+    global CANVAS  # pylint: disable=W0603
+    if CANVAS is None:
+        #noinspection PyPep8Naming
+        CANVAS = QgsMapCanvas(PARENT)
+        CANVAS.resize(QtCore.QSize(400, 400))
+
+    global IFACE  # pylint: disable=W0603
+    if IFACE is None:
+        # QgisInterface is a stub implementation of the QGIS plugin interface
+        #noinspection PyPep8Naming
+        IFACE = QgisInterface(CANVAS)
+
+    return QGIS_APP, CANVAS, IFACE, PARENT
+
+
+def get_plugin_module(name):
+    """Import a module of the plugin.
+
+    The plugin folder is linked into a temporary folder under
+    PLUGIN_PACKAGE and that folder is added to ``sys.path``, so relative
+    imports work and worker processes started with ``spawn`` find the
+    plugin modules as well.
+
+    :param name: Module name, e.g. 'generator'.
+    :type name: str
+
+    :returns: The imported module.
+    """
+    if PLUGIN_PACKAGE not in sys.modules:
+        folder = tempfile.mkdtemp(prefix='random_points_test_')
+        link = os.path.join(folder, PLUGIN_PACKAGE)
+        try:
+            os.symlink(PLUGIN_FOLDER, link, target_is_directory=True)
+        except OSError:
+            # Symbolic links need extra privileges on Windows
+            shutil.copytree(PLUGIN_FOLDER, link)
+        sys.path.insert(0, folder)
+    return importlib.import_module('{}.{}'.format(PLUGIN_PACKAGE, name))